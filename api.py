@@ -0,0 +1,158 @@
+"""
+API JSON de solo lectura.
+
+  GET /api/recipes?folder=&fields=id,title&limit=50&cursor=...
+  GET /api/search?q=...&fields=...&limit=...&cursor=...
+  GET /api/folders
+  GET /api/export.ndjson?fields=...      (toda la biblioteca, una receta por línea, en streaming)
+
+`fields` elige las columnas (db_sqlite.RECIPE_FIELDS) y solo esas se leen de la
+base de datos. Los listados se paginan con cursores opacos (`next_cursor`). Las
+respuestas grandes se comprimen con brotli (si está instalado) o gzip según
+Accept-Encoding.
+"""
+import base64
+import gzip
+import json
+import zlib
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from db_sqlite import RECIPE_FIELDS
+from storage import repo
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se usa gzip
+    brotli = None
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+DEFAULT_FIELDS = ("id", "title", "excerpt", "folder", "thumb_key")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+EXPORT_CHUNK = 1000
+MIN_COMPRESS = 1024  # por debajo no compensa comprimir
+
+class BadRequest(Exception):
+    pass
+
+@api.errorhandler(BadRequest)
+def _bad_request(e):
+    return jsonify({'ok': False, 'error': str(e)}), 400
+
+# ----------------- PARÁMETROS -----------------
+def _fields() -> tuple:
+    raw = request.args.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in RECIPE_FIELDS]
+    if unknown:
+        raise BadRequest(f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(RECIPE_FIELDS)}")
+    # El id siempre hace falta para el cursor
+    return fields if "id" in fields else ("id",) + fields
+
+def _limit() -> int:
+    return max(1, min(MAX_LIMIT, request.args.get('limit', DEFAULT_LIMIT, type=int)))
+
+def _encode_cursor(kind: str, value: int) -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+def _decode_cursor(kind: str):
+    token = request.args.get('cursor')
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        got, value = raw.split(":", 1)
+        if got == kind:
+            return int(value)
+    except ValueError:
+        pass
+    raise BadRequest("Cursor no válido")
+
+# ----------------- COMPRESIÓN -----------------
+def _encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+@api.after_request
+def _compress(resp: Response) -> Response:
+    resp.vary.add('Accept-Encoding')
+    if resp.is_streamed or resp.direct_passthrough or 'Content-Encoding' in resp.headers:
+        return resp
+    data = resp.get_data()
+    encoding = _encoding()
+    if len(data) < MIN_COMPRESS or encoding is None:
+        return resp
+    resp.set_data(brotli.compress(data, quality=5) if encoding == 'br' else gzip.compress(data, compresslevel=6))
+    resp.headers['Content-Encoding'] = encoding
+    return resp
+
+# ----------------- RUTAS -----------------
+@api.route('/recipes')
+def recipes():
+    fields, limit = _fields(), _limit()
+    folder = request.args.get('folder') or None
+    before_id = _decode_cursor('n')
+    rows = repo.fetch_recipes_paginated(limit=limit, folder=folder, before_id=before_id, fields=fields)
+    return jsonify({
+        'data': rows,
+        'total': repo.count_recipes(folder=folder),
+        'next_cursor': _encode_cursor('n', rows[-1]['id']) if len(rows) == limit else None,
+    })
+
+@api.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    if not q:
+        raise BadRequest("Falta el parámetro q")
+    fields, limit = _fields(), _limit()
+    folder = request.args.get('folder') or None
+    # Orden por relevancia: el cursor es un desplazamiento
+    offset = _decode_cursor('o') or 0
+    rows = repo.fetch_recipes_paginated(limit=limit, offset=offset, folder=folder, query=q, fields=fields)
+    return jsonify({
+        'data': rows,
+        'total': repo.count_recipes(folder=folder, query=q),
+        'next_cursor': _encode_cursor('o', offset + limit) if len(rows) == limit else None,
+    })
+
+@api.route('/folders')
+def folders():
+    return jsonify({'data': repo.get_folder_counts()})
+
+@api.route('/export.ndjson')
+def export():
+    """Toda la biblioteca en NDJSON, por bloques de EXPORT_CHUNK: la memoria no crece con el tamaño."""
+    fields = _fields()
+    folder = request.args.get('folder') or None
+    encoding = 'gzip' if request.accept_encodings['gzip'] else None
+
+    def lines():
+        before_id = None
+        while True:
+            rows = repo.fetch_recipes_paginated(limit=EXPORT_CHUNK, folder=folder, before_id=before_id, fields=fields)
+            if not rows:
+                return
+            yield "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode()
+            before_id = rows[-1]['id']
+
+    def gzipped(chunks):
+        z = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = formato gzip
+        for chunk in chunks:
+            out = z.compress(chunk)
+            if out:
+                yield out
+        yield z.flush()
+
+    body = lines() if encoding is None else gzipped(lines())
+    resp = Response(stream_with_context(body), mimetype='application/x-ndjson')
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Content-Disposition'] = 'attachment; filename="recetas.ndjson"'
+    return resp
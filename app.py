@@ -1,37 +1,239 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from config import settings
-from db_sqlite import (
-    fetch_recipe, upsert_recipe, delete_recipe, init_db,
-    get_folders, create_folder, delete_folder_by_name,
-    fetch_recipes_paginated, count_recipes, UPLOAD_FOLDER
+import base64
+import functools
+import hashlib
+import mimetypes
+import os
+from pathlib import PurePosixPath
+from typing import Optional
+from flask import (
+    Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, jsonify, abort,
+    send_from_directory, make_response, session
 )
-from scraper import scrape_instagram_post, ScrapeError
+from werkzeug.security import safe_join
+from config import settings
+import db_sqlite
+from db_sqlite import init_db, UPLOAD_FOLDER
+import storage
+from storage import repo
+import cache
+from api import api
+import jobs
+import metrics
+import thumbs
+from ingest import ingest
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = settings.SECRET_KEY
+# Las vistas van en un blueprint y create_app() monta la aplicación y elige
+# almacenamiento, base de datos y cachés. Importar este módulo no toca la base de
+# datos ni el disco ni carga lo pesado: el scraper (instaloader) solo en los hilos
+# de jobs.py, numpy (semantic.py) y los ingredientes en la primera petición que
+# los usa.
+web = Blueprint('web', __name__)
 
 PER_PAGE = 21  # recetas por página
+PAGE_WINDOW = 2  # páginas a cada lado de la actual en el paginador
+
+# --- Caché (cache.py) ---
+# Consultas que repiten casi todas las páginas; la clave incluye la versión de los datos
+@cache.memoize
+def get_folders():
+    return repo.get_folders()
+
+@cache.memoize
+def count_recipes(folder=None, query=None):
+    return repo.count_recipes(folder=folder, query=query)
+
+BOOT_ID = os.urandom(4).hex()  # un despliegue nuevo (plantillas nuevas) invalida los ETag
+
+def cached_page(view):
+    """
+    Cachea el HTML de la vista por (URL, versión de los datos) y responde 304 si el
+    navegador ya tiene esa versión. Las respuestas con mensajes flash no se cachean.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('_flashes'):
+            return view(*args, **kwargs)
+        version = cache.data_version()
+        etag = hashlib.sha1(f"{BOOT_ID}:{version}:{request.full_path}".encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            resp = current_app.response_class(status=304)
+        else:
+            key = f"{version}:{request.full_path}"
+            html = cache.pages.get(key)
+            if html is cache.MISSING:
+                html = view(*args, **kwargs)
+                cache.pages.set(key, html)
+            resp = make_response(html)
+        resp.set_etag(etag)
+        resp.cache_control.no_cache = True  # siempre se revalida, pero solo cuesta un 304
+        return resp
+    return wrapper
+
+@web.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.info())
+
+# --- Métricas (metrics.py) ---
+@web.route('/metrics')
+def metrics_page():
+    """Formato de texto de Prometheus."""
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@web.route('/metrics/sql')
+def metrics_sql():
+    """Sentencias SQL por tiempo total y las últimas consultas lentas con su plan."""
+    return jsonify(statements=metrics.sql_stats(), slow=metrics.slow_queries())
+
+@metrics.collector
+def _cache_metrics():
+    stats = {name: c.info() for name, c in (("pages", cache.pages), ("queries", cache.queries))}
+    lines = []
+    for key in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE cache_{key}_total counter")
+        lines += [f'cache_{key}_total{{cache="{name}"}} {s[key]}' for name, s in stats.items()]
+    return lines
+
+# --- Multimedia ---
+# Lo que va por hash (media/, thumbs/) no cambia nunca: caché de un año e immutable.
+# Las subidas antiguas con nombre fijo se revalidan con ETag cada día.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MEDIA_MAX_AGE = 24 * 3600
+HASHED_PREFIXES = ('media/', 'thumbs/')
+
+@web.app_template_global()
+def media_url(path: str) -> str:
+    return url_for('web.media', path=path)
+
+@web.route('/media/<path:path>')
+def media(path):
+    """Imágenes y vídeos de las recetas con ETag, 304 y peticiones Range (206) para el vídeo."""
+    if safe_join(str(UPLOAD_FOLDER), path) is None:
+        abort(404)
+    hashed = path.startswith(HASHED_PREFIXES)
+    max_age = IMMUTABLE_MAX_AGE if hashed else MEDIA_MAX_AGE
+
+    if settings.MEDIA_OFFLOAD == 'accel':
+        # nginx sirve el fichero (Range incluido) desde una location interna
+        resp = current_app.response_class(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        resp.headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + path
+        resp.headers['Cache-Control'] = f'public, max-age={max_age}' + (', immutable' if hashed else '')
+        return resp
+
+    # El nombre ya es el hash del contenido: sirve de ETag fuerte sin leer el fichero
+    resp = send_from_directory(UPLOAD_FOLDER, path, conditional=True, max_age=max_age,
+                               etag=PurePosixPath(path).stem if hashed else True)
+    resp.cache_control.public = True
+    if hashed:
+        resp.cache_control.immutable = True
+    return resp
+
+# --- Miniaturas (thumbs.py, templates/macros.html) ---
+@web.app_template_global()
+def thumb_url(key: str, width: int, fmt: str) -> str:
+    return media_url(thumbs.thumb_name(key, width, fmt))
+
+@web.app_template_global()
+def thumb_srcset(key: str, fmt: str) -> str:
+    return ", ".join(f"{thumb_url(key, w, fmt)} {w}w" for w in thumbs.THUMB_WIDTHS)
+
+# --- Paginación ---
+# Los listados usan cursores opacos (?cursor=...) para "Anterior"/"Siguiente":
+# codifican el id de la primera/última receta visible y evitan OFFSET en páginas
+# profundas. Los números de página siguen disponibles para saltos directos.
+def _encode_cursor(direction: str, recipe_id: int) -> str:
+    raw = f"{direction}:{recipe_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(token):
+    """Devuelve (dirección, id) o (None, None) si el cursor no es válido."""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        direction, recipe_id = raw.split(":", 1)
+        if direction in ("n", "p"):
+            return direction, int(recipe_id)
+    except ValueError:
+        pass
+    return None, None
+
+def _page_window(page: int, total_pages: int) -> list:
+    """Números de página a mostrar; None marca un hueco ("…")."""
+    pages = []
+    for p in range(1, total_pages + 1):
+        if p in (1, total_pages) or abs(p - page) <= PAGE_WINDOW:
+            pages.append(p)
+        elif pages[-1] is not None:
+            pages.append(None)
+    return pages
+
+def _paginate(total: int, folder=None, query=None) -> dict:
+    """Carga la página pedida y devuelve el contexto que usa pagination.html."""
+    page = max(1, request.args.get('page', 1, type=int))
+    total_pages = (total + PER_PAGE - 1) // PER_PAGE
+    direction, cursor_id = (None, None) if query else _decode_cursor(request.args.get('cursor'))
+
+    if direction == 'n':
+        recipes = repo.fetch_recipes_paginated(limit=PER_PAGE, folder=folder, before_id=cursor_id)
+    elif direction == 'p':
+        recipes = repo.fetch_recipes_paginated(limit=PER_PAGE, folder=folder, after_id=cursor_id)
+    else:
+        recipes = repo.fetch_recipes_paginated(limit=PER_PAGE, offset=(page-1)*PER_PAGE, folder=folder, query=query)
 
-@app.route('/')
+    next_cursor = prev_cursor = None
+    if recipes and not query:
+        if page < total_pages:
+            next_cursor = _encode_cursor('n', recipes[-1]['id'])
+        if page > 1:
+            prev_cursor = _encode_cursor('p', recipes[0]['id'])
+
+    return {
+        'recipes': recipes,
+        'page': page,
+        'total_pages': total_pages,
+        'pages': _page_window(page, total_pages),
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+    }
+
+def _paginate_ids(total: int, page_ids) -> dict:
+    """Como _paginate, con page_ids(offset, limit) dando los ids de la página (semantic.py, ingredients.py)."""
+    page = max(1, request.args.get('page', 1, type=int))
+    total_pages = (total + PER_PAGE - 1) // PER_PAGE
+    return {
+        'recipes': repo.fetch_recipes_by_ids(page_ids((page-1)*PER_PAGE, PER_PAGE)),
+        'page': page,
+        'total_pages': total_pages,
+        'pages': _page_window(page, total_pages),
+        'next_cursor': None,
+        'prev_cursor': None,
+    }
+
+def _local_indexes() -> bool:
+    # Los índices semántico y de ingredientes salen de la base de datos SQLite (sus ids)
+    return repo.name == "sqlite"
+
+def _semantic_enabled() -> bool:
+    if not _local_indexes():
+        return False
+    import semantic  # numpy: se carga con la primera búsqueda o ficha
+    return semantic.available()
+
+@web.route('/')
+@cached_page
 def index():
-    page = max(1, int(request.args.get('page', 1)))
-    total = count_recipes()
-    recipes = fetch_recipes_paginated(limit=PER_PAGE, offset=(page-1)*PER_PAGE)
+    pagination = _paginate(count_recipes())
     folders = get_folders()
-    total_pages = (total + PER_PAGE - 1) // PER_PAGE
-    return render_template('index.html', recipes=recipes, folders=folders, page=page, total_pages=total_pages)
+    return render_template('index.html', folders=folders, **pagination)
 
-@app.route('/folder/<folder_name>')
+@web.route('/folder/<folder_name>')
+@cached_page
 def folder(folder_name):
-    page = max(1, int(request.args.get('page', 1)))
-    total = count_recipes(folder=folder_name)
-    recipes = fetch_recipes_paginated(limit=PER_PAGE, offset=(page-1)*PER_PAGE, folder=folder_name)
+    pagination = _paginate(count_recipes(folder=folder_name), folder=folder_name)
     folders = get_folders()
-    total_pages = (total + PER_PAGE - 1) // PER_PAGE
-    return render_template('folder.html', recipes=recipes, folders=folders,
-                           current_folder=folder_name, page=page, total_pages=total_pages)
+    return render_template('folder.html', folders=folders, current_folder=folder_name, **pagination)
 
-@app.route('/add', methods=['GET', 'POST'])
+@web.route('/add', methods=['GET', 'POST'])
 def add():
     if request.method == 'POST':
         url = request.form.get('url', '').strip()
@@ -41,110 +243,210 @@ def add():
         folder = None
 
         if folder_select == 'new' and new_folder_name:
-            create_folder(new_folder_name)
+            repo.create_folder(new_folder_name)
             folder = new_folder_name
         elif folder_select and folder_select != 'none':
             folder = folder_select
 
-        try:
-            data = scrape_instagram_post(url)
-        except ScrapeError as e:
-            flash(f'Error al obtener datos del post: {e}', 'danger')
-            return redirect(url_for('add'))
-
-        shortcode = data.get('shortcode')
-        image_path = None
-        video_path = None
-
-        # Guardar siempre la imagen (thumbnail o foto del post)
-        if data.get('image_bytes'):
-            image_path = f"{shortcode}.jpg"
-            with open(UPLOAD_FOLDER / image_path, "wb") as f:
-                f.write(data['image_bytes'])
-
-        # Guardar vídeo si existe
-        if data.get('video_bytes'):
-            video_path = f"{shortcode}.mp4"
-            with open(UPLOAD_FOLDER / video_path, "wb") as f:
-                f.write(data['video_bytes'])
-
-        recipe = {
-            'url': url,
-            'shortcode': shortcode,
-            'author': data.get('author'),
-            'caption': data.get('caption'),
-            'image_path': image_path,
-            'video_path': video_path,
-            'posted_at': data.get('posted_at'),
-            'likes': data.get('likes'),
-            'title': title,
-            'folder': folder
-        }
-        upsert_recipe(recipe)
-        flash('Receta añadida correctamente', 'success')
-        return redirect(url_for('index'))
+        # El scraping se hace en segundo plano (jobs.py); aquí solo se encola, y no
+        # si el post ya es una receta o ya está en cola (ingest.py)
+        summary = ingest([url], title=title, folder=folder)
+        wants_json = request.accept_mimetypes.best == 'application/json'
+        if summary['invalid']:
+            flash('La URL no parece un post de Instagram', 'warning')
+            return redirect(url_for('web.add'))
+        if summary['existing']:
+            if wants_json:
+                return jsonify({'ok': True, 'existing': True, 'job_id': None})
+            flash('Esa receta ya está guardada o en cola', 'info')
+            return redirect(url_for('web.jobs_page'))
+
+        job_id = summary['job_ids'][0]
+        if wants_json:
+            return jsonify({'ok': True, 'existing': False, 'job_id': job_id,
+                            'status_url': url_for('web.job_status', job_id=job_id)}), 202
+        flash(f'Receta en cola (trabajo #{job_id})', 'success')
+        return redirect(url_for('web.jobs_page'))
 
     folders = get_folders()
     return render_template('add.html', folders=folders)
 
-@app.route('/recipe/<int:recipe_id>')
+@web.route('/ingest', methods=['POST'])
+def ingest_urls():
+    """Importación masiva: JSON {"urls": [...], "folder": ...} o formulario con una URL por línea."""
+    if request.is_json:
+        data = request.get_json() or {}
+        items, folder = data.get('urls') or [], (data.get('folder') or '').strip() or None
+        if not isinstance(items, list):
+            return jsonify({'ok': False, 'error': '"urls" debe ser una lista'}), 400
+        summary = ingest([str(i) for i in items], folder=folder)
+        return jsonify({'ok': True, **summary}), 202
+
+    folder = request.form.get('folder_select')
+    folder = folder if folder and folder not in ('none', 'new') else None
+    summary = ingest(request.form.get('urls', '').splitlines(), folder=folder)
+    flash(f"{summary['queued']} recetas en cola ({summary['existing']} ya existían, "
+          f"{summary['duplicates']} repetidas, {summary['invalid']} no válidas)", 'success')
+    return redirect(url_for('web.jobs_page'))
+
+@web.route('/recipe/<int:recipe_id>')
 def detail(recipe_id):
-    recipe = fetch_recipe(recipe_id)
+    import ingredients, semantic
+    recipe = repo.fetch_recipe(recipe_id)
     if not recipe:
         flash("Receta no encontrada", "warning")
-        return redirect(url_for('index'))
+        return redirect(url_for('web.index'))
+    similar = repo.fetch_recipes_by_ids(semantic.similar(recipe_id)) if _semantic_enabled() else []
+    recipe_ingredients = ingredients.for_recipe(recipe_id) if _local_indexes() else []
     folders = get_folders()
-    return render_template('detail.html', r=recipe, folders=folders)
+    return render_template('detail.html', r=recipe, folders=folders, similar=similar,
+                           ingredients=recipe_ingredients)
 
-@app.route('/recipe/<int:recipe_id>/delete', methods=['POST'])
+@web.route('/recipe/<int:recipe_id>/delete', methods=['POST'])
 def delete(recipe_id):
-    delete_recipe(recipe_id)
+    repo.delete_recipe(recipe_id)
     flash("Receta eliminada", "info")
-    return redirect(url_for('index'))
+    return redirect(url_for('web.index'))
 
-@app.route('/folders/create', methods=['POST'])
+@web.route('/folders/create', methods=['POST'])
 def api_create_folder():
     data = request.get_json() or {}
     name = data.get('name', '').strip()
     if not name:
         return jsonify({'ok': False, 'error': 'Nombre vacío'}), 400
-    folder_id = create_folder(name)
+    folder_id = repo.create_folder(name)
     return jsonify({'ok': True, 'name': name})
 
-@app.route('/folders/delete', methods=['POST'])
+@web.route('/folders/delete', methods=['POST'])
 def api_delete_folder():
     data = request.get_json() or {}
     name = data.get('name', '').strip()
     if not name:
         return jsonify({'ok': False, 'error': 'Falta nombre'}), 400
-    delete_folder_by_name(name)
+    repo.delete_folder_by_name(name)
     return jsonify({'ok': True})
 
-@app.route('/search')
+@web.route('/search')
+@cached_page
 def search():
+    import semantic
     q = request.args.get('q', '').strip()
-    page = max(1, int(request.args.get('page', 1)))
-    total = count_recipes(query=q) if q else 0
-    recipes = fetch_recipes_paginated(limit=PER_PAGE, offset=(page-1)*PER_PAGE, query=q) if q else []
+    mode = 'semantic' if request.args.get('mode') == 'semantic' and _semantic_enabled() else 'text'
+    if q and mode == 'semantic':
+        ids = [recipe_id for recipe_id, _ in semantic.search(q)]
+        pagination = _paginate_ids(len(ids), lambda offset, limit: ids[offset:offset + limit])
+    elif q:
+        # Los resultados van ordenados por relevancia: paginación por offset
+        pagination = _paginate(count_recipes(query=q), query=q)
+    else:
+        pagination = {'recipes': [], 'page': 1, 'total_pages': 0, 'pages': []}
     folders = get_folders()
-    total_pages = (total + PER_PAGE - 1) // PER_PAGE
-    return render_template('search.html', recipes=recipes, folders=folders, query=q,
-                           page=page, total_pages=total_pages)
+    return render_template('search.html', folders=folders, query=q, mode=mode,
+                           semantic_enabled=_semantic_enabled(), **pagination)
+
+@web.route('/ingredients')
+@cached_page
+def ingredients_search():
+    """¿Qué hago con lo que tengo? Con todos (Y, | para O), sin ninguno de, o solo con estos."""
+    import ingredients
+    have = request.args.get('con', '').strip()
+    without = request.args.get('sin', '').strip()
+    only = request.args.get('solo') == '1'
+    missing = max(0, min(3, request.args.get('faltan', 0, type=int)))
+    pagination = {'recipes': [], 'page': 1, 'total_pages': 0, 'pages': []}
+    if have and _local_indexes():
+        if only:
+            available = [t for t in have.split(',') if t.strip()]
+            pagination = _paginate_ids(ingredients.count_using_only(available, missing),
+                                       lambda offset, limit: ingredients.using_only(available, missing, limit, offset))
+        else:
+            groups, excluded = ingredients.parse_query(have)
+            excluded += [t.strip() for t in without.split(',') if t.strip()]
+            query = (groups, excluded)
+            pagination = _paginate_ids(ingredients.count(query),
+                                       lambda offset, limit: ingredients.find(query, limit, offset))
+    return render_template('ingredients.html', folders=get_folders(), have=have, without=without,
+                           only=only, missing=missing, **pagination)
+
+@web.route('/jobs')
+def jobs_page():
+    return render_template('jobs.html', jobs=jobs.recent_jobs(), folders=get_folders())
+
+@web.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if not job:
+        return jsonify({'ok': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job)
+
+@web.route('/jobs/status')
+def jobs_status():
+    ids = [int(i) for i in request.args.get('ids', '').split(',') if i.isdigit()]
+    return jsonify(jobs.get_jobs(ids))
 
 # Nueva ruta para cambiar carpeta de un post
-@app.route('/recipe/<int:recipe_id>/change_folder', methods=['POST'])
+@web.route('/recipe/<int:recipe_id>/change_folder', methods=['POST'])
 def change_recipe_folder(recipe_id):
     new_folder = request.form.get('folder_select')
     if not new_folder:
         flash("Carpeta no válida", "warning")
     else:
-        from db_sqlite import update_recipe_folder, create_folder
         # Crear carpeta si no existe
-        create_folder(new_folder)
-        update_recipe_folder(recipe_id, new_folder)
+        repo.create_folder(new_folder)
+        repo.update_recipe_folder(recipe_id, new_folder)
         flash(f"Carpeta actualizada a '{new_folder}'", "success")
-    return redirect(url_for('detail', recipe_id=recipe_id))
+    return redirect(url_for('web.detail', recipe_id=recipe_id))
+
+def create_app(config: Optional[dict] = None) -> Flask:
+    """
+    Crea la aplicación; `config` se aplica sobre app.config, que parte de config.py:
+
+      DB_BACKEND            "sqlite" o "mysql" (storage.py)
+      DB_FILE               fichero SQLite (recetas con DB_BACKEND=sqlite, cola, multimedia)
+      DB_NAME, DB_POOL_SIZE base de datos y pool con DB_BACKEND=mysql
+      CACHE_URL, CACHE_TTL  cachés de páginas y consultas (cache.py); "" = en memoria
+
+    Con eso configura el almacenamiento, la base de datos y las cachés del proceso
+    (una aplicación por proceso, como con gunicorn). No abre conexiones, no escribe
+    en disco y no arranca hilos: con gunicorn --preload ('app:create_app()') se crea
+    una vez en el proceso maestro y los trabajadores la heredan (db_sqlite reabre la
+    conexión tras el fork). El esquema se prepara antes con init_storage() o
+    `python migrations.py`.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(
+        SECRET_KEY=settings.SECRET_KEY,
+        USE_X_SENDFILE=settings.MEDIA_OFFLOAD == 'sendfile',
+        DB_BACKEND=settings.DB_BACKEND,
+        DB_FILE=str(db_sqlite.DB_FILE),
+        DB_NAME=settings.DB_NAME,
+        DB_POOL_SIZE=settings.DB_POOL_SIZE,
+        CACHE_URL=settings.CACHE_URL,
+        CACHE_TTL=settings.CACHE_TTL,
+    )
+    app.config.update(config or {})
+
+    db_sqlite.set_db_file(app.config['DB_FILE'])
+    options = {}
+    if app.config['DB_BACKEND'].lower() == 'mysql':
+        options = {'database': app.config['DB_NAME'], 'pool_size': app.config['DB_POOL_SIZE']}
+    storage.configure(app.config['DB_BACKEND'], **options)
+    cache.configure(app.config['CACHE_URL'], app.config['CACHE_TTL'])
+
+    app.register_blueprint(web)
+    app.register_blueprint(api)
+    metrics.init_app(app)
+    return app
+
+def init_storage():
+    """Migraciones y carpeta de subidas; una vez por despliegue, no en cada trabajador."""
+    init_db()  # cola de trabajos y almacén de multimedia (SQLite)
+    repo.init_db()
 
 if __name__ == '__main__':
-    init_db()
+    app = create_app()
+    init_storage()
+    # Con debug el recargador ejecuta esto en dos procesos: los hilos solo en el que sirve
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        jobs.WorkerPool().start()
     app.run(debug=True)
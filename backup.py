@@ -0,0 +1,293 @@
+"""
+Copia de seguridad y restauración de la biblioteca (base de datos + multimedia).
+
+La copia parte de una instantánea consistente (API de backup de SQLite), así
+que se puede hacer con la aplicación en marcha. Todo se escribe por bloques en
+un .tar, sin cargar la biblioteca en memoria:
+
+  manifest.json            tipo de copia, momento de la instantánea, versión del esquema
+  db/recetas.db            la instantánea (solo en copias completas)
+  folders.ndjson           carpetas
+  recipes/000001.ndjson    recetas, EXPORT_CHUNK por fichero
+  deleted/000001.ndjson    urls borradas desde la copia anterior (solo incrementales)
+  uploads/<ruta>           multimedia y miniaturas
+
+Una copia incremental (--since) solo lleva las recetas cambiadas (updated_at),
+su multimedia y los borrados desde la copia indicada. Por defecto el .tar va
+sin comprimir: la multimedia ya está comprimida y así la restauración puede
+extraer ficheros en paralelo.
+
+Uso: python backup.py export copia.tar [--since copia_anterior.tar | --since "2026-01-01 00:00:00"] [--gzip]
+     python backup.py restore copia.tar [--replace] [--workers N]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+from db_sqlite import get_conn, init_db, transaction, create_folder, upsert_recipes, UPLOAD_FOLDER
+from migrations import schema_version
+from thumbs import THUMB_FORMATS, THUMB_WIDTHS, thumb_name
+
+FORMAT = 1
+EXPORT_CHUNK = 1000
+MEDIA_COLUMNS = ("image_path", "video_path", "poster_path", "preview_path")
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+# ----------------- EXPORTAR -----------------
+def _forget(tar: tarfile.TarFile):
+    """
+    Al escribir, tarfile guarda la cabecera de cada entrada (members) y su inodo
+    (inodes, para enlaces duros): se vacían para no crecer con la copia, como al
+    restaurar. Un fichero repetido se copia entero en vez de como enlace.
+    """
+    tar.members = []
+    tar.inodes = {}
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+    _forget(tar)
+
+def _ndjson(rows) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode()
+
+def _add_upload(tar: tarfile.TarFile, rel: str, stats: dict):
+    path = UPLOAD_FOLDER / rel
+    if path.is_file():
+        tar.add(path, arcname=f"uploads/{rel}")  # tarfile copia el fichero por bloques
+        _forget(tar)
+        stats["files"] += 1
+    else:
+        stats["missing"] += 1
+
+def _thumb_files(key: str):
+    return [thumb_name(key, w, fmt) for w in THUMB_WIDTHS for fmt in THUMB_FORMATS]
+
+def _since_from(value: str) -> str:
+    """--since admite una copia anterior (se usa el momento de su instantánea) o una fecha."""
+    if os.path.isfile(value):
+        with tarfile.open(value, "r:*") as tar:
+            return json.load(tar.extractfile("manifest.json"))["snapshot_at"]
+    return value
+
+def export(dest, since: Optional[str] = None, compress: bool = False) -> dict:
+    dest = Path(dest)
+    stats = {"recipes": 0, "deleted": 0, "files": 0, "missing": 0}
+    fd, snap_path = tempfile.mkstemp(suffix=".db", dir=dest.resolve().parent)
+    os.close(fd)
+    snap = None
+    try:
+        live = get_conn()
+        # Lo que cambie mientras se copia entra también en la siguiente incremental (>=)
+        snapshot_at = live.execute(f"SELECT {NOW}").fetchone()[0]
+        snap = sqlite3.connect(snap_path)
+        live.backup(snap)
+        snap.row_factory = sqlite3.Row
+
+        manifest = {"format": FORMAT, "kind": "incremental" if since else "full",
+                    "snapshot_at": snapshot_at, "since": since, "schema_version": schema_version(snap)}
+        with tarfile.open(dest, "w:gz" if compress else "w") as tar:
+            _add_bytes(tar, "manifest.json", json.dumps(manifest, indent=2).encode())
+            if not since:
+                tar.add(snap_path, arcname="db/recetas.db")
+            _add_bytes(tar, "folders.ndjson", _ndjson(
+                {"name": r["name"]} for r in snap.execute("SELECT name FROM folders ORDER BY id")))
+
+            # Recetas por bloques (keyset por id); en incrementales, también su multimedia
+            condition, params = ("AND r.updated_at >= ?", [since]) if since else ("", [])
+            last_id, part = 0, 0
+            while True:
+                rows = snap.execute(f"""
+                    SELECT r.*, f.name AS folder FROM recipes r LEFT JOIN folders f ON f.id = r.folder_id
+                    WHERE r.id > ? {condition} ORDER BY r.id LIMIT ?
+                """, [last_id, *params, EXPORT_CHUNK]).fetchall()
+                if not rows:
+                    break
+                part += 1
+                records = [{k: r[k] for k in r.keys() if k != "folder_id"} for r in rows]
+                _add_bytes(tar, f"recipes/{part:06d}.ndjson", _ndjson(records))
+                stats["recipes"] += len(rows)
+                last_id = rows[-1]["id"]
+                if since:
+                    for rel in {r[c] for r in rows for c in MEDIA_COLUMNS if r[c]}:
+                        _add_upload(tar, rel, stats)
+                    for key in {r["thumb_key"] for r in rows if r["thumb_key"]}:
+                        for rel in _thumb_files(key):
+                            _add_upload(tar, rel, stats)
+                print(f"📦 {stats['recipes']} recetas, {stats['files']} ficheros")
+
+            if since:
+                part = 0
+                cur = snap.execute("SELECT url, deleted_at FROM deleted_recipes WHERE deleted_at >= ? ORDER BY url", (since,))
+                while rows := cur.fetchmany(EXPORT_CHUNK):
+                    part += 1
+                    _add_bytes(tar, f"deleted/{part:06d}.ndjson", _ndjson(dict(r) for r in rows))
+                    stats["deleted"] += len(rows)
+            else:
+                # Copia completa: cada fichero una sola vez, aunque lo usen varias recetas
+                for r in snap.execute("SELECT path FROM media WHERE refs > 0 ORDER BY path"):
+                    _add_upload(tar, r["path"], stats)
+                for r in snap.execute("SELECT DISTINCT thumb_key FROM recipes WHERE thumb_key IS NOT NULL"):
+                    for rel in _thumb_files(r["thumb_key"]):
+                        _add_upload(tar, rel, stats)
+    finally:
+        if snap is not None:
+            snap.close()
+        os.unlink(snap_path)
+    return stats
+
+# ----------------- RESTAURAR -----------------
+def _upload_target(name: str) -> Optional[Path]:
+    """Ruta de destino de un miembro uploads/...; None si intenta salirse de UPLOAD_FOLDER."""
+    rel = PurePosixPath(name[len("uploads/"):])
+    if rel.is_absolute() or ".." in rel.parts or not rel.parts:
+        return None
+    return UPLOAD_FOLDER.joinpath(*rel.parts)
+
+def _write_atomic(target: Path, src, size: int):
+    if target.exists() and target.stat().st_size == size:
+        return  # por contenido: si ya está, es el mismo fichero
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class _Slice(io.RawIOBase):
+    """Lee `size` bytes de un fichero a partir de `offset` (un miembro de un .tar sin comprimir)."""
+    def __init__(self, f, offset: int, size: int):
+        f.seek(offset)
+        self._f, self._left = f, size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        n = self._f.readinto(memoryview(buf)[:min(len(buf), self._left)])
+        self._left -= n
+        return n
+
+def _extract_at(archive: str, offset: int, size: int, target: Path):
+    with open(archive, "rb") as f:
+        _write_atomic(target, io.BufferedReader(_Slice(f, offset, size)), size)
+
+def _is_plain_tar(archive: str) -> bool:
+    """Solo en un .tar sin comprimir se puede leer cada miembro por su posición."""
+    try:
+        with tarfile.open(archive, "r:"):
+            return True
+    except tarfile.ReadError:
+        return False
+
+def _restore_recipes(records: list):
+    with transaction() as cur:
+        upsert_recipes(records, batch_size=len(records) or 1)
+        cur.executemany("UPDATE recipes SET poster_path=?, preview_path=? WHERE url=?",
+                        [(r.get("poster_path"), r.get("preview_path"), r["url"]) for r in records])
+
+def restore(archive, replace: bool = False, workers: Optional[int] = None) -> dict:
+    """
+    Restaura una copia. Por defecto mezcla (upsert por url) con la biblioteca actual;
+    con replace, una copia completa sustituye la base de datos por su instantánea.
+    En un .tar sin comprimir los ficheros se extraen en paralelo mientras se
+    restauran las recetas.
+    """
+    archive = str(archive)
+    init_db()
+    stats = {"recipes": 0, "deleted": 0, "files": 0}
+    parallel = _is_plain_tar(archive)
+    workers = workers or min(8, (os.cpu_count() or 1) * 2)
+
+    with tarfile.open(archive, "r:*") as tar, ThreadPoolExecutor(max_workers=workers) as pool:
+        manifest = None
+        pending = deque()
+        for member in tar:
+            name = member.name
+            if name == "manifest.json":
+                manifest = json.load(tar.extractfile(member))
+                if replace and manifest["kind"] != "full":
+                    raise ValueError("--replace necesita una copia completa")
+            elif name == "db/recetas.db" and replace:
+                fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=UPLOAD_FOLDER.parent)
+                os.close(fd)
+                try:
+                    with open(tmp_path, "wb") as out:
+                        shutil.copyfileobj(tar.extractfile(member), out, 1024 * 1024)
+                    with sqlite3.connect(tmp_path) as snap:
+                        snap.backup(get_conn())
+                finally:
+                    os.unlink(tmp_path)
+                init_db()  # por si la copia es de un esquema anterior
+            elif name == "folders.ndjson" and not replace:
+                for line in tar.extractfile(member):
+                    create_folder(json.loads(line)["name"])
+            elif name.startswith("recipes/") and not replace:
+                records = [json.loads(line) for line in tar.extractfile(member)]
+                _restore_recipes(records)
+                stats["recipes"] += len(records)
+                print(f"♻️ {stats['recipes']} recetas restauradas")
+            elif name.startswith("deleted/"):
+                urls = [(json.loads(line)["url"],) for line in tar.extractfile(member)]
+                with transaction() as cur:
+                    cur.executemany("DELETE FROM recipes WHERE url=?", urls)
+                stats["deleted"] += len(urls)
+            elif name.startswith("uploads/") and member.isfile():
+                target = _upload_target(name)
+                if target is None:
+                    continue
+                if parallel:
+                    pending.append(pool.submit(_extract_at, archive, member.offset_data, member.size, target))
+                    while len(pending) > workers * 4:
+                        pending.popleft().result()
+                else:
+                    _write_atomic(target, tar.extractfile(member), member.size)
+                stats["files"] += 1
+            # tarfile guarda todas las cabeceras leídas: se vacía para no crecer con la copia
+            tar.members = []
+        while pending:
+            pending.popleft().result()
+
+    if manifest is None:
+        raise ValueError(f"{archive} no es una copia de la biblioteca (falta manifest.json)")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copia de seguridad de la biblioteca.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="crear una copia")
+    p_export.add_argument("archive")
+    p_export.add_argument("--since", default=None, help="copia anterior (.tar) o fecha: solo lo cambiado desde entonces")
+    p_export.add_argument("--gzip", action="store_true", help="comprimir (la restauración no podrá ir en paralelo)")
+    p_restore = sub.add_parser("restore", help="restaurar una copia")
+    p_restore.add_argument("archive")
+    p_restore.add_argument("--replace", action="store_true", help="sustituir la base de datos por la de la copia")
+    p_restore.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    if args.command == "export":
+        since = _since_from(args.since) if args.since else None
+        stats = export(args.archive, since=since, compress=args.gzip)
+        print(f"✅ Copia {'incremental' if since else 'completa'} en {args.archive}: {stats['recipes']} recetas, "
+              f"{stats['files']} ficheros, {stats['deleted']} borrados ({stats['missing']} ficheros no encontrados)")
+    else:
+        stats = restore(args.archive, replace=args.replace, workers=args.workers)
+        print(f"✅ Restauradas {stats['recipes']} recetas, {stats['files']} ficheros, {stats['deleted']} borrados")
+    print(f"⏱️ {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,320 @@
+"""
+Benchmark de la aplicación completa: capa de datos, vistas de Flask y carga HTTP.
+
+Genera una biblioteca sintética (benchmarks/synthetic.py: descripciones en
+español, carpetas con distribución sesgada) de --size recetas y mide:
+
+  micro   cada función de db_sqlite por separado
+  flask   /, /folder/<nombre>, /search, /recipe/<id> y /api/recipes con el
+          cliente de pruebas, con la caché vacía (fría) y ya llena (caliente)
+  load    un servidor real con --concurrency clientes HTTP durante --duration s
+          pidiendo una mezcla de esas páginas
+
+De cada medida: p50/p95/p99 y operaciones por segundo. Los resultados se
+guardan en JSON (--json) y --compare compara con una ejecución anterior y
+marca las medidas cuyo p95 empeora más de --threshold.
+
+Con --keep DIR la biblioteca generada se guarda y se reutiliza en las
+siguientes ejecuciones (la de 500k tarda unos minutos en generarse).
+
+Uso: python -m benchmarks.bench_app [--size 1k|50k|500k] [--only micro,flask,load]
+                                    [--json salida.json] [--compare anterior.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+import db_sqlite
+from benchmarks.synthetic import fake_recipes, FOLDERS
+
+SIZES = {"1k": 1_000, "50k": 50_000, "500k": 500_000}
+QUERY = "tarta queso"
+PER_PAGE = 21
+MIN_DELTA_MS = 0.05  # diferencias menores son ruido aunque en proporción parezcan mucho
+
+# ----------------- BIBLIOTECA -----------------
+def build_library(rows: int, path: Path) -> Path:
+    """Genera (o reutiliza) la base de datos sintética de `rows` recetas en `path`."""
+    if path.exists():
+        print(f"🟢 Reutilizando {path}")
+        return path
+    part = path.with_suffix(".part")
+    for leftover in part.parent.glob(part.name + "*"):
+        leftover.unlink()
+    db_sqlite.set_db_file(part)
+    db_sqlite.init_db()
+    t0 = time.perf_counter()
+    db_sqlite.upsert_recipes(fake_recipes(rows), batch_size=2000)
+    conn = db_sqlite.get_conn()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db_sqlite.close_conn()
+    os.replace(part, path)
+    print(f"🟢 {rows} recetas sintéticas generadas en {time.perf_counter() - t0:.1f}s")
+    return path
+
+# ----------------- MEDIDAS -----------------
+def summarize(timings_ms: list, elapsed_s: float = None) -> dict:
+    timings_ms = sorted(timings_ms)
+    n = len(timings_ms)
+    cuts = statistics.quantiles(timings_ms, n=100, method="inclusive") if n > 1 else timings_ms * 99
+    return {
+        "n": n,
+        "p50_ms": round(statistics.median(timings_ms), 4),
+        "p95_ms": round(cuts[94], 4),
+        "p99_ms": round(cuts[98], 4),
+        "mean_ms": round(statistics.fmean(timings_ms), 4),
+        "ops_per_s": round(n / (elapsed_s if elapsed_s else sum(timings_ms) / 1000), 1),
+    }
+
+def timed(fn, repeat: int, before=None) -> dict:
+    fn()  # calentamiento (sentencias preparadas, páginas en caché del SO)
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return summarize(timings)
+
+def samples(rows: int) -> dict:
+    """Ids, carpeta y offsets representativos de la biblioteca."""
+    conn = db_sqlite.get_conn()
+    ids = [r[0] for r in conn.execute("SELECT id FROM recipes ORDER BY id")]
+    return {
+        "ids": ids,
+        "middle_id": ids[len(ids) // 2],
+        "folder": FOLDERS[3],
+        "deep_offset": (rows // 2 // PER_PAGE) * PER_PAGE,
+    }
+
+def micro(rows: int, repeat: int) -> dict:
+    s = samples(rows)
+    rng = random.Random(1)
+    counter = iter(range(10**9))
+    calls = {
+        "fts_query": lambda: db_sqlite.fts_query("Tarta de queso sin horno"),
+        "fetch_recipes_paginated portada": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE),
+        "fetch_recipes_paginated keyset a mitad": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, before_id=s["middle_id"]),
+        "fetch_recipes_paginated página anterior": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, after_id=s["middle_id"]),
+        "fetch_recipes_paginated offset a mitad": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, offset=s["deep_offset"]),
+        "fetch_recipes_paginated carpeta": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, folder=s["folder"]),
+        "fetch_recipes_paginated búsqueda": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, query=QUERY),
+        "fetch_recipes_paginated todos los campos": lambda: db_sqlite.fetch_recipes_paginated(limit=PER_PAGE, fields=tuple(db_sqlite.RECIPE_FIELDS)),
+        "count_recipes": db_sqlite.count_recipes,
+        "count_recipes carpeta": lambda: db_sqlite.count_recipes(folder=s["folder"]),
+        "count_recipes búsqueda": lambda: db_sqlite.count_recipes(query=QUERY),
+        "get_folder_counts": db_sqlite.get_folder_counts,
+        "get_folders": db_sqlite.get_folders,
+        "data_version": db_sqlite.data_version,
+        "fetch_recipe": lambda: db_sqlite.fetch_recipe(rng.choice(s["ids"])),
+        "upsert_recipe nueva": lambda: db_sqlite.upsert_recipe({"url": f"bench://{next(counter)}", "caption": "receta de prueba", "folder": s["folder"]}),
+        "upsert_recipe existente": lambda: db_sqlite.upsert_recipe({"url": "bench://0", "caption": f"cambio {next(counter)}", "folder": s["folder"]}),
+        "update_recipe_folder": lambda: db_sqlite.update_recipe_folder(rng.choice(s["ids"]), rng.choice(FOLDERS)),
+        "create_folder existente": lambda: db_sqlite.create_folder(s["folder"]),
+        "upsert_recipes lote de 100": lambda: db_sqlite.upsert_recipes(
+            {"url": f"bench://lote/{next(counter)}", "caption": "receta de prueba", "folder": s["folder"]} for _ in range(100)),
+    }
+    results = {}
+    for name, fn in calls.items():
+        results[name] = timed(fn, repeat)
+        print(f"  {name}: p50 {results[name]['p50_ms']:.3f} ms, p95 {results[name]['p95_ms']:.3f} ms")
+    return results
+
+def routes(rows: int, rng: random.Random) -> dict:
+    s = samples(rows)
+    return {
+        "/": lambda: "/",
+        "/?page=N": lambda: f"/?page={rng.randint(1, 50)}",
+        "/folder/<nombre>": lambda: f"/folder/{rng.choice(FOLDERS[:8])}",
+        "/search": lambda: f"/search?q={rng.choice(['tarta', 'tarta queso', 'galletas avena', 'chocolate', 'pan'])}",
+        "/recipe/<id>": lambda: f"/recipe/{rng.choice(s['ids'])}",
+        "/api/recipes": lambda: "/api/recipes?limit=50",
+    }
+
+def flask_views(rows: int, repeat: int) -> dict:
+    import cache
+    from app import create_app
+    app = create_app()
+    client = app.test_client()
+    rng = random.Random(2)
+
+    def clear():
+        cache.pages.clear()
+        cache.queries.clear()
+
+    results = {}
+    for name, make_url in routes(rows, rng).items():
+        for mode, before in (("fría", clear), ("caliente", None)):
+            url = make_url()
+
+            def get():
+                resp = client.get(url)
+                assert resp.status_code == 200, (url, resp.status_code)
+            key = f"{name} ({mode})"
+            results[key] = timed(get, repeat, before=before)
+            print(f"  {key}: p50 {results[key]['p50_ms']:.2f} ms, p95 {results[key]['p95_ms']:.2f} ms")
+    return results
+
+def load(rows: int, concurrency: int, duration: float) -> dict:
+    """Servidor werkzeug con hilos y `concurrency` clientes pidiendo una mezcla de páginas."""
+    from werkzeug.serving import make_server
+    from app import create_app
+    app = create_app()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # sin una línea de log por petición
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    base = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    mix = [("/", 30), ("/?page=N", 15), ("/folder/<nombre>", 25), ("/search", 15), ("/recipe/<id>", 15)]
+    per_route = {name: [] for name, _ in mix}
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        urls = routes(rows, rng)
+        session = requests.Session()
+        names, weights = zip(*mix)
+        local = {name: [] for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = session.get(base + urls[name](), timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                local[name].append((time.perf_counter() - t0) * 1000)
+            else:
+                with lock:
+                    errors.append(name)
+        with lock:
+            for name, timings in local.items():
+                per_route[name].extend(timings)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    server.shutdown()
+
+    every = [ms for timings in per_route.values() for ms in timings]
+    result = {"concurrency": concurrency, "duration_s": round(elapsed, 2), "errors": len(errors),
+              "total": summarize(every, elapsed) if every else None,
+              "routes": {name: summarize(t, elapsed) for name, t in per_route.items() if t}}
+    if every:
+        print(f"  {result['total']['ops_per_s']:.0f} peticiones/s con {concurrency} clientes, "
+              f"p50 {result['total']['p50_ms']:.1f} ms, p95 {result['total']['p95_ms']:.1f} ms, "
+              f"p99 {result['total']['p99_ms']:.1f} ms, {len(errors)} errores")
+    return result
+
+# ----------------- COMPARAR -----------------
+def _flatten(result: dict, prefix: str = "") -> dict:
+    """{'micro/count_recipes': {...p95_ms...}, ...} para comparar dos ejecuciones."""
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict) and "p95_ms" in value:
+            flat[prefix + key] = value
+        elif isinstance(value, dict) and key != "meta":
+            flat.update(_flatten(value, f"{prefix}{key}/"))
+    return flat
+
+def compare(old: dict, new: dict, threshold: float) -> list:
+    """Imprime la comparación de p95 y devuelve las medidas que empeoran más de `threshold`."""
+    before, after = _flatten(old), _flatten(new)
+    regressions = []
+    if old.get("meta", {}).get("rows") != new.get("meta", {}).get("rows"):
+        print("⚠️ Las dos ejecuciones no tienen el mismo tamaño de biblioteca")
+    for name in sorted(before.keys() & after.keys()):
+        a, b = before[name]["p95_ms"], after[name]["p95_ms"]
+        ratio = b / a if a else float("inf")
+        worse = ratio > 1 + threshold and b - a > MIN_DELTA_MS
+        better = ratio < 1 - threshold and a - b > MIN_DELTA_MS
+        print(f"{'🔴' if worse else '🟢' if better else '  '} {name}: p95 {a:.3f} → {b:.3f} ms (x{ratio:.2f})")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+def meta(rows: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"rows": rows, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": commit,
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "machine": platform.machine(),
+            "cpus": os.cpu_count()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1k", help="1k, 50k, 500k o un número de recetas")
+    parser.add_argument("--only", default="micro,flask,load", help="partes a ejecutar")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--keep", type=Path, help="carpeta donde guardar y reutilizar las bibliotecas generadas")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    parser.add_argument("--compare", type=Path, help="resultados anteriores (JSON) con los que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="empeoramiento del p95 que cuenta como regresión")
+    args = parser.parse_args()
+
+    rows = SIZES.get(args.size) or int(args.size)
+    parts = {p.strip() for p in args.only.split(",")}
+    tmp = None
+    if args.keep:
+        args.keep.mkdir(parents=True, exist_ok=True)
+        folder = args.keep
+    else:
+        tmp = tempfile.mkdtemp()
+        folder = Path(tmp)
+    library = build_library(rows, folder / f"library-{rows}.db")
+    # Las medidas de escritura cambian la biblioteca: se trabaja sobre una copia
+    work = folder / f"work-{rows}.db"
+    shutil.copyfile(library, work)
+    db_sqlite.set_db_file(work)
+
+    result = {"meta": meta(rows)}
+    try:
+        if "micro" in parts:
+            print("▶ Funciones de db_sqlite")
+            result["micro"] = micro(rows, args.repeat)
+        if "flask" in parts:
+            print("▶ Vistas (cliente de pruebas de Flask)")
+            result["flask"] = flask_views(rows, args.repeat)
+        if "load" in parts:
+            print("▶ Carga HTTP")
+            result["load"] = load(rows, args.concurrency, args.duration)
+    finally:
+        db_sqlite.close_conn()
+        for path in folder.glob(work.name + "*"):
+            path.unlink()
+        if tmp:
+            shutil.rmtree(tmp)
+
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"✅ Resultados en {args.json}")
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), result, args.threshold)
+        if regressions:
+            print(f"🔴 {len(regressions)} medidas más lentas que en {args.compare}")
+            raise SystemExit(1)
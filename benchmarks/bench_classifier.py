@@ -0,0 +1,118 @@
+"""
+Benchmark del clasificador local de carpetas (folder_model.py) frente al modelo.
+
+Las carpetas de benchmarks/synthetic.py son aleatorias; aquí se etiquetan según
+el plato de la descripción (DISH_FOLDERS), con un --noise de etiquetas
+cambiadas y un 5 % de asignaciones a mano, para que haya algo que aprender.
+Sobre --size recetas así etiquetadas mide:
+
+  report     folder_model.report(): precisión con un 20 % reservado, cobertura
+             y aciertos por umbral, recetas por segundo entrenando y clasificando
+  reclasif.  --reclassify recetas clasificadas solo con el modelo y con el
+             clasificador local delante, contra ollama_stub.py con --delay s
+             por petición: tiempo, llamadas y aciertos de lo que resuelve el
+             clasificador local
+
+Uso: python -m benchmarks.bench_classifier [--size 20000] [--reclassify 2000] [--delay 0.2] [--json salida.json]
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import db_sqlite
+import folder_model
+import ollama_stub
+import taxonomy
+from benchmarks.synthetic import DISHES, fake_recipes
+from classifier import Classifier
+
+DISH_FOLDERS = {
+    "bizcocho de limón": "Bizcochos", "tarta de queso": "Tartas", "galletas de avena": "Galletas",
+    "pan de masa madre": "Panes", "brownie de chocolate": "Brownies", "cupcakes de vainilla": "Cupcakes",
+    "donuts glaseados": "Donuts", "helado de fresa": "Helados", "cruasanes caseros": "Bollería",
+    "masa de pizza": "Masas", "tortitas americanas": "Tortitas, crepes y gofres",
+    "macarons de frambuesa": "Macarons", "banana bread": "Banana Bread", "bizcocho de zanahoria": "Bizcochos",
+    "roscón de reyes": "Roscones y briox", "tarta fría de queso": "Tartas", "flan de huevo": "Otros",
+    "natillas": "Otros", "magdalenas esponjosas": "Bizcochos", "coulant de chocolate": "Otros",
+}
+PORT = 11436
+
+def labelled_recipes(n: int, noise: float, seed: int = 0):
+    """fake_recipes con la carpeta del plato (y un `noise` de carpetas al azar) y su classified_with."""
+    rng = random.Random(seed)
+    stamp = Classifier().stamp
+    for recipe in fake_recipes(n, seed=seed):
+        dish = next(d for d in DISHES if recipe["caption"].lower().startswith(d))
+        recipe["folder"] = DISH_FOLDERS[dish] if rng.random() >= noise else rng.choice(taxonomy.CATEGORIAS)
+        recipe["classified_with"] = taxonomy.MANUAL if rng.random() < 0.05 else stamp
+        yield recipe
+
+def reclassify(posts, local, delay: float) -> dict:
+    """Clasifica los posts contra el Ollama falso; local=None es solo el modelo."""
+    with db_sqlite.transaction() as cur:
+        cur.execute("DELETE FROM classification_cache")  # cada pasada desde cero
+    classifier = Classifier(url=f"http://127.0.0.1:{PORT}")
+    start = time.perf_counter()
+    results = folder_model.classify_all(classifier, local, posts)
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 2), "rows_per_s": round(len(posts) / elapsed, 1),
+            "local": classifier.stats["local"], "requests": classifier.stats["requests"],
+            "results": results}
+
+def run(size: int, count: int, delay: float, noise: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_sqlite.set_db_file(Path(tmp) / "classifier.db")
+        db_sqlite.init_db()
+        try:
+            db_sqlite.upsert_recipes(labelled_recipes(size, noise), batch_size=2000)
+            result = {"report": folder_model.report()}
+            model = folder_model.train()
+
+            server = ollama_stub.serve(PORT, delay)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                recipes = list(labelled_recipes(count, noise, seed=1))
+                posts = [(r["caption"], r["author"]) for r in recipes]
+                llm = reclassify(posts, None, delay)
+                hybrid = reclassify(posts, model, delay)
+            finally:
+                server.shutdown()
+            llm.pop("results")
+            stamp = folder_model.local_stamp(Classifier())
+            local = [result[1] == r["folder"] for r, (result, s) in zip(recipes, hybrid.pop("results")) if s == stamp]
+            result["reclassify"] = {"rows": count, "delay_s": delay, "llm_only": llm, "hybrid": hybrid,
+                                    "speedup": round(llm["seconds"] / hybrid["seconds"], 1),
+                                    "local_accuracy": round(sum(local) / len(local), 4) if local else None}
+            return result
+        finally:
+            db_sqlite.close_conn()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20_000, help="recetas etiquetadas para entrenar")
+    parser.add_argument("--reclassify", type=int, default=2_000, help="recetas nuevas que clasificar")
+    parser.add_argument("--delay", type=float, default=0.2, help="segundos por petición del Ollama falso")
+    parser.add_argument("--noise", type=float, default=0.1, help="fracción de etiquetas al azar")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(args.size, args.reclassify, args.delay, args.noise)
+    report = result["report"]
+    print(f"▶ precisión {report['accuracy']:.1%} (la carpeta más frecuente: {report['baseline']:.1%})")
+    for threshold, t in report["thresholds"].items():
+        accuracy = "-" if t["accuracy"] is None else f"{t['accuracy']:.1%}"
+        print(f"  umbral {threshold:.2f}: {t['coverage']:.1%} sin el modelo, {accuracy} de aciertos")
+    print(f"▶ entrenamiento {report['train_rows_per_s']:.0f} recetas/s, clasificación {report['predict_rows_per_s']:.0f} recetas/s")
+    r = result["reclassify"]
+    for name in ("llm_only", "hybrid"):
+        t = r[name]
+        print(f"▶ {name}: {r['rows']} recetas en {t['seconds']}s ({t['rows_per_s']:.0f}/s), "
+              f"{t['local']} locales, {t['requests']} llamadas al modelo")
+    accuracy = "-" if r["local_accuracy"] is None else f"{r['local_accuracy']:.1%}"
+    print(f"▶ {r['speedup']}x más rápido; {accuracy} de aciertos en lo resuelto en local")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,107 @@
+"""
+Benchmark de los índices secundarios y de la migración a folder_id.
+
+Crea una base de datos sintética en el esquema anterior (versión 3: recipes.folder
+como texto y sin índices), mide las consultas típicas, aplica las migraciones
+pendientes y vuelve a medir. Muestra el plan de consulta y la latencia de cada una.
+
+Uso: python -m benchmarks.bench_indexes [--rows 200000] [--repeat 30] [--json salida.json]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import db_sqlite
+import migrations
+from benchmarks.synthetic import fake_recipes, FOLDERS
+
+OLD_SCHEMA = 3  # última versión sin índices y con recipes.folder (texto)
+
+# (nombre, sql antes de migrar, sql después de migrar, parámetros)
+QUERIES = [
+    ("vista de carpeta",
+     "SELECT * FROM recipes WHERE folder = ? ORDER BY id DESC LIMIT 21",
+     "SELECT r.*, f.name AS folder FROM recipes r LEFT JOIN folders f ON f.id = r.folder_id "
+     "WHERE r.folder_id = (SELECT id FROM folders WHERE name = ?) ORDER BY r.id DESC LIMIT 21",
+     (FOLDERS[-2],)),
+    ("recetas de una carpeta (delete_folder_by_name)",
+     "SELECT COUNT(*) FROM recipes WHERE folder = ?",
+     "SELECT COUNT(*) FROM recipes WHERE folder_id = (SELECT id FROM folders WHERE name = ?)",
+     (FOLDERS[3],)),
+    ("carpetas vacías (eliminar_vacias.py)",
+     "SELECT f.id FROM folders f LEFT JOIN recipes r ON f.name = r.folder WHERE r.id IS NULL",
+     "SELECT f.id FROM folders f WHERE NOT EXISTS (SELECT 1 FROM recipes r WHERE r.folder_id = f.id)",
+     ()),
+    ("búsqueda por shortcode",
+     "SELECT id FROM recipes WHERE shortcode = ?",
+     "SELECT id FROM recipes WHERE shortcode = ?",
+     ("S0000012345",)),
+    ("más recientes por fecha",
+     "SELECT id FROM recipes WHERE posted_at >= ? ORDER BY posted_at DESC LIMIT 21",
+     "SELECT id FROM recipes WHERE posted_at >= ? ORDER BY posted_at DESC LIMIT 21",
+     ("2019-06-01",)),
+]
+
+def populate(rows: int):
+    conn = db_sqlite.get_conn()
+    with db_sqlite.transaction() as cur:
+        cur.executemany("INSERT OR IGNORE INTO folders (name) VALUES (?)", [(f,) for f in FOLDERS + ["Vacía"]])
+        cur.executemany("""
+        INSERT INTO recipes (url, shortcode, author, caption, image_path, video_path, posted_at, likes, title, folder)
+        VALUES (:url, :shortcode, :author, :caption, :image_path, :video_path, :posted_at, :likes, :title, :folder)
+        """, fake_recipes(rows))
+    conn.execute("ANALYZE")
+
+def measure(sql: str, params, repeat: int) -> dict:
+    conn = db_sqlite.get_conn()
+    plan = [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return {"plan": plan, "median_ms": statistics.median(timings), "max_ms": max(timings)}
+
+def run(rows: int, repeat: int) -> dict:
+    tmp = tempfile.TemporaryDirectory()
+    db_sqlite.set_db_file(Path(tmp.name) / "bench.db")
+    try:
+        migrations.migrate(target=OLD_SCHEMA)
+        t0 = time.perf_counter()
+        populate(rows)
+        print(f"🟢 {rows} recetas sintéticas generadas en {time.perf_counter() - t0:.1f}s")
+
+        before = {name: measure(old, params, repeat) for name, old, _, params in QUERIES}
+        t0 = time.perf_counter()
+        migrations.migrate()
+        migration_s = time.perf_counter() - t0
+        after = {name: measure(new, params, repeat) for name, _, new, params in QUERIES}
+    finally:
+        db_sqlite.close_conn()
+        tmp.cleanup()
+
+    return {"rows": rows, "repeat": repeat, "migration_s": migration_s, "before": before, "after": after}
+
+def report(result: dict):
+    print(f"\nMigración {OLD_SCHEMA} → {migrations.latest_version()}: {result['migration_s']:.1f}s\n")
+    for name, *_ in QUERIES:
+        b, a = result["before"][name], result["after"][name]
+        speedup = b["median_ms"] / a["median_ms"] if a["median_ms"] else float("inf")
+        print(f"▶ {name}: {b['median_ms']:.3f} ms → {a['median_ms']:.3f} ms (x{speedup:.0f})")
+        print(f"    antes:   {' | '.join(b['plan'])}")
+        print(f"    después: {' | '.join(a['plan'])}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.repeat)
+    report(result)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
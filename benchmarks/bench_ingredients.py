@@ -0,0 +1,101 @@
+"""
+Benchmark de los ingredientes (ingredients.py).
+
+Sobre una biblioteca sintética de --size recetas (la misma de bench_app.py):
+
+  backfill   recetas por segundo extrayendo y guardando los ingredientes con
+             --workers procesos
+  consultas  latencia (p50/p95) de find/count y using_only con el índice
+             invertido, frente a la misma consulta con LIKE sobre las
+             descripciones (lo único posible sin el índice)
+
+Uso: python -m benchmarks.bench_ingredients [--size 50k|500k] [--workers N] [--keep DIR] [--json salida.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import db_sqlite
+import ingredients
+from benchmarks.bench_app import SIZES, build_library, summarize
+
+QUERIES = {
+    "chocolate": ("chocolate", ["%chocolate%"], []),
+    "harina, huevo|leche, -nuez": ("harina, huevo|leche, -nuez", ["%harina%", ("%huevo%", "%leche%")], ["%nuez%", "%nueces%"]),
+    "queso crema, fresa, -canela": ("queso crema, fresa, -canela", ["%queso crema%", "%fresa%"], ["%canela%"]),
+}
+ONLY = ["harina", "huevo", "azucar", "mantequilla", "leche", "levadura", "vainilla", "limon"]
+
+def timed(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return summarize(timings)
+
+def like_scan(required: list, excluded: list) -> int:
+    """La misma consulta recorriendo las descripciones (sin índice)."""
+    conditions, params = [], []
+    for term in required:
+        alternatives = term if isinstance(term, tuple) else (term,)
+        conditions.append("(" + " OR ".join("caption LIKE ?" for _ in alternatives) + ")")
+        params += alternatives
+    for term in excluded:
+        conditions.append("caption NOT LIKE ?")
+        params.append(term)
+    sql = "SELECT COUNT(*) FROM recipes WHERE " + " AND ".join(conditions)
+    return db_sqlite.get_conn().execute(sql, params).fetchone()[0]
+
+def run(rows: int, workers, repeat: int, keep=None) -> dict:
+    tmp = tempfile.TemporaryDirectory() if keep is None else None
+    path = build_library(rows, Path(keep or tmp.name) / f"ingredients-{rows}.db")
+    try:
+        db_sqlite.set_db_file(path)
+        db_sqlite.init_db()
+        # Todo pendiente otra vez, para medir el backfill completo
+        with db_sqlite.transaction() as cur:
+            cur.execute("UPDATE ingredient_extractions SET total = NULL")
+        t0 = time.perf_counter()
+        done = ingredients.backfill(workers=workers)
+        backfill_s = time.perf_counter() - t0
+
+        queries = {}
+        for name, (query, required, excluded) in QUERIES.items():
+            queries[name] = {
+                "matches": ingredients.count(query),
+                "index": timed(lambda: (ingredients.count(query), ingredients.find(query, limit=21)), repeat),
+                "like": timed(lambda: like_scan(required, excluded), max(3, repeat // 20)),
+            }
+        queries["solo con " + ", ".join(ONLY)] = {
+            "matches": ingredients.count_using_only(ONLY),
+            "index": timed(lambda: (ingredients.count_using_only(ONLY), ingredients.using_only(ONLY, limit=21)),
+                           max(3, repeat // 5)),
+        }
+        return {"rows": done, "backfill_s": round(backfill_s, 2),
+                "backfill_rows_per_s": round(done / backfill_s, 1), "queries": queries}
+    finally:
+        db_sqlite.close_conn()
+        if tmp is not None:
+            tmp.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=SIZES, default="50k")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--keep", type=Path, help="guardar y reutilizar aquí la biblioteca generada")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(SIZES[args.size], args.workers, args.repeat, keep=args.keep)
+    print(f"▶ backfill: {result['rows']} recetas en {result['backfill_s']}s ({result['backfill_rows_per_s']:.0f}/s)")
+    for name, q in result["queries"].items():
+        line = f"▶ {name} ({q['matches']} recetas): índice p50 {q['index']['p50_ms']:.2f} ms, p95 {q['index']['p95_ms']:.2f} ms"
+        if "like" in q:
+            line += f"; LIKE p50 {q['like']['p50_ms']:.2f} ms"
+        print(line)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
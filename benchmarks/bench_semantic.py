@@ -0,0 +1,104 @@
+"""
+Benchmark de la búsqueda semántica (semantic.py).
+
+Sobre una biblioteca sintética de --size recetas (la misma de bench_app.py)
+construye el índice y mide:
+
+  build      tiempo de construcción y recetas por segundo
+  search     latencia de una consulta (p50/p95/p99)
+  batch      latencia por consulta con search_many de --batch consultas
+  similar    latencia de "recetas parecidas" de una receta
+  recall@10  cuántos de los 10 mejores de una comparación exhaustiva con todos
+             los vectores del índice devuelve la búsqueda por grupos (1.0 = todos)
+
+Uso: python -m benchmarks.bench_semantic [--size 50k|500k] [--workers N] [--keep DIR] [--json salida.json]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import db_sqlite
+import semantic
+from benchmarks.bench_app import SIZES, build_library, summarize
+
+QUERIES = [
+    "postre sin horno", "tarta de queso", "algo de chocolate", "galletas saludables", "pan casero",
+    "receta rápida con fresas", "bizcocho esponjoso de limón", "desayuno con avena", "helado casero",
+    "dulce de navidad", "brownie", "masa madre", "magdalenas", "tortitas americanas", "postre frío",
+    "sin gluten", "tarta de zanahoria", "cupcakes de vainilla", "roscón", "flan de huevo",
+]
+
+def timed(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return summarize(timings)
+
+def exact_top(index, queries: np.ndarray, k: int, step: int = 65536) -> list:
+    """Los k mejores comparando con todos los vectores del índice (referencia para el recall)."""
+    scores = np.concatenate([index.vectors(i, i + step) @ queries.T
+                             for i in range(0, len(index.ids), step)])
+    return [set(index.ids[np.argsort(-scores[:, q])[:k]].tolist()) for q in range(len(queries))]
+
+def run(rows: int, workers, repeat: int, batch: int, keep=None) -> dict:
+    tmp = tempfile.TemporaryDirectory() if keep is None else None
+    path = build_library(rows, Path(keep or tmp.name) / f"semantic-{rows}.db")
+    try:
+        db_sqlite.set_db_file(path)
+        db_sqlite.init_db()
+        t0 = time.perf_counter()
+        indexed = semantic.build(workers=workers)
+        build_s = time.perf_counter() - t0
+        print(f"🟢 Índice de {indexed} recetas en {build_s:.1f}s")
+
+        semantic.search(QUERIES[0])  # carga el índice
+        index = semantic._index()
+        rng = random.Random(0)
+        sample_ids = [int(i) for i in rng.sample(list(index.ids), min(50, len(index.ids)))]
+        queries = iter(range(10 ** 9))
+        result = {
+            "rows": indexed,
+            "build_s": round(build_s, 2),
+            "build_rows_per_s": round(indexed / build_s, 1),
+            "clusters": 0 if index.centroids is None else len(index.centroids),
+            "search": timed(lambda: semantic.search(QUERIES[next(queries) % len(QUERIES)]), repeat),
+            "batch": {k: round(v / batch, 4) if k.endswith("_ms") else v for k, v in
+                      timed(lambda: semantic.search_many(QUERIES[:batch]), max(3, repeat // batch)).items()},
+            "similar": timed(lambda: semantic.similar(sample_ids[next(queries) % len(sample_ids)]), repeat),
+        }
+
+        vectors = index.encoder.encode([(q, "") for q in QUERIES])
+        found = semantic.search_vectors(vectors, k=10)
+        exact = exact_top(index, vectors, 10)
+        recalls = [len({i for i, _ in f} & e) / len(e) for f, e in zip(found, exact) if e]
+        result["recall_at_10"] = round(sum(recalls) / len(recalls), 3)
+        return result
+    finally:
+        db_sqlite.close_conn()
+        if tmp is not None:
+            tmp.cleanup()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=SIZES, default="50k")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=len(QUERIES))
+    parser.add_argument("--keep", type=Path, help="guardar y reutilizar aquí la biblioteca generada")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(SIZES[args.size], args.workers, args.repeat, args.batch, keep=args.keep)
+    for name in ("search", "batch", "similar"):
+        t = result[name]
+        print(f"▶ {name}: p50 {t['p50_ms']:.2f} ms, p95 {t['p95_ms']:.2f} ms, p99 {t['p99_ms']:.2f} ms")
+    print(f"▶ recall@10: {result['recall_at_10']} ({result['clusters']} grupos)")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,88 @@
+"""
+Benchmark de arranque: cuánto cuesta importar cada punto de entrada.
+
+Cada uno se importa --repeat veces en un proceso nuevo con `python -X importtime`
+y se queda el mejor tiempo (solo los imports, sin el arranque del intérprete):
+
+  app              import app + create_app(): lo que paga cada trabajador de gunicorn
+  jobs             los hilos de scraping (instaloader llega con el primer trabajo)
+  eliminar_vacias  scripts sueltos
+  renovar_folders
+
+Sale con código 1 si alguno pasa de su presupuesto (--scale lo multiplica para
+máquinas más lentas) o si carga un módulo que solo hace falta más tarde
+(instaloader y requests para scrapear, numpy para la búsqueda semántica).
+tests/test_startup.py comprueba lo mismo con pytest. Los presupuestos dejan
+margen (en torno al doble de lo medido en un servidor pequeño): lo que no debe
+cargarse lo vigila la lista de módulos, no el tiempo.
+
+Uso: python -m benchmarks.bench_startup [--repeat 5] [--scale 1.0] [--json salida.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MARK = "--- inicio ---"
+
+# nombre: (código, presupuesto en ms, módulos que no debe cargar)
+ENTRY_POINTS = {
+    "app": ("import app; app.create_app()", 700, ("instaloader", "requests", "numpy", "scraper", "semantic")),
+    "jobs": ("import jobs", 300, ("instaloader", "requests", "numpy", "flask")),
+    "eliminar_vacias": ("import eliminar_vacias", 150, ("instaloader", "requests", "numpy", "flask")),
+    "renovar_folders": ("import renovar_folders", 1000, ("instaloader", "flask", "semantic")),
+}
+WATCHED = sorted({m for _, _, forbidden in ENTRY_POINTS.values() for m in forbidden})
+
+def measure(code: str) -> tuple:
+    """(ms importando, módulos vigilados cargados) en un proceso nuevo."""
+    script = (f"import sys; sys.stderr.write({MARK!r} + '\\n'); {code}\n"
+              f"print(' '.join(m for m in {WATCHED!r} if m in sys.modules))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    lines = proc.stderr.splitlines()
+    total_us = 0
+    for line in lines[lines.index(MARK) + 1:]:
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if len(name) - len(name.lstrip()) == 1:  # solo los del primer nivel (incluyen a los demás)
+            total_us += int(cumulative)
+    return total_us / 1000, proc.stdout.split()
+
+def run(repeat: int, scale: float) -> dict:
+    result = {}
+    for name, (code, budget, forbidden) in ENTRY_POINTS.items():
+        timings, loaded = [], []
+        for _ in range(repeat):
+            ms, loaded = measure(code)
+            timings.append(ms)
+        result[name] = {
+            "ms": round(min(timings), 1),
+            "budget_ms": round(budget * scale, 1),
+            "unexpected": [m for m in loaded if m in forbidden],
+        }
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica los presupuestos")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(args.repeat, args.scale)
+    failures = 0
+    for name, r in result.items():
+        ok = r["ms"] <= r["budget_ms"] and not r["unexpected"]
+        failures += not ok
+        line = f"{'✅' if ok else '🔴'} {name}: {r['ms']:.0f} ms (presupuesto {r['budget_ms']:.0f} ms)"
+        if r["unexpected"]:
+            line += f"; carga {', '.join(r['unexpected'])}"
+        print(line)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    if failures:
+        raise SystemExit(1)
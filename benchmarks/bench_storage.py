@@ -0,0 +1,113 @@
+"""
+Benchmark común a los dos almacenamientos (storage.Repository).
+
+Para cada motor mide la carga por lotes (upsert_recipes) y las consultas de la
+web. Que los dos se comporten igual lo comprueba tests/test_storage.py.
+
+SQLite va sobre un fichero temporal. MySQL necesita un servidor (vale uno local
+sin contenedor: mysqld o mariadbd) y una base de datos desechable, que se vacía:
+--mysql-database recetas_bench. Si no se indica, no está instalado
+mysql-connector-python o no hay conexión, se omite.
+
+Uso: python -m benchmarks.bench_storage [--rows 20000] [--repeat 30] [--mysql-database recetas_bench] [--json salida.json]
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import db_sqlite
+from benchmarks.synthetic import fake_recipes, FOLDERS
+from storage import SQLiteRepository, make_repository
+
+# ----------------- BENCHMARK -----------------
+def timed(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return {"p50_ms": statistics.median(timings), "p95_ms": p95}
+
+def bench(repo, rows: int, repeat: int) -> dict:
+    t0 = time.perf_counter()
+    repo.upsert_recipes(fake_recipes(rows))
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    repo.upsert_recipes(fake_recipes(rows // 10))  # actualizaciones: todas las url existen
+    update_s = time.perf_counter() - t0
+
+    middle = repo.fetch_recipes_paginated(limit=1, offset=rows // 2)[0]["id"]
+    queries = {
+        "portada": lambda: repo.fetch_recipes_paginated(limit=21),
+        "página keyset a mitad": lambda: repo.fetch_recipes_paginated(limit=21, before_id=middle),
+        "carpeta": lambda: repo.fetch_recipes_paginated(limit=21, folder=FOLDERS[3]),
+        "contar carpeta": lambda: repo.count_recipes(folder=FOLDERS[3]),
+        "búsqueda": lambda: repo.fetch_recipes_paginated(limit=21, query="tarta queso"),
+        "contar búsqueda": lambda: repo.count_recipes(query="tarta queso"),
+        "carpetas con contadores": repo.get_folder_counts,
+        "receta": lambda: repo.fetch_recipe(middle),
+    }
+    return {
+        "load_rows_per_s": rows / load_s,
+        "update_rows_per_s": (rows // 10) / update_s,
+        "queries": {name: timed(fn, repeat) for name, fn in queries.items()},
+    }
+
+class Skip(Exception):
+    pass
+
+def run_backend(name: str, rows: int, repeat: int, mysql_database=None) -> dict:
+    if name == "sqlite":
+        tmp = tempfile.TemporaryDirectory()
+        db_sqlite.set_db_file(Path(tmp.name) / "bench.db")
+        repo = SQLiteRepository()
+    else:
+        tmp = None
+        try:
+            repo = make_repository("mysql", database=mysql_database)
+            repo.drop_all()
+        except ImportError as e:
+            raise Skip(f"falta mysql-connector-python ({e})")
+        except Exception as e:  # sin servidor, sin permisos...
+            raise Skip(f"sin conexión ({e})")
+    try:
+        repo.init_db()
+        return bench(repo, rows, repeat)
+    finally:
+        if tmp is not None:
+            db_sqlite.close_conn()
+            tmp.cleanup()
+
+def report(results: dict):
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"\n⏭️ {name}: omitido ({r['skipped']})")
+            continue
+        print(f"\n▶ {name}")
+        print(f"    carga {r['load_rows_per_s']:.0f} recetas/s, actualización {r['update_rows_per_s']:.0f} recetas/s")
+        for q, t in r["queries"].items():
+            print(f"    {q}: p50 {t['p50_ms']:.3f} ms, p95 {t['p95_ms']:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--mysql-database", default=None, help="base de datos desechable para MySQL (se vacía)")
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    results = {"sqlite": run_backend("sqlite", args.rows, args.repeat)}
+    if not args.mysql_database:
+        results["mysql"] = {"skipped": "sin --mysql-database"}
+    else:
+        try:
+            results["mysql"] = run_backend("mysql", args.rows, args.repeat, mysql_database=args.mysql_database)
+        except Skip as e:
+            results["mysql"] = {"skipped": str(e)}
+    report(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False))
@@ -0,0 +1,92 @@
+"""
+Benchmark de la escritura de recetas: recetas por segundo de cada forma de guardar.
+
+  anterior             SELECT por url + UPDATE o INSERT, una transacción por receta
+  upsert_recipe        INSERT ... ON CONFLICT(url) DO UPDATE ... RETURNING id, una transacción por receta
+  upsert_recipe (tx)   lo mismo, todas las recetas de un lote en una transacción
+  upsert_recipes       executemany por lotes de --batch, una transacción por lote
+
+Cada forma se mide dos veces sobre una base de datos vacía: insertando recetas
+nuevas y luego actualizando las mismas (todas las url ya existen).
+
+Uso: python -m benchmarks.bench_upsert [--rows 20000] [--batch 500] [--json salida.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import db_sqlite
+from benchmarks.synthetic import fake_recipes
+
+def legacy_upsert(data: dict) -> int:
+    """El upsert_recipe anterior: SELECT y luego UPDATE o INSERT."""
+    with db_sqlite.transaction() as cur:
+        folder_id = db_sqlite._folder_id(cur, data.get('folder'))
+        cur.execute("SELECT id FROM recipes WHERE url=?", (data.get('url'),))
+        row = cur.fetchone()
+        values = db_sqlite._upsert_values(data, folder_id)
+        if row:
+            cur.execute(f"UPDATE recipes SET {', '.join(f'{c}=?' for c in db_sqlite.UPSERT_COLUMNS[1:])} WHERE id=?",
+                        values[1:] + (row['id'],))
+            return row['id']
+        cur.execute(f"INSERT INTO recipes ({', '.join(db_sqlite.UPSERT_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(db_sqlite.UPSERT_COLUMNS))})", values)
+        return cur.lastrowid
+
+def one_by_one(fn):
+    def run(items, batch):
+        for data in items:
+            fn(data)
+    return run
+
+def in_transactions(items, batch):
+    for i in range(0, len(items), batch):
+        with db_sqlite.transaction():
+            for data in items[i:i + batch]:
+                db_sqlite.upsert_recipe(data)
+
+def bulk(items, batch):
+    db_sqlite.upsert_recipes(items, batch_size=batch)
+
+METHODS = {
+    "anterior": one_by_one(legacy_upsert),
+    "upsert_recipe": one_by_one(db_sqlite.upsert_recipe),
+    "upsert_recipe (tx)": in_transactions,
+    "upsert_recipes": bulk,
+}
+
+def run(rows: int, batch: int) -> dict:
+    items = list(fake_recipes(rows))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, method in METHODS.items():
+            db_sqlite.set_db_file(Path(tmp) / f"{len(results)}.db")
+            db_sqlite.init_db()
+            result = {}
+            for phase in ("insert", "update"):
+                t0 = time.perf_counter()
+                method(items, batch)
+                result[f"{phase}_rows_per_s"] = rows / (time.perf_counter() - t0)
+            assert db_sqlite.count_recipes() == rows
+            results[name] = result
+            print(f"▶ {name}: {result['insert_rows_per_s']:.0f} inserciones/s, "
+                  f"{result['update_rows_per_s']:.0f} actualizaciones/s")
+        db_sqlite.close_conn()
+    return {"rows": rows, "batch": batch, "methods": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=db_sqlite.UPSERT_BATCH)
+    parser.add_argument("--json", type=Path, help="guardar resultados en este fichero")
+    args = parser.parse_args()
+
+    result = run(args.rows, args.batch)
+    base = result["methods"]["anterior"]
+    for name, r in result["methods"].items():
+        print(f"    {name}: x{r['insert_rows_per_s'] / base['insert_rows_per_s']:.1f} al insertar, "
+              f"x{r['update_rows_per_s'] / base['update_rows_per_s']:.1f} al actualizar")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,67 @@
+"""
+Generador de bibliotecas sintéticas de recetas para los benchmarks.
+
+Las descripciones imitan las de Instagram (español, emojis, lista de
+ingredientes, hashtags) y las carpetas siguen una distribución sesgada: unas
+pocas concentran la mayoría de recetas, como en una biblioteca real.
+"""
+import random
+from datetime import datetime, timedelta
+
+FOLDERS = [
+    "Bizcochos", "Tartas", "Galletas", "Panes", "Brownies", "Cupcakes", "Donuts",
+    "Helados", "Bollería", "Masas", "Tortitas, crepes y gofres", "Macarons",
+    "Banana Bread", "Recetas saludables", "Roscones y briox", "Navidad", "Otros",
+]
+DISHES = [
+    "bizcocho de limón", "tarta de queso", "galletas de avena", "pan de masa madre",
+    "brownie de chocolate", "cupcakes de vainilla", "donuts glaseados", "helado de fresa",
+    "cruasanes caseros", "masa de pizza", "tortitas americanas", "macarons de frambuesa",
+    "banana bread", "bizcocho de zanahoria", "roscón de reyes", "tarta fría de queso",
+    "flan de huevo", "natillas", "magdalenas esponjosas", "coulant de chocolate",
+]
+INGREDIENTS = [
+    "harina", "azúcar", "huevos", "mantequilla", "leche", "levadura", "chocolate",
+    "queso crema", "nata", "vainilla", "canela", "limón", "fresas", "plátano",
+    "avena", "aceite de oliva", "sal", "cacao en polvo", "almendra molida", "miel",
+]
+UNITS = ["g", "ml", "cucharadas", "cucharaditas", "unidades", "tazas"]
+ADJECTIVES = ["fácil", "rápido", "sin horno", "esponjoso", "casero", "saludable", "cremoso", "crujiente"]
+EMOJIS = ["😍", "🍰", "🍪", "🤤", "✨", "🔥", "👩‍🍳", "🍫"]
+
+def folder_weights(folders=FOLDERS):
+    """Pesos tipo Zipf: la primera carpeta es la más poblada."""
+    return [1.0 / (i + 1) for i in range(len(folders))]
+
+def fake_caption(rng: random.Random) -> str:
+    dish = rng.choice(DISHES)
+    lines = [f"{dish.capitalize()} {rng.choice(ADJECTIVES)} {rng.choice(EMOJIS)}", "", "Ingredientes:"]
+    for ing in rng.sample(INGREDIENTS, rng.randint(4, 10)):
+        lines.append(f"- {rng.randint(1, 500)} {rng.choice(UNITS)} de {ing}")
+    lines += ["", "Preparación:"]
+    for step in range(1, rng.randint(3, 8)):
+        lines.append(f"{step}. Mezclar {rng.choice(INGREDIENTS)} con {rng.choice(INGREDIENTS)} "
+                     f"y hornear {rng.randint(10, 60)} minutos a {rng.choice([160, 170, 180, 200])}º.")
+    lines += ["", " ".join(f"#{w.replace(' ', '')}" for w in rng.sample(DISHES, 3))]
+    return "\n".join(lines)
+
+def fake_recipes(n: int, seed: int = 42, folders=FOLDERS):
+    """Genera `n` recetas sintéticas (dicts con las claves que usa upsert_recipe)."""
+    rng = random.Random(seed)
+    weights = folder_weights(folders)
+    start = datetime(2018, 1, 1)
+    for i in range(n):
+        shortcode = f"S{i:010d}"
+        caption = fake_caption(rng)
+        yield {
+            "url": f"https://www.instagram.com/p/{shortcode}/",
+            "shortcode": shortcode,
+            "author": f"user_{rng.randint(1, max(1, n // 20))}",
+            "caption": caption,
+            "image_path": f"{shortcode}.jpg",
+            "video_path": f"{shortcode}.mp4" if rng.random() < 0.6 else None,
+            "posted_at": (start + timedelta(minutes=i * 7)).isoformat(),
+            "likes": rng.randint(0, 50000),
+            "title": caption.split("\n", 1)[0][:60],
+            "folder": rng.choices(folders, weights)[0],
+        }
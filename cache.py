@@ -0,0 +1,125 @@
+"""
+Caché de páginas y consultas.
+
+Las claves llevan la versión de los datos (data_version(), que sube cualquier
+escritura en recipes o folders: triggers en SQLite, una vez por transacción en
+MySQL, desde cualquier proceso), así que nunca hace falta invalidar a mano:
+tras un cambio las claves viejas dejan de pedirse y acaban saliendo por LRU o TTL.
+
+Por defecto la caché vive en memoria de cada proceso. Con CACHE_URL=redis://...
+(y el paquete redis instalado) se comparte entre procesos.
+"""
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config import settings
+from storage import repo
+
+MISSING = object()
+
+def data_version() -> int:
+    return repo.data_version()
+
+class MemoryCache:
+    """LRU con caducidad, seguro entre hilos."""
+    def __init__(self, maxsize: int = 512, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clave -> (caduca, valor)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.stats["misses"] += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def info(self) -> dict:
+        return {"backend": "memory", "size": len(self._data), "maxsize": self.maxsize, **self.stats}
+
+class RedisCache:
+    """Misma interfaz que MemoryCache sobre Redis (compartida entre procesos)."""
+    def __init__(self, url: str, prefix: str, ttl: float = 300):
+        import redis  # opcional: solo si se configura CACHE_URL
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Any:
+        raw = self._redis.get(self.prefix + key)
+        if raw is None:
+            self.stats["misses"] += 1
+            return MISSING
+        self.stats["hits"] += 1
+        return pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._redis.set(self.prefix + key, pickle.dumps(value), ex=int(ttl or self.ttl))
+
+    def clear(self):
+        for key in self._redis.scan_iter(self.prefix + "*"):
+            self._redis.delete(key)
+
+    def info(self) -> dict:
+        return {"backend": "redis", **self.stats}
+
+def make_cache(name: str, maxsize: int = 512, ttl: float = None, url: Optional[str] = None):
+    ttl = ttl or settings.CACHE_TTL
+    url = settings.CACHE_URL if url is None else url
+    if url:
+        return RedisCache(url, prefix=f"recetas:{name}:", ttl=ttl)
+    return MemoryCache(maxsize=maxsize, ttl=ttl)
+
+def configure(url: Optional[str] = None, ttl: Optional[float] = None):
+    """Crea de nuevo las cachés del proceso (create_app en app.py); url="" = en memoria."""
+    global pages, queries
+    pages = make_cache("pages", maxsize=256, ttl=ttl, url=url)
+    queries = make_cache("queries", maxsize=1024, ttl=ttl, url=url)
+
+# Cachés del proceso: HTML ya renderizado (pages) y resultados de consultas (queries)
+configure()
+
+def memoize(fn: Callable) -> Callable:
+    """Cachea el resultado de una consulta por (función, argumentos, versión de los datos)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = f"{fn.__name__}:{data_version()}:{args!r}:{sorted(kwargs.items())!r}"
+        value = queries.get(key)
+        if value is MISSING:
+            value = fn(*args, **kwargs)
+            queries.set(key, value)
+        return value
+    return wrapper
+
+def info() -> dict:
+    result = {"data_version": data_version()}
+    for name, c in (("pages", pages), ("queries", queries)):
+        stats = c.info()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else None
+        result[name] = stats
+    return result
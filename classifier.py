@@ -0,0 +1,223 @@
+"""
+Servicio de clasificación de recetas con un modelo local (Ollama).
+
+Habla con `ollama serve` por HTTP reutilizando conexiones (keep-alive) y con el
+modelo cargado entre peticiones (keep_alive). Lanza varias peticiones a la vez
+con asyncio, agrupa varias descripciones en un mismo prompt y guarda cada
+resultado en classification_cache, con clave hash(descripción, autor, modelo,
+categorías, versión del prompt). Volver a clasificar solo cuesta llamadas al
+modelo para las recetas nuevas o modificadas.
+
+Para probarlo sin modelo: python ollama_stub.py y OLLAMA_URL=http://localhost:11435
+"""
+import asyncio
+import hashlib
+import json
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import taxonomy
+from config import settings
+from db_sqlite import get_conn, transaction
+
+PROMPT_VERSION = 1
+DEFAULT_TITLE = "Receta sin título"
+DEFAULT_FOLDER = taxonomy.FALLBACK
+KEEP_ALIVE = "30m"  # tiempo que Ollama mantiene el modelo en memoria
+
+PROMPT_HEADER = """
+Eres un asistente que organiza recetas de Instagram en carpetas.
+
+Para cada publicación:
+1. Genera un título breve y atractivo para la receta (máx. 7 palabras).
+2. Asigna la receta a UNA sola categoría de la siguiente lista (elige solo una, sin inventar nuevas):
+
+{categories}
+
+Si no encaja claramente en ninguna, asigna "Otros".
+"""
+
+SINGLE_PROMPT = PROMPT_HEADER + """
+Publicación:
+
+Autor: {author}
+Descripción: {caption}
+
+Responde SOLO en formato JSON:
+{{"title": "...", "folder": "..."}}
+"""
+
+BATCH_PROMPT = PROMPT_HEADER + """
+Publicaciones:
+
+{posts}
+
+Responde SOLO en formato JSON, con un elemento por publicación y en el mismo orden:
+{{"recetas": [{{"n": 1, "title": "...", "folder": "..."}}, ...]}}
+"""
+
+Result = Tuple[str, str]  # (título, carpeta)
+
+class Classifier:
+    def __init__(self, categories: Sequence[str] = None, model: str = None, url: str = None,
+                 concurrency: int = None, batch_size: int = 5, timeout: float = 120,
+                 taxonomy_version: int = None):
+        if categories is None:
+            categories, taxonomy_version = taxonomy.CATEGORIAS, taxonomy.TAXONOMY_VERSION
+        self.categories = list(categories)
+        self.taxonomy_version = taxonomy_version or 0
+        self.model = model or settings.OLLAMA_MODEL
+        self.url = (url or settings.OLLAMA_URL).rstrip("/")
+        self.concurrency = concurrency or settings.OLLAMA_CONCURRENCY
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.stats = {"cached": 0, "requests": 0, "errors": 0, "local": 0}  # local: folder_model.py
+
+        # Una sesión compartida: conexiones HTTP persistentes, una por petición simultánea
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._fingerprint = hashlib.sha256(
+            json.dumps([self.model, self.categories, PROMPT_VERSION], ensure_ascii=False).encode()
+        ).hexdigest()
+
+    # ----------------- API -----------------
+    @property
+    def stamp(self) -> str:
+        """Valor de recipes.classified_with para lo que clasifica este servicio."""
+        return taxonomy.stamp(self.model, PROMPT_VERSION, self.taxonomy_version)
+
+    def classify(self, caption: str, author: str) -> Result:
+        return self.classify_all([(caption, author)])[0]
+
+    def classify_all(self, posts: Iterable[Tuple[str, str]],
+                     fallback: Optional[Result] = (DEFAULT_TITLE, DEFAULT_FOLDER)) -> List[Optional[Result]]:
+        """
+        Clasifica una lista de (descripción, autor) y devuelve [(título, carpeta)] en el mismo orden.
+        Si el modelo falla para alguna, en su lugar va `fallback`.
+        """
+        posts = [(caption or "", author or "") for caption, author in posts]
+        keys = [self.cache_key(caption, author) for caption, author in posts]
+        cached = self._cache_get(keys)
+        self.stats["cached"] += len(cached)
+
+        # Pendientes sin repetir (la misma descripción dos veces se clasifica una sola vez)
+        pending = {}
+        for key, post in zip(keys, posts):
+            if key not in cached:
+                pending.setdefault(key, post)
+        if pending:
+            fresh = asyncio.run(self._classify_pending(list(pending.items())))
+            self._cache_put(fresh)
+            cached.update(fresh)
+        return [cached.get(key, fallback) for key in keys]
+
+    def cache_key(self, caption: str, author: str) -> str:
+        return hashlib.sha256(f"{self._fingerprint}\0{author}\0{caption}".encode()).hexdigest()
+
+    # ----------------- CACHÉ -----------------
+    def _cache_get(self, keys: List[str]) -> dict:
+        found = {}
+        conn = get_conn()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for r in conn.execute(f"SELECT key, title, folder FROM classification_cache WHERE key IN ({marks})", chunk):
+                found[r["key"]] = (r["title"], r["folder"])
+        return found
+
+    def _cache_put(self, results: dict):
+        with transaction() as cur:
+            cur.executemany(
+                "INSERT OR REPLACE INTO classification_cache (key, title, folder) VALUES (?, ?, ?)",
+                [(key, title, folder) for key, (title, folder) in results.items()],
+            )
+
+    # ----------------- MODELO -----------------
+    async def _classify_pending(self, items: list) -> dict:
+        """items: [(clave, (descripción, autor))]. Devuelve {clave: resultado} de los que han ido bien."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+        async def run(batch):
+            async with semaphore:
+                return await asyncio.to_thread(self._classify_batch, batch)
+
+        results = {}
+        for done in await asyncio.gather(*(run(b) for b in batches)):
+            results.update(done)
+        return results
+
+    def _classify_batch(self, batch: list) -> dict:
+        if len(batch) > 1:
+            results = self._parse_batch(self._generate(self._batch_prompt(batch)), len(batch))
+            if results is not None:
+                return {key: result for (key, _), result in zip(batch, results)}
+        # Una sola receta, o el modelo no respetó el formato del lote: de una en una
+        results = {}
+        for key, (caption, author) in batch:
+            raw = self._generate(SINGLE_PROMPT.format(categories=", ".join(self.categories),
+                                                      author=author, caption=caption))
+            result = self._parse_single(raw)
+            if result is not None:
+                results[key] = result
+        return results
+
+    def _batch_prompt(self, batch: list) -> str:
+        posts = "\n\n".join(
+            f"[{n}]\nAutor: {author}\nDescripción: {caption}"
+            for n, (_, (caption, author)) in enumerate(batch, 1)
+        )
+        return BATCH_PROMPT.format(categories=", ".join(self.categories), posts=posts)
+
+    def _generate(self, prompt: str) -> Optional[str]:
+        self.stats["requests"] += 1
+        try:
+            with metrics.timer("ollama"):
+                resp = self._session.post(f"{self.url}/api/generate", json={
+                    "model": self.model,
+                    "prompt": prompt,
+                    "format": "json",
+                    "stream": False,
+                    "keep_alive": KEEP_ALIVE,
+                }, timeout=self.timeout)
+                resp.raise_for_status()
+                return resp.json().get("response", "")
+        except (requests.RequestException, ValueError) as e:
+            self.stats["errors"] += 1
+            print("❌ Error Ollama:", e)
+            return None
+
+    def _result(self, data) -> Optional[Result]:
+        if not isinstance(data, dict):
+            return None
+        title = str(data.get("title") or DEFAULT_TITLE).strip()
+        folder = str(data.get("folder") or "").strip()
+        if folder not in self.categories:
+            folder = taxonomy.FALLBACK
+        return title, folder
+
+    def _parse_single(self, raw: Optional[str]) -> Optional[Result]:
+        if raw is None:
+            return None
+        try:
+            return self._result(json.loads(raw))
+        except ValueError:
+            return None
+
+    def _parse_batch(self, raw: Optional[str], expected: int) -> Optional[List[Result]]:
+        if raw is None:
+            return None
+        try:
+            items = json.loads(raw).get("recetas")
+        except (ValueError, AttributeError):
+            return None
+        if not isinstance(items, list) or len(items) != expected:
+            return None
+        results = [self._result(item) for item in items]
+        return None if None in results else results
@@ -12,6 +12,37 @@ class Settings:
     DB_USER = os.getenv("DB_USER", "root")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "")
     DB_NAME = os.getenv("DB_NAME", "recetas")
+    # Almacenamiento de recetas y carpetas (storage.py): "sqlite" o "mysql"
+    DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    # Ollama (servidor HTTP local, `ollama serve`)
+    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+    OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+    # Clasificador local (folder_model.py): probabilidad mínima para no preguntar al modelo; 1 = siempre el modelo
+    LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+    # Límites de descarga de multimedia (bytes)
+    MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+    MAX_VIDEO_BYTES = int(os.getenv("MAX_VIDEO_BYTES", str(300 * 1024 * 1024)))
+    # Servir multimedia: "" (Flask), "sendfile" (X-Sendfile) o "accel" (X-Accel-Redirect de nginx)
+    MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+    MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/_uploads/")
+    # Póster y vista previa de los vídeos (previews.py)
+    FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+    FFMPEG_WORKERS = int(os.getenv("FFMPEG_WORKERS", "2"))
+    # Búsqueda semántica (semantic.py): vacío = TF-IDF con hashing; o un modelo local de sentence-transformers
+    SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL", "")
+    # Caché de páginas y consultas (cache.py); CACHE_URL=redis://... para compartirla entre procesos
+    CACHE_URL = os.getenv("CACHE_URL", "")
+    CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+    # Métricas (metrics.py): estadísticas por sentencia SQL, umbral de consulta lenta y ?profile=1
+    METRICS_SQL = os.getenv("METRICS_SQL", "1") == "1"
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+    PROFILING = os.getenv("PROFILING", "") == "1"
+    # Cola de scraping (jobs.py)
+    SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+    SCRAPE_RATE = float(os.getenv("SCRAPE_RATE", "0.5"))  # trabajos que empiezan por segundo, en total
+    SCRAPE_MAX_PER_HOST = int(os.getenv("SCRAPE_MAX_PER_HOST", "2"))
 
 
 settings = Settings()
\ No newline at end of file
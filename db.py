@@ -1,78 +1,331 @@
-import mysql.connector as mysql
-from mysql.connector import Error
+"""
+Almacenamiento de recetas y carpetas en MySQL (DB_BACKEND=mysql).
+
+Misma interfaz que el de SQLite (storage.Repository). Las conexiones salen de un
+pool de DB_POOL_SIZE conexiones; si están todas ocupadas, se espera a que quede
+una libre. La búsqueda usa un índice FULLTEXT en modo booleano (cada palabra
+como prefijo y todas obligatorias, igual que fts_query en SQLite).
+
+Necesita mysql-connector-python.
+"""
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from mysql.connector import pooling
+
 from config import settings
+from db_sqlite import LIST_FIELDS, RECIPE_FIELDS, UPSERT_BATCH, UPSERT_COLUMNS as RECIPE_COLUMNS
+from storage import Repository
+from taxonomy import MANUAL, FALLBACK
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS folders (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(191) NOT NULL,
+        UNIQUE KEY uq_folders_name (name)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recipes (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        url VARCHAR(512) NOT NULL,
+        shortcode VARCHAR(64),
+        author VARCHAR(255),
+        caption MEDIUMTEXT,
+        image_path VARCHAR(255),
+        video_path VARCHAR(255),
+        posted_at VARCHAR(32),
+        likes INT,
+        title VARCHAR(255),
+        folder_id INT NULL,
+        classified_with VARCHAR(64),
+        thumb_key VARCHAR(32),
+        poster_path VARCHAR(255),
+        preview_path VARCHAR(255),
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3),
+        UNIQUE KEY uq_recipes_url (url),
+        KEY idx_recipes_folder_id (folder_id, id),
+        KEY idx_recipes_shortcode (shortcode),
+        FULLTEXT KEY ft_recipes (title, author, caption),
+        CONSTRAINT fk_recipes_folder FOREIGN KEY (folder_id) REFERENCES folders (id) ON DELETE SET NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id TINYINT PRIMARY KEY,
+        version BIGINT NOT NULL
+    ) ENGINE=InnoDB
+    """,
+    "INSERT IGNORE INTO data_version (id, version) VALUES (1, 0)",
+)
+# Cualquier escritura en recetas o carpetas sube data_version (cache.py). En SQLite
+# lo hacen triggers; aquí un trigger por fila haría esperar a todos los escritores
+# por el bloqueo de esa única fila durante toda su transacción, así que _cursor(write=True)
+# la sube una vez, justo antes del COMMIT. Versiones anteriores sí creaban triggers:
+OLD_TRIGGERS = tuple(f"{table}_version_{suffix}" for table in ("recipes", "folders") for suffix in ("ai", "ad", "au"))
+BUMP_VERSION = "UPDATE data_version SET version = version + 1 WHERE id = 1"
+
+def ft_query(query: str) -> Optional[str]:
+    """Expresión MATCH ... AGAINST en modo booleano; None si no hay palabras buscables."""
+    tokens = re.findall(r"\w+", query or "")
+    if not tokens:
+        return None
+    return " ".join(f"+{t}*" for t in tokens)
+
+FT_MATCH = "MATCH(r.title, r.author, r.caption) AGAINST (%s IN BOOLEAN MODE)"
+FOLDER_JOIN = "LEFT JOIN folders f ON f.id = r.folder_id"
+FOLDER_ID_BY_NAME = "(SELECT id FROM folders WHERE name = %s)"
+
+class MySQLRepository(Repository):
+    name = "mysql"
+
+    def __init__(self, database: Optional[str] = None, pool_size: Optional[int] = None):
+        self.database = database or settings.DB_NAME
+        self.pool_size = pool_size or settings.DB_POOL_SIZE
+        self._pool = None
+        self._lock = threading.Lock()
+        # El pool de mysql.connector falla en vez de esperar cuando se agota
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _get_pool(self) -> pooling.MySQLConnectionPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name=f"recetas_{self.database}_{id(self)}",
+                    pool_size=self.pool_size,
+                    host=settings.DB_HOST,
+                    port=settings.DB_PORT,
+                    user=settings.DB_USER,
+                    password=settings.DB_PASSWORD,
+                    database=self.database,
+                    charset="utf8mb4",
+                    autocommit=False,
+                )
+            return self._pool
+
+    @contextmanager
+    def _cursor(self, write: bool = False):
+        """
+        Cursor (filas como dicts) de una conexión del pool; COMMIT al salir, ROLLBACK
+        si hay excepción. Con write=True sube data_version en la misma transacción.
+        """
+        with self._slots:
+            conn = self._get_pool().get_connection()
+            cur = conn.cursor(dictionary=True)
+            try:
+                yield cur
+                if write:
+                    cur.execute(BUMP_VERSION)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+                conn.close()  # vuelve al pool
+
+    # ----------------- ESQUEMA -----------------
+    def init_db(self):
+        with self._cursor() as cur:
+            for sql in SCHEMA:
+                cur.execute(sql)
+            for name in OLD_TRIGGERS:
+                cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    def data_version(self) -> int:
+        with self._cursor() as cur:
+            cur.execute("SELECT version FROM data_version WHERE id = 1")
+            row = cur.fetchone()
+        return row["version"] if row else 0
+
+    # ----------------- RECETAS -----------------
+    def fetch_recipes_paginated(self, limit: int, offset: int = 0, folder: Optional[str] = None,
+                                query: Optional[str] = None, before_id: Optional[int] = None,
+                                after_id: Optional[int] = None, fields: Sequence[str] = LIST_FIELDS) -> List[Dict]:
+        params = []
+        conditions = []
+        columns = ", ".join(f"{RECIPE_FIELDS[name]} AS {name}" for name in fields)
+        join = FOLDER_JOIN if "folder" in fields else ""
+        sql = f"SELECT {columns} FROM recipes r {join}"
+        order = "r.id DESC"
+
+        if query:
+            match = ft_query(query)
+            if match is None:
+                return []
+            conditions.append(FT_MATCH)
+            params.append(match)
+            order = f"{FT_MATCH} DESC, r.id DESC"
+
+        if folder:
+            conditions.append(f"r.folder_id = {FOLDER_ID_BY_NAME}")
+            params.append(folder)
+
+        reverse = False
+        if not query and before_id is not None:
+            conditions.append("r.id < %s")
+            params.append(before_id)
+            offset = 0
+        elif not query and after_id is not None:
+            conditions.append("r.id > %s")
+            params.append(after_id)
+            order = "r.id ASC"
+            offset = 0
+            reverse = True
 
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order} LIMIT %s OFFSET %s"
+        if query:
+            params.append(match)  # el ORDER BY repite el MATCH
+        params.extend([limit, offset])
 
-_conn = None
+        with self._cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        if reverse:
+            rows.reverse()
+        return rows
 
+    def count_recipes(self, folder: Optional[str] = None, query: Optional[str] = None) -> int:
+        conditions, params = [], []
+        if query:
+            match = ft_query(query)
+            if match is None:
+                return 0
+            conditions.append(FT_MATCH)
+            params.append(match)
+        if folder:
+            conditions.append(f"r.folder_id = {FOLDER_ID_BY_NAME}")
+            params.append(folder)
+        sql = "SELECT COUNT(*) AS total FROM recipes r"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchone()["total"]
 
-def get_conn():
-    global _conn
-    if _conn and _conn.is_connected():
-        return _conn
-    _conn = mysql.connect(
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        database=settings.DB_NAME,
-        charset="utf8mb4"
-    )
-    return _conn
+    def fetch_recipe(self, recipe_id: int) -> Optional[Dict]:
+        with self._cursor() as cur:
+            cur.execute(f"SELECT r.*, f.name AS folder FROM recipes r {FOLDER_JOIN} WHERE r.id = %s", (recipe_id,))
+            return cur.fetchone()
 
+    def fetch_recipes_by_ids(self, ids: Sequence[int], fields: Sequence[str] = LIST_FIELDS) -> List[Dict]:
+        if not ids:
+            return []
+        columns = ", ".join(f"{RECIPE_FIELDS[name]} AS {name}" for name in fields)
+        join = FOLDER_JOIN if "folder" in fields else ""
+        with self._cursor() as cur:
+            cur.execute(f"SELECT {columns} FROM recipes r {join} WHERE r.id IN ({', '.join(['%s'] * len(ids))})",
+                        list(ids))
+            by_id = {r["id"]: r for r in cur.fetchall()}
+        return [by_id[i] for i in ids if i in by_id]
 
+    def known_shortcodes(self, shortcodes: Sequence[str]) -> Set[str]:
+        if not shortcodes:
+            return set()
+        shortcodes = list(shortcodes)
+        with self._cursor() as cur:
+            # IN sobre idx_recipes_shortcode
+            cur.execute(f"SELECT DISTINCT shortcode FROM recipes WHERE shortcode IN ({', '.join(['%s'] * len(shortcodes))})",
+                        shortcodes)
+            return {r["shortcode"] for r in cur.fetchall()}
 
+    def _folder_ids(self, cur, names: Iterable[Optional[str]]) -> Dict[str, int]:
+        """Ids de las carpetas `names` (creando las que falten)."""
+        names = sorted({(n or "").strip() for n in names} - {""})
+        if not names:
+            return {}
+        cur.executemany("INSERT IGNORE INTO folders (name) VALUES (%s)", [(n,) for n in names])
+        cur.execute(f"SELECT id, name FROM folders WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+        return {r["name"]: r["id"] for r in cur.fetchall()}
 
-def fetch_all_recipes():
-    conn = get_conn()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM recipes ORDER BY created_at DESC")
-    rows = cur.fetchall()
-    cur.close()
-    return rows
+    def _upsert_sql(self, returning_id: bool = False) -> str:
+        updates = ", ".join(f"{c}=VALUES({c})" for c in RECIPE_COLUMNS if c != "url")
+        if returning_id:
+            # LAST_INSERT_ID(id) hace que lastrowid sea el id también cuando la fila ya existía
+            updates = "id=LAST_INSERT_ID(id), " + updates
+        return (f"INSERT INTO recipes ({', '.join(RECIPE_COLUMNS)}) VALUES ({', '.join(['%s'] * len(RECIPE_COLUMNS))}) "
+                f"ON DUPLICATE KEY UPDATE {updates}")
 
+    @staticmethod
+    def _values(data: Dict, folder_ids: Dict[str, int]) -> tuple:
+        folder_id = folder_ids.get((data.get("folder") or "").strip())
+        return tuple(folder_id if c == "folder_id" else data.get(c) for c in RECIPE_COLUMNS)
 
+    def upsert_recipe(self, data: Dict) -> int:
+        with self._cursor(write=True) as cur:
+            folder_ids = self._folder_ids(cur, [data.get("folder")])
+            cur.execute(self._upsert_sql(returning_id=True), self._values(data, folder_ids))
+            return cur.lastrowid
 
+    def upsert_recipes(self, items: Iterable[Dict], batch_size: int = UPSERT_BATCH) -> int:
+        """Inserta o actualiza por lotes: executemany manda cada lote como un único INSERT multi-fila."""
+        total = 0
+        batch = []
+        for data in items:
+            batch.append(data)
+            if len(batch) >= batch_size:
+                total += self._upsert_batch(batch)
+                batch = []
+        if batch:
+            total += self._upsert_batch(batch)
+        return total
 
-def fetch_recipe(recipe_id: int):
-    conn = get_conn()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM recipes WHERE id=%s", (recipe_id,))
-    row = cur.fetchone()
-    cur.close()
-    return row
+    def _upsert_batch(self, batch: List[Dict]) -> int:
+        with self._cursor(write=True) as cur:
+            folder_ids = self._folder_ids(cur, [d.get("folder") for d in batch])
+            cur.executemany(self._upsert_sql(), [self._values(d, folder_ids) for d in batch])
+        return len(batch)
 
+    def set_previews(self, recipe_id: int, poster_path: Optional[str], preview_path: Optional[str]):
+        with self._cursor(write=True) as cur:
+            cur.execute("UPDATE recipes SET poster_path=%s, preview_path=%s WHERE id=%s",
+                        (poster_path, preview_path, recipe_id))
 
+    def delete_recipe(self, recipe_id: int):
+        with self._cursor(write=True) as cur:
+            cur.execute("DELETE FROM recipes WHERE id=%s", (recipe_id,))
 
+    # ----------------- CARPETAS -----------------
+    def get_folders(self) -> List[str]:
+        with self._cursor() as cur:
+            cur.execute("SELECT name FROM folders ORDER BY LOWER(name)")
+            return [r["name"] for r in cur.fetchall()]
 
-def upsert_recipe(data: dict):
-    """Inserta o actualiza por shortcode."""
-    conn = get_conn()
-    cur = conn.cursor()
-    sql = (
-        "INSERT INTO recipes (url, shortcode, author, caption, image_url, posted_at, likes) "
-        "VALUES (%s,%s,%s,%s,%s,%s,%s) "
-        "ON DUPLICATE KEY UPDATE url=VALUES(url), author=VALUES(author), caption=VALUES(caption), "
-        "image_url=VALUES(image_url), posted_at=VALUES(posted_at), likes=VALUES(likes)"
-    )
-    cur.execute(sql, (
-    data.get("url"),
-    data.get("shortcode"),
-    data.get("author"),
-    data.get("caption"),
-    data.get("image_url"),
-    data.get("posted_at"),
-    data.get("likes")
-    ))
-    conn.commit()
-    cur.close()
+    def get_folder_counts(self) -> List[Dict]:
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT f.name, COUNT(r.id) AS count
+                FROM folders f LEFT JOIN recipes r ON r.folder_id = f.id
+                GROUP BY f.id, f.name ORDER BY LOWER(f.name)
+            """)
+            return cur.fetchall()
 
+    def create_folder(self, name: str) -> int:
+        name = name.strip()
+        if not name:
+            raise ValueError("Nombre vacío")
+        with self._cursor(write=True) as cur:
+            return self._folder_ids(cur, [name])[name]
 
+    def update_recipe_folder(self, recipe_id: int, folder: str):
+        with self._cursor(write=True) as cur:
+            folder_id = self._folder_ids(cur, [folder]).get((folder or "").strip())
+            cur.execute("UPDATE recipes SET folder_id=%s, classified_with=%s WHERE id=%s",
+                        (folder_id, MANUAL, recipe_id))
 
+    def delete_folder_by_name(self, name: str):
+        """Las recetas de la carpeta pasan a "Otros" en vez de quedarse sin carpeta."""
+        with self._cursor(write=True) as cur:
+            otros_id = self._folder_ids(cur, [FALLBACK])[FALLBACK]
+            cur.execute(f"UPDATE recipes SET folder_id=%s WHERE folder_id = {FOLDER_ID_BY_NAME}", (otros_id, name))
+            cur.execute("DELETE FROM folders WHERE name=%s", (name,))
 
-def delete_recipe(recipe_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recipes WHERE id=%s", (recipe_id,))
-    conn.commit()
-    cur.close()
\ No newline at end of file
+    def drop_all(self):
+        """Borra las tablas (solo para los benchmarks, sobre una base de datos desechable)."""
+        with self._cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS recipes, folders, data_version")
@@ -1,215 +1,366 @@
+import json
+import os
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+import metrics
+from taxonomy import MANUAL
 
 DB_FILE = Path(__file__).resolve().parent / "recetas_dev.db"
-UPLOAD_FOLDER = Path(__file__).resolve().parent / "static/uploads"
-UPLOAD_FOLDER.mkdir(exist_ok=True, parents=True)
+UPLOAD_FOLDER = Path(__file__).resolve().parent / "static/uploads"  # se crea en init_db()
+
+# --- Conexiones ---
+# Cada hilo mantiene su propia conexión abierta (sqlite3 no permite compartirlas
+# entre hilos). Los PRAGMA se aplican una sola vez al abrirla y sqlite3 cachea
+# las sentencias preparadas por conexión (cached_statements).
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # ~16 MB de caché de páginas
+    "PRAGMA mmap_size=268435456",    # 256 MB mapeados en memoria
+)
+
+_local = threading.local()
 
-def get_conn():
-    conn = sqlite3.connect(DB_FILE)
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # autocommit; las escrituras usan transaction()
+        cached_statements=CACHED_STATEMENTS,
+        # Estadísticas por sentencia y consultas lentas (metrics.py)
+        factory=metrics.InstrumentedConnection if metrics.SQL_ENABLED else sqlite3.Connection,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS recipes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        url TEXT UNIQUE,
-        shortcode TEXT,
-        author TEXT,
-        caption TEXT,
-        image_path TEXT,
-        video_path TEXT,
-        posted_at TEXT,
-        likes INTEGER,
-        title TEXT,
-        folder TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS folders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE
-    )
-    """)
-    conn.commit()
-    conn.close()
+def get_conn() -> sqlite3.Connection:
+    """
+    Devuelve la conexión del hilo actual, abriéndola si hace falta.
+    No hay que cerrarla: se reutiliza en las siguientes llamadas.
+    """
+    conn = getattr(_local, "conn", None)
+    # Tras un fork (p. ej. gunicorn con preload) la conexión heredada no vale
+    if conn is None or _local.pid != os.getpid() or _local.path != DB_FILE:
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = DB_FILE
+    return conn
 
-def fetch_recipes_paginated(limit: int, offset: int = 0, folder: Optional[str] = None, query: Optional[str] = None) -> List[Dict]:
+def close_conn():
+    """Cierra la conexión del hilo actual (si la hay)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _local.conn = None
+        conn.close()
+
+def set_db_file(path):
+    """Cambia el fichero de base de datos (scripts, benchmarks). Cada hilo reabre su conexión."""
+    global DB_FILE
+    close_conn()
+    DB_FILE = Path(path)
+
+@contextmanager
+def transaction():
+    """
+    Abre una transacción de escritura y devuelve un cursor.
+    Hace COMMIT al salir y ROLLBACK si hay excepción. Usa BEGIN IMMEDIATE para
+    reservar el bloqueo de escritura desde el principio (junto con busy_timeout
+    evita los "database is locked" al mezclar lectores y escritores).
+    Si ya hay una transacción abierta en este hilo, se une a ella.
+    """
     conn = get_conn()
     cur = conn.cursor()
-    sql = "SELECT * FROM recipes"
+    if conn.in_transaction:
+        yield cur
+        return
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        yield cur
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+def init_db():
+    """Crea o actualiza el esquema aplicando las migraciones pendientes (migrations.py)."""
+    from migrations import migrate
+    UPLOAD_FOLDER.mkdir(exist_ok=True, parents=True)
+    migrate()
+
+# Pesos bm25 por columna: title, author, caption
+FTS_RANK = "bm25(recipes_fts, 10.0, 4.0, 1.0)"
+
+def fts_query(query: str) -> Optional[str]:
+    """
+    Convierte el texto del buscador en una expresión MATCH de FTS5.
+    Cada palabra se busca como prefijo y todas deben aparecer (AND implícito).
+    Devuelve None si no queda ninguna palabra buscable.
+    """
+    tokens = re.findall(r"\w+", query or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+# Las recetas guardan folder_id; las consultas devuelven también el nombre como "folder"
+RECIPE_COLUMNS = "r.*, f.name AS folder"
+FOLDER_JOIN = "LEFT JOIN folders f ON f.id = r.folder_id"
+FOLDER_ID_BY_NAME = "(SELECT id FROM folders WHERE name = ?)"
+
+# Campos que se pueden pedir en los listados: nombre -> expresión SQL
+RECIPE_FIELDS = {
+    "id": "r.id", "url": "r.url", "shortcode": "r.shortcode", "author": "r.author",
+    "title": "r.title", "caption": "r.caption", "excerpt": "substr(r.caption, 1, 100)",
+    "folder": "f.name", "posted_at": "r.posted_at", "likes": "r.likes",
+    "image_path": "r.image_path", "video_path": "r.video_path", "thumb_key": "r.thumb_key",
+    "poster_path": "r.poster_path", "preview_path": "r.preview_path", "classified_with": "r.classified_with",
+}
+# Lo que pintan las tarjetas de los listados HTML (sin cargar la descripción completa)
+LIST_FIELDS = ("id", "title", "excerpt", "author", "folder", "image_path", "thumb_key", "preview_path")
+
+def _select_fields(fields: Sequence[str]) -> Tuple[str, str]:
+    """(columnas, join) para los campos pedidos; la carpeta solo se une si hace falta."""
+    columns = ", ".join(f"{RECIPE_FIELDS[name]} AS {name}" for name in fields)
+    return columns, FOLDER_JOIN if "folder" in fields else ""
+
+def fetch_recipes_paginated(limit: int, offset: int = 0, folder: Optional[str] = None, query: Optional[str] = None,
+                            before_id: Optional[int] = None, after_id: Optional[int] = None,
+                            fields: Sequence[str] = LIST_FIELDS) -> List[Dict]:
+    """
+    Devuelve una página de recetas, de la más nueva a la más antigua, con solo los
+    campos `fields` (claves de RECIPE_FIELDS).
+
+    Modo offset: LIMIT/OFFSET clásico (necesario para búsquedas, que van por relevancia).
+    Modo keyset: before_id devuelve las recetas con id < before_id (página siguiente) y
+    after_id las de id > after_id (página anterior), sin recorrer las filas saltadas.
+    """
     params = []
     conditions = []
+    columns, join = _select_fields(fields)
+
+    if query:
+        match = fts_query(query)
+        if match is None:
+            return []
+        sql = f"SELECT {columns} FROM recipes_fts JOIN recipes r ON r.id = recipes_fts.rowid {join}"
+        conditions.append("recipes_fts MATCH ?")
+        params.append(match)
+        order = f"{FTS_RANK}, r.id DESC"
+    else:
+        sql = f"SELECT {columns} FROM recipes r {join}"
+        order = "r.id DESC"
 
     if folder:
-        conditions.append("(folder = ?)")
+        conditions.append(f"r.folder_id = {FOLDER_ID_BY_NAME}")
         params.append(folder)
 
-    if query:
-        q = f"%{query.lower()}%"
-        conditions.append("(LOWER(title) LIKE ? OR LOWER(author) LIKE ? OR LOWER(caption) LIKE ?)")
-        params.extend([q, q, q])
+    reverse = False
+    if not query and before_id is not None:
+        conditions.append("r.id < ?")
+        params.append(before_id)
+        offset = 0
+    elif not query and after_id is not None:
+        # Se recorre hacia arriba y luego se invierte para mantener el orden DESC
+        conditions.append("r.id > ?")
+        params.append(after_id)
+        order = "r.id ASC"
+        offset = 0
+        reverse = True
 
     if conditions:
         sql += " WHERE " + " AND ".join(conditions)
 
-    sql += " ORDER BY id DESC LIMIT ? OFFSET ?"
+    sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
     params.extend([limit, offset])
 
-    cur.execute(sql, params)
+    cur = get_conn().execute(sql, params)
     rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
+    if reverse:
+        rows.reverse()
     return rows
 
 def count_recipes(folder: Optional[str] = None, query: Optional[str] = None) -> int:
     conn = get_conn()
-    cur = conn.cursor()
-    sql = "SELECT COUNT(*) FROM recipes"
-    params = []
-    conditions = []
+    if not query:
+        # Sin búsqueda se leen los contadores mantenidos por triggers
+        if folder:
+            row = conn.execute(f"SELECT total FROM recipe_counts WHERE folder_id = {FOLDER_ID_BY_NAME}", (folder,)).fetchone()
+            return row[0] if row else 0
+        return conn.execute("SELECT COALESCE(SUM(total), 0) FROM recipe_counts").fetchone()[0]
 
+    match = fts_query(query)
+    if match is None:
+        return 0
+    sql = "SELECT COUNT(*) FROM recipes_fts"
+    params = [match]
     if folder:
-        conditions.append("(folder = ?)")
+        sql += f" JOIN recipes r ON r.id = recipes_fts.rowid WHERE recipes_fts MATCH ? AND r.folder_id = {FOLDER_ID_BY_NAME}"
         params.append(folder)
+    else:
+        sql += " WHERE recipes_fts MATCH ?"
+    return conn.execute(sql, params).fetchone()[0]
 
-    if query:
-        q = f"%{query.lower()}%"
-        conditions.append("(LOWER(title) LIKE ? OR LOWER(author) LIKE ? OR LOWER(caption) LIKE ?)")
-        params.extend([q, q, q])
+def data_version() -> int:
+    """Contador que suben los triggers de recipes y folders (claves de cache.py)."""
+    row = get_conn().execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
 
-    if conditions:
-        sql += " WHERE " + " AND ".join(conditions)
-
-    cur.execute(sql, params)
-    total = cur.fetchone()[0]
-    conn.close()
-    return total
+def get_folder_counts() -> List[Dict]:
+    """Carpetas con su número de recetas (de recipe_counts, sin contar filas)."""
+    rows = get_conn().execute("""
+        SELECT f.name, COALESCE(c.total, 0) AS count
+        FROM folders f LEFT JOIN recipe_counts c ON c.folder_id = f.id
+        ORDER BY LOWER(f.name)
+    """)
+    return [dict(r) for r in rows]
 
 def fetch_recipe(recipe_id: int) -> Optional[Dict]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM recipes WHERE id=?", (recipe_id,))
-    row = cur.fetchone()
-    conn.close()
+    row = get_conn().execute(f"SELECT {RECIPE_COLUMNS} FROM recipes r {FOLDER_JOIN} WHERE r.id=?", (recipe_id,)).fetchone()
     return dict(row) if row else None
 
-def upsert_recipe(data: Dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM recipes WHERE url=?", (data.get('url'),))
-    row = cur.fetchone()
+def fetch_recipes_by_ids(ids: Sequence[int], fields: Sequence[str] = LIST_FIELDS) -> List[Dict]:
+    """Recetas con esos ids en el mismo orden (las que ya no existen se omiten). `fields` debe incluir "id"."""
+    if not ids:
+        return []
+    columns, join = _select_fields(fields)
+    rows = get_conn().execute(f"SELECT {columns} FROM recipes r {join} WHERE r.id IN (SELECT value FROM json_each(?))",
+                              (json.dumps(list(ids)),))
+    by_id = {r["id"]: dict(r) for r in rows}
+    return [by_id[i] for i in ids if i in by_id]
 
-    if row:
-        cur.execute("""
-        UPDATE recipes SET shortcode=?, author=?, caption=?, image_path=?, video_path=?, posted_at=?, likes=?, title=?, folder=?
-        WHERE id=?
-        """, (
-            data.get('shortcode'), data.get('author'), data.get('caption'),
-            data.get('image_path'), data.get('video_path'), data.get('posted_at'),
-            data.get('likes'), data.get('title'), data.get('folder'), row['id']
-        ))
-    else:
-        cur.execute("""
-        INSERT INTO recipes (url, shortcode, author, caption, image_path, video_path, posted_at, likes, title, folder)
-        VALUES (?,?,?,?,?,?,?,?,?,?)
-        """, (
-            data.get('url'), data.get('shortcode'), data.get('author'), data.get('caption'),
-            data.get('image_path'), data.get('video_path'), data.get('posted_at'),
-            data.get('likes'), data.get('title'), data.get('folder')
-        ))
-    conn.commit()
-    conn.close()
+def known_shortcodes(shortcodes: Sequence[str]) -> Set[str]:
+    """Los shortcodes que ya son receta (idx_recipes_shortcode), en una sola consulta."""
+    if not shortcodes:
+        return set()
+    rows = get_conn().execute("SELECT DISTINCT shortcode FROM recipes WHERE shortcode IN (SELECT value FROM json_each(?))",
+                              (json.dumps(list(shortcodes)),))
+    return {r[0] for r in rows}
+
+def _folder_id(cur, name: Optional[str]) -> Optional[int]:
+    """Id de la carpeta `name` (creándola si no existe); None si no hay carpeta."""
+    name = (name or "").strip()
+    if not name:
+        return None
+    cur.execute("INSERT OR IGNORE INTO folders (name) VALUES (?)", (name,))
+    cur.execute("SELECT id FROM folders WHERE name=?", (name,))
+    return cur.fetchone()['id']
+
+def folder_ids(cur, names: Iterable[Optional[str]]) -> Dict[str, int]:
+    """Ids de varias carpetas a la vez (creando las que falten), con dos sentencias."""
+    names = sorted({(n or "").strip() for n in names} - {""})
+    if not names:
+        return {}
+    cur.executemany("INSERT OR IGNORE INTO folders (name) VALUES (?)", [(n,) for n in names])
+    cur.execute("SELECT id, name FROM folders WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(names),))
+    return {r['name']: r['id'] for r in cur.fetchall()}
+
+# Upsert en una sola sentencia: sin SELECT previo ni carrera entre dos escritores con la misma url
+UPSERT_COLUMNS = ("url", "shortcode", "author", "caption", "image_path", "video_path", "posted_at", "likes",
+                  "title", "folder_id", "classified_with", "thumb_key")
+UPSERT_SQL = (
+    f"INSERT INTO recipes ({', '.join(UPSERT_COLUMNS)}) VALUES ({', '.join('?' * len(UPSERT_COLUMNS))}) "
+    f"ON CONFLICT(url) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in UPSERT_COLUMNS if c != 'url')}"
+)
+UPSERT_BATCH = 500
+
+def _upsert_values(data: Dict, folder_id: Optional[int]) -> tuple:
+    return tuple(folder_id if c == 'folder_id' else data.get(c) for c in UPSERT_COLUMNS)
+
+def upsert_recipe(data: Dict) -> int:
+    """Inserta o actualiza (por url) y devuelve el id de la receta."""
+    with transaction() as cur:
+        folder_id = _folder_id(cur, data.get('folder'))
+        cur.execute(UPSERT_SQL + " RETURNING id", _upsert_values(data, folder_id))
+        return cur.fetchone()[0]
+
+def upsert_recipes(items: Iterable[Dict], batch_size: int = UPSERT_BATCH) -> int:
+    """
+    Inserta o actualiza muchas recetas: un executemany por lote, cada lote en una
+    transacción (o en la del llamador, si ya hay una abierta). Devuelve cuántas.
+    """
+    total = 0
+    batch = []
+    for data in items:
+        batch.append(data)
+        if len(batch) >= batch_size:
+            total += _upsert_batch(batch)
+            batch = []
+    if batch:
+        total += _upsert_batch(batch)
+    return total
+
+def _upsert_batch(batch: List[Dict]) -> int:
+    with transaction() as cur:
+        ids = folder_ids(cur, (d.get('folder') for d in batch))
+        cur.executemany(UPSERT_SQL, [_upsert_values(d, ids.get((d.get('folder') or '').strip())) for d in batch])
+    return len(batch)
+
+def set_previews(recipe_id: int, poster_path: Optional[str], preview_path: Optional[str]):
+    with transaction() as cur:
+        cur.execute("UPDATE recipes SET poster_path=?, preview_path=? WHERE id=?",
+                    (poster_path, preview_path, recipe_id))
 
 def delete_recipe(recipe_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute("DELETE FROM recipes WHERE id=?", (recipe_id,))
 
 def get_folders() -> List[str]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT name FROM folders ORDER BY LOWER(name)")
-    rows = [r['name'] for r in cur.fetchall()]
-    conn.close()
-    return rows
+    cur = get_conn().execute("SELECT name FROM folders ORDER BY LOWER(name)")
+    return [r['name'] for r in cur.fetchall()]
 
 def create_folder(name: str) -> int:
     name = name.strip()
     if not name:
         raise ValueError("Nombre vacío")
-    conn = get_conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("INSERT INTO folders (name) VALUES (?)", (name,))
-        conn.commit()
-        folder_id = cur.lastrowid
-    except sqlite3.IntegrityError:
-        cur.execute("SELECT id FROM folders WHERE name=?", (name,))
-        row = cur.fetchone()
-        folder_id = row['id'] if row else None
-    conn.close()
-    return folder_id
+    with transaction() as cur:
+        return _folder_id(cur, name)
 
 def update_recipe_folder(recipe_id: int, folder: str):
-    """Actualiza la carpeta de una receta específica."""
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE recipes SET folder=? WHERE id=?", (folder, recipe_id))
-    conn.commit()
-    conn.close()
+    """Actualiza la carpeta de una receta específica (elegida a mano: el reclasificador no la cambia)."""
+    with transaction() as cur:
+        cur.execute("UPDATE recipes SET folder_id=?, classified_with=? WHERE id=?",
+                    (_folder_id(cur, folder), MANUAL, recipe_id))
 
 def delete_folder_by_name(name: str):
     """
     Al eliminar una carpeta, mover todos los posts a "Otros" en vez de NULL.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    # Asegurarnos de que la carpeta "Otros" existe
-    cur.execute("INSERT OR IGNORE INTO folders (name) VALUES ('Otros')")
-    # Mover recetas a "Otros"
-    cur.execute("UPDATE recipes SET folder='Otros' WHERE folder=?", (name,))
-    # Eliminar la carpeta
-    cur.execute("DELETE FROM folders WHERE name=?", (name,))
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        # Asegurarnos de que la carpeta "Otros" existe
+        otros_id = _folder_id(cur, 'Otros')
+        # Mover recetas a "Otros" (usa idx_recipes_folder_id)
+        cur.execute(f"UPDATE recipes SET folder_id=? WHERE folder_id = {FOLDER_ID_BY_NAME}", (otros_id, name))
+        # Eliminar la carpeta
+        cur.execute("DELETE FROM folders WHERE name=?", (name,))
 
 def sync_folders():
     """
-    Asegura que todos los valores distintos de recipes.folder
-    existan en la tabla folders.
+    Asegura que ninguna receta apunte a una carpeta que ya no existe en folders
+    (solo puede pasar si se escribió con las claves foráneas desactivadas).
     """
-    conn = get_conn()
-    cur = conn.cursor()
-
-    # 1. obtener todas las carpetas distintas usadas en recetas
-    cur.execute("SELECT DISTINCT folder FROM recipes WHERE folder IS NOT NULL AND TRIM(folder) != ''")
-    recipe_folders = {r['folder'].strip() for r in cur.fetchall()}
-
-    # 2. obtener las carpetas que ya existen en folders
-    cur.execute("SELECT name FROM folders")
-    existing_folders = {r['name'].strip() for r in cur.fetchall()}
-
-    # 3. calcular las que faltan
-    missing = recipe_folders - existing_folders
-
-    # 4. insertar las que falten
-    for name in sorted(missing):
-        try:
-            cur.execute("INSERT INTO folders (name) VALUES (?)", (name,))
-            print(f"🟢 Añadida carpeta faltante: {name}")
-        except sqlite3.IntegrityError:
-            pass
+    with transaction() as cur:
+        cur.execute("""
+        UPDATE recipes SET folder_id = NULL
+        WHERE folder_id IS NOT NULL AND folder_id NOT IN (SELECT id FROM folders)
+        """)
+        if cur.rowcount:
+            print(f"🟢 {cur.rowcount} recetas apuntaban a carpetas inexistentes")
 
-    conn.commit()
-    conn.close()
     print("✅ Sincronización completada")
 
 if __name__ == "__main__":
     init_db()
-    sync_folders()
\ No newline at end of file
+    sync_folders()
@@ -0,0 +1,348 @@
+"""
+Clasificador local de carpetas: primera pasada rápida antes del modelo (Ollama).
+
+Miles de recetas ya tienen carpeta, puesta por el modelo o corregida a mano
+(change_recipe_folder). Con ellas se entrena una regresión logística
+multinomial sobre n-gramas con hashing (palabras, raíces, pares de palabras y
+autor), en numpy, con las probabilidades calibradas (temperatura ajustada con
+un CALIBRATION de recetas apartadas) para que THRESHOLD signifique lo que dice.
+Clasifica miles de descripciones por segundo y solo las que no llegan a
+THRESHOLD de probabilidad van al modelo (classify_all).
+
+- Las asignaciones a mano (taxonomy.MANUAL) pesan MANUAL_WEIGHT veces más.
+- Lo clasificado por este clasificador lleva su propio stamp (local_stamp) y
+  no se usa para entrenar: aprende solo del modelo y de las correcciones.
+- No escribe títulos: se conserva el que ya tenía la receta o se saca de la
+  primera línea de la descripción (guess_title).
+
+El modelo se guarda junto a la base de datos (<db>.folders.npz) y load() lo
+vuelve a entrenar cuando hay RETRAIN_EVERY recetas etiquetadas más que la
+última vez o ha cambiado la taxonomía. Necesita numpy (opcional): sin él, o
+con menos de MIN_SAMPLES recetas etiquetadas, todo va al modelo.
+
+Uso: python folder_model.py train
+     python folder_model.py report    precisión por umbral con un 20 % reservado y velocidad
+"""
+import argparse
+import json
+import math
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sin numpy todo se clasifica con el modelo
+    np = None
+
+import db_sqlite
+import metrics
+import taxonomy
+from classifier import DEFAULT_TITLE, PROMPT_VERSION, Classifier, Result
+from config import settings
+from db_sqlite import get_conn, init_db
+from textnorm import STOPWORDS, normalize
+
+NAME = "local"
+DIM = 1 << 18  # dimensiones del hashing; la fila DIM es el término independiente
+THRESHOLD = settings.LOCAL_CLASSIFIER_THRESHOLD
+MIN_SAMPLES = 200
+RETRAIN_EVERY = 500
+MANUAL_WEIGHT = 3.0
+MAX_WORDS = 300  # palabras de cada descripción
+STEM_LEN = 5
+EPOCHS = 10
+BATCH = 256
+LEARNING_RATE = 2.0
+L2 = 1e-6
+CALIBRATION = 0.1  # recetas apartadas al entrenar para calibrar las probabilidades
+HOLDOUT = 0.2  # recetas apartadas en report()
+REPORT_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+
+_WORD_RE = re.compile(r"[a-z0-9ñ]+")
+_TITLE_RE = re.compile(r"[#@]\S+|[^\w\s,.:¡!¿?'()-]")
+
+def available() -> bool:
+    return np is not None
+
+def model_path() -> Path:
+    return Path(f"{db_sqlite.DB_FILE}.folders.npz")
+
+def local_stamp(classifier: Classifier) -> str:
+    """classified_with de lo que clasifica este clasificador (ordena junto al del modelo, ver renovar_folders.STALE)."""
+    return taxonomy.stamp(f"{classifier.model}+{NAME}", PROMPT_VERSION, classifier.taxonomy_version)
+
+def guess_title(caption: Optional[str]) -> str:
+    """Título sacado de la primera línea con texto de la descripción (sin hashtags ni emojis)."""
+    for line in (caption or "").splitlines():
+        words = _TITLE_RE.sub(" ", line).split()[:7]
+        if any(w.isalpha() for w in words):
+            title = " ".join(words).strip(" ,.:-")[:60]
+            return title[:1].upper() + title[1:]
+    return DEFAULT_TITLE
+
+# ----------------- CARACTERÍSTICAS -----------------
+def features(caption: Optional[str], author: Optional[str]) -> "np.ndarray":
+    """Índices (sin repetir) de los n-gramas de una receta, con el término independiente al final."""
+    words = [w for w in _WORD_RE.findall(normalize(caption))[:MAX_WORDS] if len(w) > 1 and w not in STOPWORDS]
+    terms = {"w:" + w for w in words}
+    terms.update("s:" + w[:STEM_LEN] for w in words if len(w) > STEM_LEN)
+    terms.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    terms.add("a:" + (author or "").lower())
+    found = {zlib.crc32(t.encode()) % DIM for t in terms}
+    return np.fromiter(sorted(found) + [DIM], dtype=np.int32)
+
+def _matrix(rows: Sequence["np.ndarray"]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Matriz dispersa por filas: (índices, valores, inicio de cada fila, fila de cada índice)."""
+    sizes = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+    idx = np.concatenate(rows)
+    doc = np.repeat(np.arange(len(rows)), sizes)
+    # Cada receta con norma 1 (sin contar el término independiente, que vale 1)
+    val = (1.0 / np.sqrt(np.maximum(sizes - 1, 1))).astype(np.float32)[doc]
+    val[idx == DIM] = 1.0
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return idx, val, starts, doc
+
+def _softmax(logits: "np.ndarray") -> "np.ndarray":
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    return logits / logits.sum(axis=1, keepdims=True)
+
+# ----------------- MODELO -----------------
+class FolderModel:
+    def __init__(self, weights: "np.ndarray", categories: Sequence[str], meta: dict = None):
+        self.weights = weights
+        self.categories = list(categories)
+        self.meta = meta or {}
+        self.temperature = self.meta.get("temperature", 1.0)
+
+    def logits(self, rows: Sequence["np.ndarray"]) -> "np.ndarray":
+        out = np.empty((len(rows), len(self.categories)), dtype=np.float32)
+        for i in range(0, len(rows), BATCH):
+            idx, val, starts, _ = _matrix(rows[i:i + BATCH])
+            out[i:i + BATCH] = np.add.reduceat(self.weights[idx] * val[:, None], starts)
+        return out
+
+    def probabilities(self, rows: Sequence["np.ndarray"]) -> "np.ndarray":
+        return _softmax(self.logits(rows) / self.temperature)
+
+    def calibrate(self, rows: Sequence["np.ndarray"], labels: "np.ndarray"):
+        """Temperatura que mejor explica (máxima verosimilitud) esas recetas no vistas al entrenar."""
+        logits = self.logits(rows)
+
+        def loss(t):
+            return -np.log(_softmax(logits / t)[np.arange(len(labels)), labels] + 1e-12).mean()
+
+        self.temperature = float(min(np.geomspace(0.05, 5, 60), key=loss))
+
+    def predict(self, posts: Sequence[Tuple[str, str]]) -> List[Tuple[str, float]]:
+        """[(carpeta, probabilidad)] de cada (descripción, autor)."""
+        if not posts:
+            return []
+        probs = self.probabilities([features(caption, author) for caption, author in posts])
+        best = probs.argmax(axis=1)
+        return [(self.categories[b], float(probs[i, b])) for i, b in enumerate(best)]
+
+    def save(self, path: Path):
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, weights=self.weights, meta=np.array(json.dumps(
+            dict(self.meta, categories=self.categories, temperature=self.temperature), ensure_ascii=False)))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FolderModel":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["weights"], meta.pop("categories"), meta)
+
+def fit(rows: Sequence["np.ndarray"], labels: "np.ndarray", weights: "np.ndarray", categories: Sequence[str],
+        epochs: int = EPOCHS, seed: int = 0) -> FolderModel:
+    """Regresión logística multinomial con AdaGrad por minilotes; solo se tocan las filas de cada lote."""
+    W = np.zeros((DIM + 1, len(categories)), dtype=np.float32)
+    G = np.full_like(W, 1e-8)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        order = rng.permutation(len(rows))
+        for i in range(0, len(order), BATCH):
+            batch = order[i:i + BATCH]
+            idx, val, starts, doc = _matrix([rows[j] for j in batch])
+            delta = _softmax(np.add.reduceat(W[idx] * val[:, None], starts))
+            delta[np.arange(len(batch)), labels[batch]] -= 1.0
+            delta *= (weights[batch] / len(batch))[:, None]
+            # Gradiente por fila: se agrupan los índices repetidos del lote
+            order_idx = np.argsort(idx, kind="stable")
+            rows_touched, first = np.unique(idx[order_idx], return_index=True)
+            grad = np.add.reduceat((val[:, None] * delta[doc])[order_idx], first) + L2 * W[rows_touched]
+            G[rows_touched] += grad * grad
+            W[rows_touched] -= LEARNING_RATE * grad / np.sqrt(G[rows_touched])
+    return FolderModel(W, categories)
+
+def fit_calibrated(rows: Sequence["np.ndarray"], labels: "np.ndarray", weights: "np.ndarray",
+                   categories: Sequence[str], seed: int = 0) -> FolderModel:
+    """fit() con un CALIBRATION de las recetas apartado para calibrar la temperatura."""
+    order = np.random.default_rng(seed).permutation(len(rows))
+    cut = int(len(rows) * (1 - CALIBRATION))
+    fit_ids, calibration_ids = order[:cut], order[cut:]
+    model = fit([rows[i] for i in fit_ids], labels[fit_ids], weights[fit_ids], categories, seed=seed)
+    model.calibrate([rows[i] for i in calibration_ids], labels[calibration_ids])
+    return model
+
+# ----------------- ENTRENAMIENTO -----------------
+def training_data(categories: Sequence[str]) -> Tuple[list, list, list]:
+    """(posts, carpetas, pesos) de las recetas clasificadas por el modelo o a mano, en carpetas de la taxonomía."""
+    rows = get_conn().execute("""
+        SELECT r.caption, r.author, f.name AS folder, r.classified_with FROM recipes r JOIN folders f ON f.id = r.folder_id
+        WHERE r.classified_with IS NOT NULL AND r.classified_with NOT LIKE ?
+          AND f.name IN (SELECT value FROM json_each(?))
+        ORDER BY r.id
+    """, (f"%+{NAME}|%", json.dumps(list(categories), ensure_ascii=False))).fetchall()
+    posts = [(r["caption"], r["author"]) for r in rows]
+    weights = [MANUAL_WEIGHT if r["classified_with"] == taxonomy.MANUAL else 1.0 for r in rows]
+    return posts, [r["folder"] for r in rows], weights
+
+def _encode(posts, folders, weights, categories):
+    index = {c: i for i, c in enumerate(categories)}
+    rows = [features(caption, author) for caption, author in posts]
+    return rows, np.array([index[f] for f in folders]), np.array(weights, dtype=np.float32)
+
+def train(categories: Sequence[str] = None) -> Optional[FolderModel]:
+    """Entrena con todas las recetas etiquetadas y guarda el modelo. None si hay menos de MIN_SAMPLES."""
+    categories = list(categories or taxonomy.CATEGORIAS)
+    posts, folders, weights = training_data(categories)
+    if len(posts) < MIN_SAMPLES:
+        return None
+    start = time.perf_counter()
+    model = fit_calibrated(*_encode(posts, folders, weights, categories), categories)
+    model.meta = {"samples": len(posts), "taxonomy_version": taxonomy.TAXONOMY_VERSION,
+                  "trained_at": time.time(), "train_s": round(time.perf_counter() - start, 2)}
+    model.save(model_path())
+    return model
+
+def _labelled(categories: Sequence[str]) -> int:
+    return get_conn().execute("""
+        SELECT COUNT(*) FROM recipes r JOIN folders f ON f.id = r.folder_id
+        WHERE r.classified_with IS NOT NULL AND r.classified_with NOT LIKE ?
+          AND f.name IN (SELECT value FROM json_each(?))
+    """, (f"%+{NAME}|%", json.dumps(list(categories), ensure_ascii=False))).fetchone()[0]
+
+def load(retrain: bool = True) -> Optional[FolderModel]:
+    """
+    El modelo guardado; si retrain, antes se vuelve a entrenar si no existe, ha
+    cambiado la taxonomía o hay RETRAIN_EVERY recetas etiquetadas más. None si
+    no hay numpy o no hay bastantes recetas etiquetadas.
+    """
+    if not available():
+        return None
+    path = model_path()
+    model = FolderModel.load(path) if path.exists() else None
+    if retrain:
+        stale = (model is None or model.categories != list(taxonomy.CATEGORIAS)
+                 or model.meta.get("taxonomy_version") != taxonomy.TAXONOMY_VERSION
+                 or _labelled(taxonomy.CATEGORIAS) - model.meta.get("samples", 0) >= RETRAIN_EVERY)
+        if stale:
+            print("🧠 Entrenando el clasificador local de carpetas...")
+            model = train() or model
+    if model is not None and model.categories != list(taxonomy.CATEGORIAS):
+        return None  # de otra taxonomía y sin datos para reentrenarlo
+    return model
+
+# ----------------- CLASIFICACIÓN -----------------
+def classify_all(classifier: Classifier, model: Optional[FolderModel], posts: Iterable[Tuple[str, str]],
+                 titles: Sequence[Optional[str]] = None,
+                 threshold: float = THRESHOLD) -> List[Tuple[Optional[Result], Optional[str]]]:
+    """
+    [(resultado, stamp)] de cada (descripción, autor), en el mismo orden: las
+    que el clasificador local da con probabilidad >= threshold se quedan con su
+    carpeta y el resto va a classifier (resultado None si el modelo falla).
+    `titles`: títulos que ya tienen las recetas, para no cambiarlos.
+    """
+    posts = [(caption or "", author or "") for caption, author in posts]
+    out: List[Tuple[Optional[Result], Optional[str]]] = [(None, None)] * len(posts)
+    pending = list(range(len(posts)))
+    if model is not None and threshold < 1:
+        stamp, pending = local_stamp(classifier), []
+        with metrics.timer("folder_model"):
+            predicted = model.predict(posts)
+        for i, (folder, prob) in enumerate(predicted):
+            if prob >= threshold:
+                title = titles[i] if titles and titles[i] and titles[i] != DEFAULT_TITLE else guess_title(posts[i][0])
+                out[i] = ((title, folder), stamp)
+            else:
+                pending.append(i)
+        classifier.stats["local"] += len(posts) - len(pending)
+    if pending:
+        results = classifier.classify_all([posts[i] for i in pending], fallback=None)
+        for i, result in zip(pending, results):
+            out[i] = (result, classifier.stamp if result is not None else None)
+    return out
+
+# ----------------- INFORME -----------------
+def report(seed: int = 0) -> dict:
+    """Precisión en un HOLDOUT reservado (global y por umbral: cobertura y aciertos) y velocidad."""
+    categories = list(taxonomy.CATEGORIAS)
+    posts, folders, weights = training_data(categories)
+    if len(posts) < MIN_SAMPLES:
+        raise SystemExit(f"❌ Solo hay {len(posts)} recetas etiquetadas (mínimo {MIN_SAMPLES})")
+    order = np.random.default_rng(seed).permutation(len(posts))
+    cut = int(len(posts) * (1 - HOLDOUT))
+    train_ids, test_ids = order[:cut], order[cut:]
+
+    start = time.perf_counter()
+    rows, labels, w = _encode(posts, folders, weights, categories)
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model = fit_calibrated([rows[i] for i in train_ids], labels[train_ids], w[train_ids], categories)
+    train_s = time.perf_counter() - start
+
+    test_posts = [posts[i] for i in test_ids]
+    start = time.perf_counter()
+    predicted = model.predict(test_posts)
+    predict_s = time.perf_counter() - start
+    truth = [folders[i] for i in test_ids]
+    hits = [folder == t for (folder, _), t in zip(predicted, truth)]
+    thresholds = {}
+    for threshold in REPORT_THRESHOLDS:
+        kept = [hit for hit, (_, prob) in zip(hits, predicted) if prob >= threshold]
+        thresholds[threshold] = {"coverage": round(len(kept) / len(hits), 4),
+                                 "accuracy": round(sum(kept) / len(kept), 4) if kept else None}
+    return {
+        "samples": len(posts), "train": len(train_ids), "test": len(test_ids),
+        "accuracy": round(sum(hits) / len(hits), 4),
+        "baseline": round(max(truth.count(c) for c in set(truth)) / len(truth), 4),  # la carpeta más frecuente
+        "thresholds": thresholds,
+        "temperature": round(model.temperature, 3),
+        "train_s": round(train_s, 2),
+        "train_rows_per_s": round(len(train_ids) / (train_s + encode_s * len(train_ids) / len(posts)), 1),
+        "predict_rows_per_s": round(len(test_posts) / predict_s, 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clasificador local de carpetas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("train", help="entrenar con las recetas etiquetadas")
+    p_report = sub.add_parser("report", help="precisión y velocidad con validación")
+    p_report.add_argument("--json", type=Path, help="guardar el informe en este fichero")
+    args = parser.parse_args()
+
+    if not available():
+        raise SystemExit("❌ El clasificador local necesita numpy")
+    init_db()
+    if args.command == "train":
+        model = train()
+        if model is None:
+            raise SystemExit(f"❌ Hacen falta al menos {MIN_SAMPLES} recetas etiquetadas")
+        print(f"✅ Entrenado con {model.meta['samples']} recetas en {model.meta['train_s']}s -> {model_path()}")
+    else:
+        result = report()
+        print(f"▶ {result['samples']} recetas etiquetadas ({result['train']} para entrenar, {result['test']} para validar)")
+        print(f"▶ precisión {result['accuracy']:.1%} (la carpeta más frecuente: {result['baseline']:.1%})")
+        for threshold, t in result["thresholds"].items():
+            accuracy = "-" if t["accuracy"] is None else f"{t['accuracy']:.1%}"
+            marker = "  ◀ LOCAL_CLASSIFIER_THRESHOLD" if math.isclose(threshold, THRESHOLD) else ""
+            print(f"  umbral {threshold:.2f}: {t['coverage']:.1%} sin el modelo, {accuracy} de aciertos{marker}")
+        print(f"▶ entrenamiento {result['train_s']}s ({result['train_rows_per_s']:.0f} recetas/s), "
+              f"clasificación {result['predict_rows_per_s']:.0f} recetas/s")
+        if args.json:
+            args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False))
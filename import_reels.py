@@ -1,175 +1,242 @@
+import argparse
 import json
 import lzma
-import sqlite3
-import subprocess
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
+import folder_model
+from classifier import Classifier, DEFAULT_TITLE, DEFAULT_FOLDER
+from config import settings
+from db_sqlite import get_conn, init_db, transaction, upsert_recipes
+from ingredients import index_recipes as index_ingredients
+from media_store import store_copy
+from previews import ffmpeg_available, update_recipe_previews
+from thumbs import make_thumbnails
 
 # --- CONFIG ---
-DB_FILE = Path(__file__).resolve().parent / "recetas_dev.db"
 SAVED_DIR = Path("D:/")  # Ajusta según tu carpeta
-OLLAMA_EXEC = "C:/Users/MATEO/AppData/Local/Programs/Ollama/ollama.exe"  # Si no está en PATH, pon la ruta completa, ej: "C:/Users/MATEO/AppData/Local/Programs/Ollama/ollama.exe"
-
-# ----------------- DATABASE -----------------
-def get_conn():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def upsert_recipe(data: dict):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM recipes WHERE url=?", (data.get("url"),))
-    row = cur.fetchone()
-    if row:
-        cur.execute(
-            """UPDATE recipes SET
-                shortcode=?, author=?, caption=?, image=?, video=?, posted_at=?,
-                likes=?, title=?, folder=?
-                WHERE id=?
-            """,
-            (
-                data.get("shortcode"),
-                data.get("author"),
-                data.get("caption"),
-                data.get("image"),
-                data.get("video"),
-                data.get("posted_at"),
-                data.get("likes"),
-                data.get("title"),
-                data.get("folder"),
-                row["id"],
-            ),
-        )
-    else:
-        cur.execute(
-            """INSERT INTO recipes
-            (url, shortcode, author, caption, image, video, posted_at, likes, title, folder)
-            VALUES (?,?,?,?,?,?,?,?,?,?)
-            """,
-            (
-                data.get("url"),
-                data.get("shortcode"),
-                data.get("author"),
-                data.get("caption"),
-                data.get("image"),
-                data.get("video"),
-                data.get("posted_at"),
-                data.get("likes"),
-                data.get("title"),
-                data.get("folder"),
-            ),
-        )
-    conn.commit()
-    conn.close()
-
-def create_folder(name: str):
-    conn = get_conn()
-    cur = conn.cursor()
+
+# ----------------- IMPORTER -----------------
+# Pipeline en tres etapas:
+#   1. Un pool de procesos descomprime y decodifica los .json.xz (CPU).
+#   2. Un hilo clasifica en bloques, alimentado por una cola acotada: primero
+#      el clasificador local (folder_model.py) y lo que no tiene claro con
+#      Ollama (classifier.py lanza varias peticiones a la vez).
+#   3. Un único escritor copia la multimedia y guarda por lotes, cada lote en
+#      una transacción junto con su registro en import_manifest.
+# Si se interrumpe, al relanzarlo se saltan los ficheros ya registrados. Si una
+# etapa falla, lo anota en stats["failure"]: las demás dejan de trabajar, vacían
+# sus colas (nadie se queda bloqueado en un put) e import_saved relanza el error.
+_DONE = object()  # marca de fin de cola
+
+def decode_post(json_file: Path) -> dict:
+    """Lee un .json.xz de Instaloader y devuelve los datos de la receta (sin multimedia en memoria)."""
+    with lzma.open(json_file, "rt", encoding="utf-8") as f:
+        post = json.load(f)
+
+    node = post.get("node", {})
+    shortcode = node.get("shortcode")
+    caption_edges = node.get("edge_media_to_caption", {}).get("edges", [])
+    taken_at = node.get("taken_at_timestamp")
+
+    base_path = json_file.with_suffix("")  # quita .xz
+    jpg_file = base_path.with_suffix(".jpg")
+    mp4_file = base_path.with_suffix(".mp4")
+
+    return {
+        "source": json_file.name,
+        "url": f"https://www.instagram.com/p/{shortcode}/",
+        "shortcode": shortcode,
+        "author": node.get("owner", {}).get("username", "desconocido"),
+        "caption": caption_edges[0]["node"]["text"] if caption_edges else "",
+        "posted_at": datetime.fromtimestamp(taken_at, timezone.utc).isoformat() if taken_at else None,
+        "likes": node.get("edge_liked_by", {}).get("count", 0),
+        "jpg_file": str(jpg_file) if jpg_file.exists() else None,
+        "mp4_file": str(mp4_file) if mp4_file.exists() else None,
+        # Las miniaturas se generan aquí, en los procesos de decodificación, y no en el escritor
+        "thumb_key": make_thumbnails(jpg_file) if jpg_file.exists() else None,
+    }
+
+def imported_sources() -> set:
+    cur = get_conn().execute("SELECT source FROM import_manifest")
+    return {r["source"] for r in cur.fetchall()}
+
+def _decode_stage(files, decoders: int, out_q: queue.Queue, stats: dict):
+    """Reparte la decodificación entre procesos manteniendo acotado el trabajo en vuelo."""
+    with ProcessPoolExecutor(max_workers=decoders) as pool:
+        pending = deque()
+        for json_file in files:
+            if stats["failure"]:
+                break
+            pending.append((json_file, pool.submit(decode_post, json_file)))
+            if len(pending) >= decoders * 4:
+                _forward(*pending.popleft(), out_q, stats)
+        while pending and not stats["failure"]:
+            _forward(*pending.popleft(), out_q, stats)
+        for _, future in pending:
+            future.cancel()
+
+def _forward(json_file: Path, future, out_q: queue.Queue, stats: dict):
     try:
-        cur.execute("INSERT INTO folders (name) VALUES (?)", (name,))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass
-    conn.close()
-
-# ----------------- OLLAMA -----------------
-def ollama_generate(prompt: str, model: str = "llama3.2") -> str:
-    """Llama a Ollama local usando subprocess, devuelve texto generado."""
-    result = subprocess.run(
-        [OLLAMA_EXEC, "run", model],
-        input=prompt,
-        capture_output=True,
-        text=True,
-        timeout=120
-    )
-    if result.returncode != 0:
-        print("❌ Error Ollama:", result.stderr)
-        return "Receta sin título"
-    return result.stdout.strip()
-
-CATEGORIAS = [
-  "Bizcochos", "Tartas", "Tartas de queso", "Tartas de frutas",
-  "Cupcakes", "Donuts", "Galletas", "Brownies",
-  "Waffles y gofres", "Crepes y tortitas", "Pasteles", "Bollería",
-  "Helados",
-  "Panes", "Pizza", "Masas",
-  "Otros"
-]
-
-def analyze_post(caption: str, author: str):
-    prompt = f"""
-Eres un asistente que organiza recetas de Instagram en carpetas.
-
-Dada la publicación:
-
-Autor: {author}
-Descripción: {caption}
-
-1. Genera un título breve y atractivo para la receta (máx. 7 palabras).
-2. Asigna la receta a UNA sola categoría de la siguiente lista (elige solo una, sin inventar nuevas):
-
-{", ".join(CATEGORIAS)}
-
-Si no encaja claramente en ninguna, asigna "Otros".
-
-Responde SOLO en formato JSON:
-{{"title": "...", "folder": "..."}}.
-"""
-    raw = ollama_generate(prompt)
+        out_q.put(future.result())
+    except Exception as e:
+        stats["errors"] += 1
+        print(f"❌ No se pudo leer {json_file.name}: {e}")
+
+def _classify_stage(in_q: queue.Queue, out_q: queue.Queue, classifier: Classifier, stats: dict,
+                    local: folder_model.FolderModel = None):
     try:
-        data = json.loads(raw)
-        return data.get("title", "Receta sin título"), data.get("folder", "General")
-    except Exception:
-        return "Receta sin título", "General"
+        _classify_chunks(in_q, out_q, classifier, local, stats)
+    except Exception as e:
+        stats["failure"] = e
+        print(f"❌ Clasificación detenida: {e}")
+        _drain(in_q, 1)
+    finally:
+        out_q.put(_DONE)
+
+def _drain(in_q: queue.Queue, producers: int):
+    """Descarta lo que llegue hasta que terminen los productores (que no se queden en un put)."""
+    finished = 0
+    while finished < producers:
+        if in_q.get() is _DONE:
+            finished += 1
+
+def _classify_chunks(in_q: queue.Queue, out_q: queue.Queue, classifier: Classifier, local, stats: dict):
+    chunk_size = classifier.concurrency * classifier.batch_size
+    finished = False
+    while not finished:
+        # Bloque: espera al primer post y añade los que ya estén en cola
+        chunk = []
+        post = in_q.get()
+        while post is not _DONE:
+            chunk.append(post)
+            if len(chunk) >= chunk_size:
+                break
+            try:
+                post = in_q.get_nowait()
+            except queue.Empty:
+                break
+        finished = post is _DONE
+        if stats["failure"]:
+            continue  # otra etapa ha fallado: solo se vacía la cola
+
+        results = folder_model.classify_all(classifier, local, ((p["caption"], p["author"]) for p in chunk))
+        for p, (result, stamp) in zip(chunk, results):
+            if result is None:
+                # Se importa igualmente; renovar_folders.py la clasificará más tarde
+                p["title"], p["folder"], p["classified_with"] = DEFAULT_TITLE, DEFAULT_FOLDER, None
+            else:
+                (p["title"], p["folder"]), p["classified_with"] = result, stamp
+            out_q.put(p)
+
+def _copy_media(post: dict):
+    # Copia en streaming al almacén por contenido; nunca se carga el vídeo entero en memoria
+    post["image_path"] = post["video_path"] = None
+    if post["jpg_file"]:
+        post["image_path"], _ = store_copy(post["jpg_file"], "jpg")
+    if post["mp4_file"]:
+        post["video_path"], _ = store_copy(post["mp4_file"], "mp4")
+
+def _write_batch(batch: list) -> list:
+    """Guarda el lote en una transacción. Devuelve [(id, video_path)] de las recetas con vídeo."""
+    for post in batch:
+        _copy_media(post)
+    with transaction() as cur:
+        upsert_recipes(batch, batch_size=len(batch))
+        cur.executemany("INSERT OR REPLACE INTO import_manifest (source, shortcode) VALUES (?, ?)",
+                        [(post["source"], post["shortcode"]) for post in batch])
+        rows = cur.execute("SELECT id, url FROM recipes WHERE url IN (SELECT value FROM json_each(?))",
+                           (json.dumps([post["url"] for post in batch]),)).fetchall()
+        index_ingredients([r["id"] for r in rows])
+    with_video = {post["url"]: post["video_path"] for post in batch if post["video_path"]}
+    return [(r["id"], with_video[r["url"]]) for r in rows if r["url"] in with_video]
+
+def _write_stage(in_q: queue.Queue, producers: int, batch_size: int, stats: dict,
+                 previews: ThreadPoolExecutor = None):
+    batch = []
+    finished = 0
+    while finished < producers:
+        try:
+            post = in_q.get(timeout=1)
+        except queue.Empty:
+            post = None
+        if post is _DONE:
+            finished += 1
+        elif post is not None and not stats["failure"]:
+            batch.append(post)
+            print(f"✅ {post['shortcode']}: {post['title']} en carpeta {post['folder']}")
+        # Se guarda al completar el lote o si la cola se ha quedado parada
+        if batch and (len(batch) >= batch_size or post is None or finished == producers):
+            try:
+                written = _write_batch(batch)
+            except Exception as e:
+                # Se anota y se sigue vaciando la cola hasta el final: si el hilo muriera
+                # aquí, la clasificación se quedaría bloqueada para siempre con la cola llena
+                stats["failure"] = e
+                print(f"❌ Escritura detenida: {e}")
+                batch = []
+                continue
+            for recipe_id, video_path in written:
+                if previews:
+                    previews.submit(update_recipe_previews, recipe_id, video_path)
+            stats["imported"] += len(batch)
+            batch = []
+            elapsed = time.perf_counter() - stats["start"]
+            print(f"💾 {stats['imported']} importados ({stats['imported'] / elapsed:.1f} posts/s)")
+
+def import_saved(saved_dir: Path = SAVED_DIR, decoders: int = None, classifiers: int = None,
+                 batch_size: int = 50, limit: int = None):
+    init_db()
+    done = imported_sources()
+    files = [f for f in sorted(saved_dir.glob("*.json.xz")) if f.name not in done]
+    if limit:
+        files = files[:limit]
+    print(f"🟢 {len(files)} posts por importar ({len(done)} ya importados)")
+    if not files:
+        return
+
+    stats = {"imported": 0, "errors": 0, "failure": None, "start": time.perf_counter()}
+    classifier = Classifier(concurrency=classifiers)
+    local = folder_model.load()
+    decoded_q = queue.Queue(maxsize=classifier.concurrency * classifier.batch_size * 2)
+    classified_q = queue.Queue(maxsize=batch_size * 2)
+
+    worker = threading.Thread(target=_classify_stage, args=(decoded_q, classified_q, classifier, stats, local),
+                              daemon=True)
+    # Pósters y vistas previas en paralelo al resto (ffmpeg limitado por FFMPEG_WORKERS)
+    previews = ThreadPoolExecutor(max_workers=settings.FFMPEG_WORKERS) if ffmpeg_available() else None
+    writer = threading.Thread(target=_write_stage, args=(classified_q, 1, batch_size, stats, previews))
+    worker.start()
+    writer.start()
 
-# ----------------- IMPORTER -----------------
-def import_saved():
-    cnt = 0
-    for json_file in SAVED_DIR.glob("*.json.xz"):
-        with lzma.open(json_file, "rt", encoding="utf-8") as f:
-            post = json.load(f)
-
-        cnt += 1
-        if(cnt == 100):
-            return
-        shortcode = post.get("node", {}).get("shortcode")
-        url = f"https://www.instagram.com/p/{shortcode}/"
-        author = post.get("node", {}).get("owner", {}).get("username", "desconocido")
-        caption_edges = post.get("node", {}).get("edge_media_to_caption", {}).get("edges", [])
-        caption = caption_edges[0]["node"]["text"] if caption_edges else ""
-        posted_at = post.get("node", {}).get("taken_at_timestamp")
-        likes = post.get("node", {}).get("edge_liked_by", {}).get("count", 0)
-
-        # Leer multimedia en binario
-        image = None
-        video = None
-        base_path = json_file.with_suffix("")  # quita .xz
-        jpg_file = base_path.with_suffix(".jpg")
-        mp4_file = base_path.with_suffix(".mp4")
-
-        if jpg_file.exists():
-            image = jpg_file.read_bytes()
-        if mp4_file.exists():
-            video = mp4_file.read_bytes()
-
-        # Analizar con Ollama
-        title, folder = analyze_post(caption, author)
-        create_folder(folder)
-
-        recipe = {
-            "url": url,
-            "shortcode": shortcode,
-            "author": author,
-            "caption": caption,
-            "image": image,
-            "video": video,
-            "posted_at": posted_at,
-            "likes": likes,
-            "title": title,
-            "folder": folder,
-        }
-        upsert_recipe(recipe)
-        print(f"✅ Guardado {cnt}: {title} en carpeta {folder}")
+    try:
+        _decode_stage(files, decoders or os.cpu_count() or 1, decoded_q, stats)
+    finally:
+        decoded_q.put(_DONE)
+        writer.join()
+        if previews:
+            print("⏳ Terminando las vistas previas de los vídeos...")
+            previews.shutdown(wait=True)
+    if stats["failure"]:
+        # Lo guardado hasta el fallo queda en import_manifest: al relanzar se sigue desde ahí
+        raise stats["failure"]
+
+    elapsed = time.perf_counter() - stats["start"]
+    print(f"✅ Importación terminada: {stats['imported']} posts en {elapsed:.1f}s "
+          f"({stats['imported'] / elapsed:.1f} posts/s), {classifier.stats['local']} con el clasificador local, "
+          f"{stats['errors']} errores")
 
 if __name__ == "__main__":
-    import_saved()
+    parser = argparse.ArgumentParser(description="Importa posts guardados con Instaloader (*.json.xz).")
+    parser.add_argument("saved_dir", nargs="?", type=Path, default=SAVED_DIR)
+    parser.add_argument("--decoders", type=int, default=None, help="procesos para descomprimir (por defecto, nº de CPUs)")
+    parser.add_argument("--classifiers", type=int, default=None, help="llamadas simultáneas a Ollama")
+    parser.add_argument("--batch", type=int, default=50, help="posts por transacción")
+    parser.add_argument("--limit", type=int, default=None, help="importar como mucho N posts")
+    args = parser.parse_args()
+    import_saved(args.saved_dir, args.decoders, args.classifiers, args.batch, args.limit)
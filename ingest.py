@@ -0,0 +1,131 @@
+"""
+Importación masiva de URLs (o shortcodes) de Instagram.
+
+Cada entrada se normaliza a su shortcode y a la URL canónica
+https://www.instagram.com/p/<shortcode>/, así que /p/, /reel/, /tv/ y las
+variantes con ?igsh=... cuentan como el mismo post. Los repetidos se descartan
+con una consulta al almacenamiento de recetas (storage.repo, idx_recipes_shortcode)
+y otra a la cola (SQLite, idx_scrape_jobs_shortcode), y solo se encolan (jobs.py)
+los posts que de verdad son nuevos.
+
+Uso: python ingest.py urls.txt [--folder Tartas] [--wait] [--workers 4]
+     cat urls.txt | python ingest.py -
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import jobs
+from db_sqlite import get_conn, init_db
+from storage import repo
+
+SHORTCODE_RE = re.compile(r"^[A-Za-z0-9_-]{5,64}$")
+POST_PATHS = {"p", "reel", "reels", "tv"}
+INSTAGRAM_HOSTS = {"instagram.com", "www.instagram.com", "m.instagram.com", "instagr.am"}
+
+def canonical_shortcode(text: str) -> Optional[str]:
+    """Shortcode de una URL de post/reel o de un shortcode suelto; None si no lo parece."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    if "/" not in text:
+        return text if SHORTCODE_RE.match(text) else None
+    if "://" not in text:
+        text = "https://" + text
+    parts = urlsplit(text)
+    if (parts.hostname or "").lower() not in INSTAGRAM_HOSTS:
+        return None
+    segments = [s for s in parts.path.split("/") if s]
+    # /p/<code>/, /reel/<code>/ y también /<usuario>/p/<code>/
+    for kind, code in zip(segments, segments[1:]):
+        if kind.lower() in POST_PATHS and SHORTCODE_RE.match(code):
+            return code
+    return None
+
+def canonical_url(shortcode: str) -> str:
+    return f"https://www.instagram.com/p/{shortcode}/"
+
+def known_shortcodes(shortcodes: List[str]) -> set:
+    """Los que ya son receta (en el motor configurado) o están en cola (pendientes o en curso)."""
+    if not shortcodes:
+        return set()
+    known = repo.known_shortcodes(shortcodes)
+    pending = [s for s in shortcodes if s not in known]
+    if pending:
+        rows = get_conn().execute("""
+            SELECT DISTINCT shortcode FROM scrape_jobs
+            WHERE shortcode IN (SELECT value FROM json_each(?)) AND status IN ('pending', 'running')
+        """, (json.dumps(pending),))
+        known.update(r[0] for r in rows)
+    return known
+
+def ingest(items: Iterable[str], title: Optional[str] = None, folder: Optional[str] = None) -> Dict:
+    """
+    Normaliza, deduplica y encola. Devuelve un resumen con los contadores y los ids
+    de los trabajos creados.
+    """
+    received = invalid = 0
+    seen = {}
+    for item in items:
+        received += 1
+        shortcode = canonical_shortcode(item)
+        if shortcode is None:
+            invalid += 1
+        else:
+            seen.setdefault(shortcode, None)
+
+    unique = list(seen)
+    known = known_shortcodes(unique)
+    new = [s for s in unique if s not in known]
+    if folder and new:
+        repo.create_folder(folder)
+    job_ids = jobs.enqueue_many([canonical_url(s) for s in new], title=title, folder=folder, shortcodes=new)
+    return {
+        "received": received,
+        "invalid": invalid,
+        "duplicates": received - invalid - len(unique),
+        "existing": len(known),
+        "queued": len(job_ids),
+        "job_ids": job_ids,
+    }
+
+def wait_for(job_ids: List[int], workers: Optional[int] = None, interval: float = 2.0):
+    """Procesa la cola en este proceso e informa del progreso hasta terminar los trabajos dados."""
+    pool = jobs.WorkerPool(workers=workers).start()
+    total = len(job_ids)
+    try:
+        while True:
+            status = {}
+            for i in range(0, total, 500):
+                for job in jobs.get_jobs(job_ids[i:i + 500]):
+                    status[job["status"]] = status.get(job["status"], 0) + 1
+            finished = status.get(jobs.DONE, 0) + status.get(jobs.ERROR, 0)
+            print(f"⏳ {finished}/{total} terminados ({status.get(jobs.DONE, 0)} ok, "
+                  f"{status.get(jobs.ERROR, 0)} con error, {status.get(jobs.RUNNING, 0)} en curso)")
+            if finished >= total:
+                break
+            time.sleep(interval)
+    finally:
+        pool.stop(timeout=5)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encola muchas URLs o shortcodes de Instagram.")
+    parser.add_argument("file", help="fichero con una URL o shortcode por línea ('-' para stdin)")
+    parser.add_argument("--folder", default=None, help="carpeta para todas las recetas")
+    parser.add_argument("--wait", action="store_true", help="procesar la cola aquí y esperar a que termine")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()  # cola de trabajos (SQLite)
+    repo.init_db()
+    source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    with source:
+        summary = ingest((line for line in source if line.strip()), folder=args.folder)
+    print(f"🟢 {summary['received']} entradas: {summary['queued']} nuevas en cola, "
+          f"{summary['existing']} ya existentes, {summary['duplicates']} repetidas, {summary['invalid']} no válidas")
+    if args.wait and summary["job_ids"]:
+        wait_for(summary["job_ids"], workers=args.workers)
@@ -0,0 +1,439 @@
+"""
+Ingredientes de las recetas e índice invertido por ingrediente.
+
+Las descripciones de Instagram suelen traer la lista de ingredientes
+("Ingredientes:", "- 200 g de harina", "2 huevos L", "Azúcar: 100g"...).
+extract() la saca del texto y normaliza cada ingrediente a un nombre canónico
+(sin tildes, en singular, sin adjetivos de preparación y con sinónimos
+unificados: "polvo de hornear" = "levadura quimica"), con cantidad y unidad.
+
+Tablas (migración 17):
+  ingredients              id, nombre canónico y nº de recetas que lo usan
+  recipe_ingredients       (ingrediente, receta) WITHOUT ROWID: la clave primaria
+                           es la lista de recetas de cada ingrediente, ordenada
+  ingredient_extractions   receta, versión, nº de ingredientes (NULL = pendiente)
+                           y su ingrediente menos usado
+
+Las recetas nuevas o con la descripción cambiada quedan pendientes (triggers).
+El scraping (jobs.py) y la importación (import_reels.py) las procesan al
+guardarlas; el resto (la biblioteca anterior, restauraciones) con `backfill`.
+
+Las búsquedas cruzan esas listas sin recorrer recetas ni descripciones: se
+recorre la más corta y las demás se consultan por su clave (ingrediente, receta):
+  find("harina, huevo|leche, -nuez")    harina Y (huevo O leche) Y NO nuez
+  using_only(["harina", "huevo", ...])  recetas que solo usan esos (más PANTRY)
+Los recuentos se cortan en MAX_RESULTS, como la búsqueda semántica.
+
+Un término incluye sus variantes: "chocolate" es también "chocolate negro".
+
+Uso: python ingredients.py backfill [--workers N]
+     python ingredients.py find "harina, huevo|leche, -nuez"
+     python ingredients.py only "harina, huevo, azucar, leche" [--missing 1]
+"""
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db_sqlite import get_conn, init_db, transaction
+
+CHUNK = 1000
+MAX_LINES = 40  # líneas de la sección de ingredientes que se miran como mucho
+MAX_WORDS = 3  # palabras del nombre canónico
+PANTRY = ("agua", "sal")  # se dan por disponibles en using_only
+MAX_RESULTS = 1008  # 48 páginas de 21
+
+UNITS = {
+    "g": "g", "gr": "g", "grs": "g", "gramo": "g", "gramos": "g", "kg": "kg", "kilo": "kg", "kilos": "kg",
+    "ml": "ml", "cl": "cl", "dl": "dl", "l": "l", "litro": "l", "litros": "l",
+    "cucharada": "cucharada", "cucharadas": "cucharada", "cda": "cucharada", "cdas": "cucharada",
+    "cucharadita": "cucharadita", "cucharaditas": "cucharadita", "cdta": "cucharadita", "cdtas": "cucharadita",
+    "cdita": "cucharadita", "cditas": "cucharadita", "taza": "taza", "tazas": "taza", "vaso": "vaso", "vasos": "vaso",
+    "unidad": "unidad", "unidades": "unidad", "ud": "unidad", "uds": "unidad", "u": "unidad",
+    "pizca": "pizca", "pizcas": "pizca", "sobre": "sobre", "sobres": "sobre", "hoja": "hoja", "hojas": "hoja",
+    "diente": "diente", "dientes": "diente", "punado": "puñado", "punados": "puñado", "chorro": "chorro",
+    "chorrito": "chorro", "rama": "rama", "ramas": "rama", "lata": "lata", "latas": "lata",
+    "paquete": "paquete", "paquetes": "paquete", "loncha": "loncha", "lonchas": "loncha",
+}
+NUMBERS = {
+    "un": 1, "una": 1, "uno": 1, "medio": 0.5, "media": 0.5, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5,
+    "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "doce": 12,
+}
+FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3}
+# Palabras que describen el estado o el tamaño, no el ingrediente
+DESCRIPTORS = frozenset("""
+    grande grandes mediano mediana medianos medianas pequeno pequena pequenos pequenas xl talla tamano
+    fresco fresca frescos frescas templado templada templados templadas tibio tibia frio fria caliente
+    ambiente blando blanda pomada derretido derretida fundido fundida tamizado tamizada batido batida
+    picado picada picados picadas rallado rallada troceado troceada maduro madura maduros maduras
+    extra bueno buena calidad casero casera entera entero semidesnatada desnatada fina fino opcional poco
+""".split())
+FILLERS = frozenset("de del la el los las unos unas un una y con".split())
+# Sinónimos y variantes que son lo mismo a efectos de "¿lo tengo?"
+ALIASES = {
+    "harina de trigo": "harina", "harina todo uso": "harina", "harina floja": "harina",
+    "harina de reposteria": "harina", "azucar blanco": "azucar", "azucar blanca": "azucar",
+    "azucar glass": "azucar glas", "azucar impalpable": "azucar glas", "azucar en polvo": "azucar glas",
+    "mantequilla sin sal": "mantequilla", "nata para montar": "nata", "nata liquida": "nata",
+    "crema de leche": "nata", "polvo de hornear": "levadura quimica", "polvo para hornear": "levadura quimica",
+    "impulsor": "levadura quimica", "levadura royal": "levadura quimica", "levadura fresca": "levadura",
+    "levadura de panadero": "levadura", "levadura seca": "levadura", "esencia de vainilla": "vainilla",
+    "extracto de vainilla": "vainilla", "aroma de vainilla": "vainilla", "vaina de vainilla": "vainilla",
+    "yema de huevo": "yema", "clara de huevo": "clara", "cacao puro": "cacao", "cacao en polvo": "cacao",
+    "cacao puro en": "cacao", "chocolate fondant": "chocolate negro", "chocolate de cobertura": "chocolate negro",
+    "huevo campero": "huevo",
+}
+INVARIABLE = frozenset("anis gas mas tres seis crepes gofres".split())
+# Nombres que salen de subtítulos o frases, no de ingredientes
+NOT_INGREDIENTS = frozenset("ingrediente base relleno cobertura decoracion decorar masa molde opcional".split())
+
+_BULLET_RE = re.compile(r"^[^\w½¼¾⅓⅔]+")
+_NUMBER = (r"(?:\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?\s*[½¼¾⅓⅔]?|[½¼¾⅓⅔])(?![.)º°\d])|(?:"
+           + "|".join(sorted(NUMBERS, key=len, reverse=True)) + r")\b")
+_UNIT = "|".join(sorted(UNITS, key=len, reverse=True))
+_LEADING_RE = re.compile(rf"^(?P<qty>{_NUMBER})\s*(?:(?P<unit>{_UNIT})\b\.?)?\s*(?:de\s+|del\s+)?(?P<name>.+)$")
+_TRAILING_RE = re.compile(rf"^(?P<name>[^\d:]+?)\s*[:\-–]?\s*(?P<qty>{_NUMBER})\s*(?:(?P<unit>{_UNIT})\b\.?)?\W*$")
+_HEADER_RE = re.compile(r"^\W*ingredientes?\b")
+_END_RE = re.compile(r"^\W*(preparacion|elaboracion|pasos|instrucciones|metodo|modo de|procedimiento|como se hace)\b")
+_CUT_RE = re.compile(r"[,;:(/]|\s(?:o|y|para|al gusto|a temperatura|tipo|aprox\w*)\s")
+_ACCENTS = str.maketrans("áéíóúüàèìòùâêîôûç", "aeiouuaeiouaeiouc")
+
+# ----------------- EXTRACCIÓN -----------------
+def normalize(text: str) -> str:
+    """Minúsculas sin tildes (ñ -> n)."""
+    text = (text or "").lower().translate(_ACCENTS)
+    if text.isascii():
+        return text
+    # NFD y no NFKD: NFKD convertiría "½" en "1⁄2"
+    text = unicodedata.normalize("NFD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or not word.endswith("s") or word in INVARIABLE or word.endswith(("us", "is")):
+        return word
+    if word.endswith("ces"):
+        return word[:-3] + "z"  # nueces -> nuez
+    if word.endswith("es") and word[-3] in "lnrdjy":
+        return word[:-2]  # limones -> limon
+    return word[:-1]
+
+def canonical(name: str) -> Optional[str]:
+    """Nombre canónico de un ingrediente ("Huevos L (a temperatura ambiente)" -> "huevo")."""
+    name = _CUT_RE.split(f" {normalize(name)} ", 1)[0]
+    # Los descriptores se quitan antes de pasar a singular ("grandes" -> "grand" no está en DESCRIPTORS)
+    words = [_singular(w) for w in re.findall(r"[a-zñ]+", name) if w not in DESCRIPTORS]
+    words = [w for w in words if len(w) > 1 and w not in DESCRIPTORS]
+    while words and words[0] in FILLERS:
+        words.pop(0)
+    while words and words[-1] in FILLERS:
+        words.pop()
+    name = " ".join(words[:MAX_WORDS])
+    name = ALIASES.get(name, name)
+    if not name or name in UNITS or name in NUMBERS or name in NOT_INGREDIENTS:
+        return None
+    return name
+
+def _quantity(text: str) -> Optional[float]:
+    text = text.strip().replace(",", ".")
+    if text in NUMBERS:
+        return float(NUMBERS[text])
+    value = sum(FRACTIONS[c] for c in text if c in FRACTIONS)
+    text = "".join(c for c in text if c not in FRACTIONS).strip()
+    try:
+        if "/" in text:
+            num, den = text.split("/", 1)
+            return value + float(num) / float(den)
+        return value + (float(text) if text else 0.0)
+    except (ValueError, ZeroDivisionError):
+        return value or None
+
+def parse_line(line: str) -> Optional[Dict]:
+    """{'name', 'quantity', 'unit', 'raw'} de una línea de ingrediente, o None si no lo parece."""
+    raw = line.strip()
+    text = _BULLET_RE.sub("", normalize(raw)).strip()
+    if not text or text.endswith(":") or len(text) > 120:
+        return None
+    match = _LEADING_RE.match(text) or _TRAILING_RE.match(text)
+    quantity = unit = None
+    if match:
+        quantity = _quantity(match["qty"])
+        unit = UNITS.get(match["unit"]) if match["unit"] else None
+        text = match["name"]
+    name = canonical(text)
+    if name is None:
+        return None
+    return {"name": name, "quantity": quantity, "unit": unit, "raw": raw[:200]}
+
+def extract(caption: Optional[str]) -> List[Dict]:
+    """
+    Ingredientes de una descripción, sin repetir. Con cabecera "Ingredientes" se
+    leen las líneas que la siguen hasta la preparación; sin ella, solo las
+    líneas que empiezan por una cantidad ("200 g de harina", "2 huevos").
+    """
+    lines = (caption or "").splitlines()
+    start = next((i for i, line in enumerate(lines) if _HEADER_RE.match(normalize(line))), None)
+    found = {}
+    if start is not None:
+        for line in lines[start + 1:start + 1 + MAX_LINES]:
+            text = normalize(line)
+            if _END_RE.match(text) or text.lstrip().startswith("#"):
+                break
+            item = parse_line(line)
+            if item:
+                found.setdefault(item["name"], item)
+    else:
+        for line in lines:
+            text = _BULLET_RE.sub("", normalize(line)).strip()
+            if len(text.split()) <= 8 and _LEADING_RE.match(text):
+                item = parse_line(line)
+                if item and item["quantity"] is not None:
+                    found.setdefault(item["name"], item)
+    return list(found.values())
+
+# ----------------- ESCRITURA -----------------
+def _store(cur, parsed: Sequence[Tuple[int, int, List[Dict]]]) -> int:
+    """
+    Guarda [(recipe_id, version, ingredientes)] de una vez. Se descartan las
+    recetas cuya versión ya no es la pendiente (la descripción cambió mientras
+    tanto: se volverán a procesar). Devuelve cuántas se guardaron.
+    """
+    stored = []
+    for recipe_id, version, items in parsed:
+        cur.execute("UPDATE ingredient_extractions SET total=? WHERE recipe_id=? AND version=?",
+                    (len(items), recipe_id, version))
+        if cur.rowcount:
+            stored.append((recipe_id, items))
+    if not stored:
+        return 0
+    names = sorted({i["name"] for _, items in stored for i in items})
+    cur.executemany("INSERT OR IGNORE INTO ingredients (name) VALUES (?)", [(n,) for n in names])
+    ids = {r["name"]: r["id"] for r in cur.execute(
+        "SELECT id, name FROM ingredients WHERE name IN (SELECT value FROM json_each(?))", (json.dumps(names),))}
+    cur.execute("DELETE FROM recipe_ingredients WHERE recipe_id IN (SELECT value FROM json_each(?))",
+                (json.dumps([recipe_id for recipe_id, _ in stored]),))
+    cur.executemany(
+        "INSERT INTO recipe_ingredients (ingredient_id, recipe_id, position, quantity, unit, raw) VALUES (?, ?, ?, ?, ?, ?)",
+        [(ids[i["name"]], recipe_id, pos, i["quantity"], i["unit"], i["raw"])
+         for recipe_id, items in stored for pos, i in enumerate(items)])
+    # Su ingrediente menos usado: si la receta solo usa ingredientes disponibles,
+    # ese también lo está (using_only busca por él)
+    cur.execute("""
+        UPDATE ingredient_extractions SET rarest = (
+            SELECT ri.ingredient_id FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id
+            WHERE ri.recipe_id = ingredient_extractions.recipe_id ORDER BY i.recipes, i.id LIMIT 1
+        ) WHERE recipe_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps([recipe_id for recipe_id, _ in stored]),))
+    # Cambian los resultados de las búsquedas por ingrediente: páginas en caché (cache.py)
+    cur.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    return len(stored)
+
+def _pending(recipe_ids: Optional[Sequence[int]] = None, after_id: int = 0, limit: int = CHUNK) -> List[tuple]:
+    """(recipe_id, version, caption) pendientes, de esas recetas o a partir de after_id."""
+    sql = """
+        SELECT e.recipe_id, e.version, r.caption FROM ingredient_extractions e JOIN recipes r ON r.id = e.recipe_id
+        WHERE e.total IS NULL AND e.recipe_id > ?
+    """
+    params = [after_id]
+    if recipe_ids is not None:
+        sql += " AND e.recipe_id IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(recipe_ids)))
+    sql += " ORDER BY e.recipe_id LIMIT ?"
+    params.append(limit)
+    return [tuple(r) for r in get_conn().execute(sql, params)]
+
+def _extract_chunk(rows: Sequence[tuple]) -> List[Tuple[int, int, List[Dict]]]:
+    return [(recipe_id, version, extract(caption)) for recipe_id, version, caption in rows]
+
+def index_recipes(recipe_ids: Iterable[int]) -> int:
+    """Extrae y guarda los ingredientes de esas recetas si están pendientes (al guardarlas)."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    parsed = _extract_chunk(_pending(recipe_ids, limit=len(recipe_ids)))
+    with transaction() as cur:
+        return _store(cur, parsed)
+
+def backfill(workers: Optional[int] = None, chunk: int = CHUNK) -> int:
+    """
+    Procesa todas las recetas pendientes por bloques de `chunk`: la extracción
+    (CPU) en `workers` procesos y la escritura, por lotes, en este.
+    """
+    workers = workers or os.cpu_count() or 1
+    done, last_id, start = 0, 0, time.perf_counter()
+
+    def chunks():
+        nonlocal last_id
+        while True:
+            rows = _pending(after_id=last_id, limit=chunk)
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def write(parsed):
+        nonlocal done
+        with transaction() as cur:
+            done += _store(cur, parsed)
+        print(f"🥚 {done} recetas procesadas ({done / (time.perf_counter() - start):.0f}/s)")
+
+    if workers <= 1:
+        for rows in chunks():
+            write(_extract_chunk(rows))
+        return done
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Como mucho 2 bloques por proceso en vuelo: memoria acotada en bibliotecas grandes
+        pending = deque()
+        for rows in chunks():
+            pending.append(pool.submit(_extract_chunk, rows))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return done
+
+# ----------------- CONSULTAS -----------------
+def parse_query(text: str) -> Tuple[List[List[str]], List[str]]:
+    """"harina, huevo|leche, -nuez" -> ([["harina"], ["huevo", "leche"]], ["nuez"])."""
+    groups, excluded = [], []
+    for part in re.split(r"[,;\n]", text or ""):
+        part = part.strip()
+        if part.startswith("-"):
+            excluded.extend(t.strip() for t in part[1:].split("|") if t.strip())
+        elif part:
+            groups.append([t.strip() for t in part.split("|") if t.strip()])
+    return groups, excluded
+
+def _resolve(terms: Iterable[str]) -> Tuple[List[int], int]:
+    """Ids de los ingredientes que nombran esos términos, con sus variantes ("chocolate" -> "chocolate negro"...), y cuántas recetas los usan."""
+    names = sorted({canonical(t) or normalize(t).strip() for t in terms} - {""})
+    if not names:
+        return [], 0
+    rows = get_conn().execute("""
+        SELECT DISTINCT i.id, i.recipes FROM json_each(?) t JOIN ingredients i
+        ON i.name = t.value OR (i.name > t.value || ' ' AND i.name < t.value || ' ~')
+    """, (json.dumps(names),)).fetchall()
+    return [r[0] for r in rows], sum(r[1] for r in rows)
+
+def ingredient_ids(terms: Iterable[str]) -> List[int]:
+    return _resolve(terms)[0]
+
+_IN_LIST = "(SELECT value FROM json_each(?))"
+
+def _find_sql(groups: Sequence[Sequence[str]], excluded: Sequence[str] = ()) -> Tuple[Optional[str], list]:
+    """
+    SQL de los ids que cumplen la consulta, de la más nueva a la más antigua;
+    None si no puede haber resultados. Se recorre la lista del grupo con menos
+    recetas y para cada una se comprueban los demás grupos (EXISTS) y los
+    excluidos (NOT EXISTS) por la clave primaria.
+    """
+    resolved = sorted((_resolve(group) for group in groups), key=lambda r: r[1])
+    if not resolved or not resolved[0][0]:
+        return None, []  # sin grupos, o un ingrediente que no usa ninguna receta: intersección vacía
+    probe = f"EXISTS (SELECT 1 FROM recipe_ingredients x WHERE x.ingredient_id IN {_IN_LIST} AND x.recipe_id = ri.recipe_id)"
+    conditions, params = [f"ri.ingredient_id IN {_IN_LIST}"], [json.dumps(resolved[0][0])]
+    for ids, _ in resolved[1:]:
+        conditions.append(probe)
+        params.append(json.dumps(ids))
+    excluded_ids = ingredient_ids(excluded)
+    if excluded_ids:
+        conditions.append("NOT " + probe)
+        params.append(json.dumps(excluded_ids))
+    distinct = "DISTINCT " if len(resolved[0][0]) > 1 else ""
+    sql = f"SELECT {distinct}ri.recipe_id FROM recipe_ingredients ri WHERE {' AND '.join(conditions)} ORDER BY ri.recipe_id DESC"
+    return sql, params
+
+def _query(query) -> Tuple[Optional[str], list]:
+    return _find_sql(*(parse_query(query) if isinstance(query, str) else query))
+
+def _page(sql: str, params: list, limit: int, offset: int) -> List[int]:
+    rows = get_conn().execute(f"{sql} LIMIT ? OFFSET ?", params + [limit, offset])
+    return [r[0] for r in rows]
+
+def _count(sql: str, params: list) -> int:
+    return get_conn().execute(f"SELECT COUNT(*) FROM ({sql} LIMIT ?)", params + [MAX_RESULTS]).fetchone()[0]
+
+def find(query, limit: int = 50, offset: int = 0) -> List[int]:
+    """Ids (de la más nueva a la más antigua) que cumplen la consulta: texto ("harina, huevo|leche, -nuez") o (grupos, excluidos)."""
+    sql, params = _query(query)
+    return [] if sql is None else _page(sql, params, limit, offset)
+
+def count(query) -> int:
+    """Recetas que cumplen la consulta, hasta MAX_RESULTS."""
+    sql, params = _query(query)
+    return 0 if sql is None else _count(sql, params)
+
+def _only_sql(available: Iterable[str], missing: int) -> Tuple[Optional[str], list]:
+    ids = ingredient_ids(list(available) + list(PANTRY))
+    if not ids:
+        return None, []
+    lacking = f"FROM recipe_ingredients x WHERE x.recipe_id = e.recipe_id AND x.ingredient_id NOT IN {_IN_LIST}"
+    if not missing:
+        # Solo las recetas cuyo ingrediente menos usado está disponible, y de ellas las que no necesitan otro
+        return f"""
+            SELECT e.recipe_id FROM ingredient_extractions e
+            WHERE e.rarest IN {_IN_LIST} AND NOT EXISTS (SELECT 1 {lacking})
+            ORDER BY e.recipe_id DESC
+        """, [json.dumps(ids)] * 2
+    # Faltando alguno, el menos usado puede ser justo el que falta: se miran todas
+    # las recetas, pidiendo que al menos un ingrediente esté disponible
+    return f"""
+        SELECT e.recipe_id FROM ingredient_extractions e
+        WHERE e.total > ? AND (SELECT COUNT(*) {lacking}) <= ?
+        ORDER BY e.recipe_id DESC
+    """, [missing, json.dumps(ids), missing]
+
+def using_only(available: Iterable[str], missing: int = 0, limit: int = 50, offset: int = 0) -> List[int]:
+    """Ids de las recetas que se pueden hacer con esos ingredientes (más PANTRY), faltando como mucho `missing`."""
+    sql, params = _only_sql(available, missing)
+    return [] if sql is None else _page(sql, params, limit, offset)
+
+def count_using_only(available: Iterable[str], missing: int = 0) -> int:
+    """Recetas de using_only, hasta MAX_RESULTS."""
+    sql, params = _only_sql(available, missing)
+    return 0 if sql is None else _count(sql, params)
+
+def for_recipe(recipe_id: int) -> List[Dict]:
+    """Ingredientes extraídos de una receta: [{'name', 'quantity', 'unit', 'raw'}]."""
+    rows = get_conn().execute("""
+        SELECT i.name, ri.quantity, ri.unit, ri.raw FROM recipe_ingredients ri JOIN ingredients i ON i.id = ri.ingredient_id
+        WHERE ri.recipe_id = ? ORDER BY ri.position
+    """, (recipe_id,))
+    return [dict(r) for r in rows]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingredientes de las recetas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_backfill = sub.add_parser("backfill", help="extraer los ingredientes de las recetas pendientes")
+    p_backfill.add_argument("--workers", type=int, default=None)
+    p_backfill.add_argument("--chunk", type=int, default=CHUNK)
+    p_find = sub.add_parser("find", help='recetas con estos ingredientes: "harina, huevo|leche, -nuez"')
+    p_find.add_argument("query")
+    p_only = sub.add_parser("only", help="recetas que solo usan estos ingredientes")
+    p_only.add_argument("available", help='separados por comas: "harina, huevo, azucar"')
+    p_only.add_argument("--missing", type=int, default=0, help="ingredientes que pueden faltar")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "backfill":
+        start = time.perf_counter()
+        n = backfill(workers=args.workers, chunk=args.chunk)
+        print(f"✅ Ingredientes de {n} recetas en {time.perf_counter() - start:.1f}s")
+    else:
+        start = time.perf_counter()
+        if args.command == "find":
+            total, ids = count(args.query), find(args.query, limit=20)
+        else:
+            available = [t for t in args.available.split(",") if t.strip()]
+            total, ids = count_using_only(available, args.missing), using_only(available, args.missing, limit=20)
+        elapsed = (time.perf_counter() - start) * 1000
+        rows = get_conn().execute("SELECT id, title FROM recipes WHERE id IN (SELECT value FROM json_each(?))",
+                                  (json.dumps(ids),))
+        titles = {r["id"]: r["title"] for r in rows}
+        for recipe_id in ids:
+            print(f"#{recipe_id}  {titles.get(recipe_id)}")
+        print(f"🔎 {total} recetas ({elapsed:.1f} ms)")
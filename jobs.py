@@ -0,0 +1,215 @@
+"""
+Cola persistente de trabajos de scraping (tabla scrape_jobs).
+
+/add solo encola la URL y responde enseguida con el id del trabajo. Un grupo de
+hilos (WorkerPool, arrancado por app.py o con `python jobs.py` en otro proceso)
+va sacando trabajos: como mucho SCRAPE_RATE arranques por segundo en total y
+SCRAPE_MAX_PER_HOST trabajos a la vez contra el mismo host. Los fallos se
+reintentan con espera creciente hasta MAX_ATTEMPTS.
+
+Uso: python jobs.py [--workers 2]
+"""
+import argparse
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from config import settings
+from db_sqlite import get_conn, init_db, transaction
+from previews import make_previews
+from storage import repo
+from taxonomy import MANUAL
+from thumbs import thumb_for_upload
+
+PENDING, RUNNING, DONE, ERROR = "pending", "running", "done", "error"
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30  # segundos, multiplicados por el número de intento
+STALE_AFTER = 600  # un trabajo 'running' más antiguo se da por abandonado (proceso caído)
+POLL_INTERVAL = 1.0  # espera cuando no hay trabajos listos
+
+JOB_COLUMNS = "id, url, title, folder, status, attempts, error, recipe_id, created_at, finished_at"
+
+def host_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+# ----------------- COLA -----------------
+def enqueue(url: str, title: Optional[str] = None, folder: Optional[str] = None,
+            shortcode: Optional[str] = None) -> int:
+    return enqueue_many([url], title=title, folder=folder, shortcodes=[shortcode])[0]
+
+def enqueue_many(urls: List[str], title: Optional[str] = None, folder: Optional[str] = None,
+                 shortcodes: Optional[List[Optional[str]]] = None) -> List[int]:
+    """Encola varias URLs en una sola transacción y devuelve los ids de los trabajos."""
+    shortcodes = shortcodes or [None] * len(urls)
+    ids = []
+    with transaction() as cur:
+        for url, shortcode in zip(urls, shortcodes):
+            cur.execute("INSERT INTO scrape_jobs (url, host, shortcode, title, folder) VALUES (?, ?, ?, ?, ?)",
+                        (url, host_of(url), shortcode, title, folder))
+            ids.append(cur.lastrowid)
+    return ids
+
+def get_job(job_id: int) -> Optional[Dict]:
+    row = get_conn().execute(f"SELECT {JOB_COLUMNS} FROM scrape_jobs WHERE id=?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_jobs(ids: Iterable[int]) -> List[Dict]:
+    ids = list(ids)[:500]
+    if not ids:
+        return []
+    rows = get_conn().execute(
+        f"SELECT {JOB_COLUMNS} FROM scrape_jobs WHERE id IN ({','.join('?' * len(ids))})", ids)
+    return [dict(r) for r in rows]
+
+def recent_jobs(limit: int = 50) -> List[Dict]:
+    rows = get_conn().execute(f"SELECT {JOB_COLUMNS} FROM scrape_jobs ORDER BY id DESC LIMIT ?", (limit,))
+    return [dict(r) for r in rows]
+
+def claim_job(max_per_host: int):
+    """
+    Marca como 'running' el siguiente trabajo listo cuyo host no esté al límite y lo
+    devuelve (None si no hay). Es una sola sentencia dentro de BEGIN IMMEDIATE, así
+    que dos hilos o procesos nunca se llevan el mismo trabajo.
+    """
+    with transaction() as cur:
+        rows = cur.execute("""
+            UPDATE scrape_jobs SET status='running', attempts=attempts+1, started_at=datetime('now')
+            WHERE id = (
+                SELECT id FROM scrape_jobs
+                WHERE status='pending' AND run_after <= datetime('now')
+                  AND host NOT IN (SELECT host FROM scrape_jobs WHERE status='running'
+                                   GROUP BY host HAVING COUNT(*) >= ?)
+                ORDER BY id LIMIT 1)
+            RETURNING id, url, title, folder, attempts
+        """, (max_per_host,)).fetchall()
+    return rows[0] if rows else None
+
+def requeue_stale() -> int:
+    """Devuelve a la cola los trabajos que se quedaron 'running' (proceso caído)."""
+    with transaction() as cur:
+        cur.execute("UPDATE scrape_jobs SET status='pending' WHERE status='running' AND started_at < datetime('now', ?)",
+                    (f"-{STALE_AFTER} seconds",))
+        return cur.rowcount
+
+def _finish(job_id: int, status: str, error: Optional[str] = None, recipe_id: Optional[int] = None,
+            retry_in: int = 0):
+    with transaction() as cur:
+        cur.execute("""
+            UPDATE scrape_jobs SET status=?, error=?, recipe_id=?,
+                   run_after=datetime('now', ?), finished_at=CASE WHEN ? IN ('done', 'error') THEN datetime('now') END
+            WHERE id=?
+        """, (status, error, recipe_id, f"+{retry_in} seconds", status, job_id))
+
+# ----------------- TRABAJO -----------------
+def process_job(job) -> str:
+    # instaloader y requests solo en los procesos que ejecutan trabajos, no en los que los encolan
+    from scraper import scrape_instagram_post, ScrapeError
+    from ingredients import index_recipes as index_ingredients
+    try:
+        data = scrape_instagram_post(job["url"])
+    except ScrapeError as e:
+        if job["attempts"] < MAX_ATTEMPTS:
+            _finish(job["id"], PENDING, error=str(e), retry_in=RETRY_DELAY * job["attempts"])
+            return PENDING
+        _finish(job["id"], ERROR, error=str(e))
+        return ERROR
+
+    recipe_id = repo.upsert_recipe({
+        'url': job["url"],
+        'shortcode': data.get('shortcode'),
+        'author': data.get('author'),
+        'caption': data.get('caption'),
+        'image_path': data.get('image_path'),
+        'video_path': data.get('video_path'),
+        'posted_at': data.get('posted_at'),
+        'likes': data.get('likes'),
+        'thumb_key': thumb_for_upload(data.get('image_path')),
+        'title': job["title"],
+        'folder': job["folder"],
+        # Título o carpeta elegidos a mano: el reclasificador no los toca
+        'classified_with': MANUAL if (job["title"] or job["folder"]) else None,
+    })
+    if repo.name == "sqlite":
+        # Los ingredientes (ingredients.py) y los vectores (semantic.py) viven en SQLite
+        index_ingredients([recipe_id])
+        import semantic  # numpy: solo en los procesos que ejecutan trabajos
+        if semantic.available():
+            semantic.refresh()  # solo cambia data_version si guarda vectores
+    if data.get('video_path'):
+        repo.set_previews(recipe_id, *make_previews(data['video_path']))
+    _finish(job["id"], DONE, recipe_id=recipe_id)
+    return DONE
+
+class RateLimiter:
+    """Cubo de fichas compartido por los hilos: `rate` arranques por segundo, ráfagas de `burst`."""
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class WorkerPool:
+    def __init__(self, workers: int = None, rate: float = None, max_per_host: int = None):
+        self.workers = settings.SCRAPE_WORKERS if workers is None else workers
+        self.max_per_host = max_per_host or settings.SCRAPE_MAX_PER_HOST
+        self.limiter = RateLimiter(settings.SCRAPE_RATE if rate is None else rate)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> "WorkerPool":
+        requeue_stale()
+        for n in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"scrape-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = claim_job(self.max_per_host)
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            self.limiter.acquire()
+            try:
+                status = process_job(job)
+            except Exception as e:
+                # Un fallo inesperado no debe tumbar el hilo
+                _finish(job["id"], ERROR, error=f"{type(e).__name__}: {e}")
+                status = ERROR
+            print(f"{'✅' if status == DONE else '⚠️'} Trabajo {job['id']} ({status}): {job['url']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa la cola de scraping.")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    init_db()
+    pool = WorkerPool(workers=args.workers).start()
+    print(f"🟢 {pool.workers} hilos procesando la cola (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop(timeout=5)
@@ -0,0 +1,211 @@
+"""
+Almacén de multimedia direccionado por contenido.
+
+Cada fichero se guarda una sola vez como static/uploads/media/ab/cd/<sha256>.<ext>
+(dos niveles de subcarpetas para que ningún directorio crezca sin límite). Las
+rutas de recipes.image_path / video_path apuntan ahí; la tabla media lleva la
+cuenta de cuántas recetas usan cada fichero (la mantienen triggers, ver
+migrations.py) y el recolector (gc) borra los que se quedan sin referencias.
+
+Uso: python media_store.py migrate [--workers N]   pasa las subidas antiguas al almacén
+     python media_store.py gc [--scan]             borra ficheros sin referencias
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+from db_sqlite import get_conn, init_db, transaction, UPLOAD_FOLDER
+
+MEDIA_DIR = "media"
+TMP_FOLDER = UPLOAD_FOLDER / MEDIA_DIR / "tmp"
+GRACE_SECONDS = 3600  # no se borra nada tocado hace menos (descargas en curso)
+BLOCK_SIZE = 1024 * 1024
+CHUNK = 500
+
+def media_path(digest: str, ext: str) -> str:
+    """Ruta relativa a UPLOAD_FOLDER para un hash y una extensión."""
+    return f"{MEDIA_DIR}/{digest[:2]}/{digest[2:4]}/{digest}.{ext.lstrip('.')}"
+
+def _place(src: Path, digest: str, ext: str, move: bool) -> str:
+    """
+    Registra el fichero en media y lo coloca en su sitio si no estaba. Se hace con la
+    base de datos bloqueada para no cruzarse con gc() borrando ese mismo hash.
+    """
+    rel = media_path(digest, ext)
+    dest = UPLOAD_FOLDER / rel
+    with transaction() as cur:
+        cur.execute("""
+            INSERT INTO media (path, refs) VALUES (?, 0)
+            ON CONFLICT(path) DO UPDATE SET updated_at = datetime('now')
+        """, (rel,))
+        if dest.exists():
+            if move:
+                os.unlink(src)
+        else:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if move:
+                os.replace(src, dest)
+            else:
+                try:
+                    os.link(src, dest)  # mismo disco: sin copiar datos
+                except OSError:
+                    shutil.copyfile(src, dest)
+    return rel
+
+class MediaWriter:
+    """
+    Escribe un fichero nuevo por trozos calculando su hash sobre la marcha:
+
+        with MediaWriter("mp4") as w:
+            for chunk in chunks:
+                w.write(chunk)
+        w.path, w.size
+
+    Al salir sin errores el fichero queda en el almacén (si ya existía, se descarta
+    la copia nueva); con error, se borra el temporal.
+    """
+    def __init__(self, ext: str):
+        self.ext = ext
+        self.size = 0
+        self.path = None
+        self._hash = hashlib.sha256()
+
+    def __enter__(self) -> "MediaWriter":
+        TMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=TMP_FOLDER, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        return self
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None:
+            os.unlink(self._tmp_path)
+            return False
+        self.path = _place(Path(self._tmp_path), self._hash.hexdigest(), self.ext, move=True)
+        return False
+
+def store_copy(src, ext: str) -> Tuple[str, int]:
+    """Copia un fichero externo al almacén. Devuelve (ruta relativa, tamaño)."""
+    with MediaWriter(ext) as w, open(src, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            w.write(block)
+    return w.path, w.size
+
+def store_file(path, ext: str) -> str:
+    """Mueve al almacén un fichero ya terminado (p. ej. una salida de ffmpeg en TMP_FOLDER)."""
+    return _place(Path(path), file_digest(path), ext, move=True)
+
+def file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# ----------------- MIGRACIÓN -----------------
+def _convert(rel: str) -> Optional[str]:
+    src = UPLOAD_FOLDER / rel
+    if not src.is_file():
+        return None
+    # El original se queda donde está: gc() lo borra cuando deja de tener referencias
+    return _place(src, file_digest(src), src.suffix or ".bin", move=False)
+
+def migrate_flat(workers: Optional[int] = None) -> int:
+    """Pasa al almacén las rutas antiguas (static/uploads/<shortcode>.jpg) en paralelo."""
+    rows = get_conn().execute(f"""
+        SELECT image_path AS path FROM recipes WHERE image_path IS NOT NULL AND image_path NOT LIKE '{MEDIA_DIR}/%'
+        UNION
+        SELECT video_path FROM recipes WHERE video_path IS NOT NULL AND video_path NOT LIKE '{MEDIA_DIR}/%'
+    """).fetchall()
+    paths = [r["path"] for r in rows]
+    total, converted = len(paths), 0
+    print(f"🟢 {total} ficheros por pasar al almacén")
+
+    # Leer y calcular hashes es E/S y hashlib libera el GIL: basta con hilos
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for i in range(0, total, CHUNK):
+            chunk = paths[i:i + CHUNK]
+            moved = [(new, old) for old, new in zip(chunk, pool.map(_convert, chunk)) if new]
+            with transaction() as cur:
+                cur.executemany("UPDATE recipes SET image_path=? WHERE image_path=?", moved)
+                cur.executemany("UPDATE recipes SET video_path=? WHERE video_path=?", moved)
+            converted += len(moved)
+            print(f"[{min(i + CHUNK, total)}/{total}] {converted} ficheros en el almacén")
+    return converted
+
+# ----------------- RECOLECTOR -----------------
+def _unlink(path: Path) -> int:
+    """Borra y devuelve los bytes liberados (0 si era un enlace duro a un fichero que sigue vivo)."""
+    try:
+        st = path.stat()
+        path.unlink()
+        return st.st_size if st.st_nlink == 1 else 0
+    except FileNotFoundError:
+        return 0
+
+def gc(scan: bool = False) -> Tuple[int, int]:
+    """
+    Borra los ficheros sin referencias. Con scan, además recorre static/uploads y
+    borra lo que no conoce la base de datos (ficheros sueltos antiguos, temporales
+    abandonados y miniaturas que ya no usa ninguna receta).
+    Devuelve (ficheros, bytes) liberados.
+    """
+    files = freed = 0
+    grace = f"-{GRACE_SECONDS} seconds"
+    while True:
+        with transaction() as cur:
+            rows = cur.execute("SELECT path FROM media WHERE refs <= 0 AND updated_at < datetime('now', ?) LIMIT ?",
+                               (grace, CHUNK)).fetchall()
+            if not rows:
+                break
+            cur.executemany("DELETE FROM media WHERE path=?", [(r["path"],) for r in rows])
+            # Dentro de la transacción: _place() espera a que terminemos
+            for r in rows:
+                freed += _unlink(UPLOAD_FOLDER / r["path"])
+                files += 1
+
+    if scan:
+        conn = get_conn()
+        known = {r[0] for r in conn.execute("SELECT path FROM media")}
+        thumb_keys = {r[0] for r in conn.execute("SELECT DISTINCT thumb_key FROM recipes WHERE thumb_key IS NOT NULL")}
+        cutoff = time.time() - GRACE_SECONDS
+        for path in UPLOAD_FOLDER.rglob("*"):
+            if not path.is_file() or path.stat().st_mtime > cutoff:
+                continue
+            rel = path.relative_to(UPLOAD_FOLDER).as_posix()
+            if rel.startswith("thumbs/"):
+                orphan = path.stem.rsplit("-", 1)[0] not in thumb_keys
+            else:
+                orphan = rel not in known
+            if orphan:
+                freed += _unlink(path)
+                files += 1
+    return files, freed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén de multimedia por contenido.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_migrate = sub.add_parser("migrate", help="pasar las subidas antiguas al almacén")
+    p_migrate.add_argument("--workers", type=int, default=None)
+    p_gc = sub.add_parser("gc", help="borrar ficheros sin referencias")
+    p_gc.add_argument("--scan", action="store_true", help="buscar también ficheros que la base de datos no conoce")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "migrate":
+        converted = migrate_flat(workers=args.workers)
+        print(f"✅ {converted} ficheros en el almacén (los originales se borran con: python media_store.py gc)")
+    else:
+        files, freed = gc(scan=args.scan)
+        print(f"✅ {files} ficheros borrados, {freed / 1024 / 1024:.1f} MB liberados")
@@ -0,0 +1,414 @@
+"""
+Métricas de rendimiento: tiempos por ruta, estadísticas de SQL y perfilado.
+
+- Peticiones: init_app(app) mide cada petición por (método, ruta, estado) y
+  añade la cabecera Server-Timing (app y db, con el nº de consultas), visible
+  en las herramientas de desarrollo del navegador.
+- SQL: db_sqlite abre las conexiones como InstrumentedConnection (METRICS_SQL).
+  Por sentencia (SQL normalizado, sin los valores) se cuentan ejecuciones,
+  tiempo y filas; las que pasan de SLOW_QUERY_MS se imprimen con su
+  EXPLAIN QUERY PLAN y quedan en slow_queries().
+- Scraping y modelo: timer()/timed() alrededor de scrape_instagram_post y de
+  las llamadas a Ollama.
+- render() devuelve todo en el formato de texto de Prometheus (/metrics).
+  Como la caché en memoria, las métricas son de cada proceso.
+- Perfilado: con PROFILING=1, ?profile=1 en cualquier URL devuelve, en vez de
+  la página, las pilas muestreadas cada PROFILE_INTERVAL durante esa petición en
+  formato "folded" (flamegraph.pl, speedscope, inferno):
+      curl 'http://localhost:5000/search?q=tarta&profile=1' > search.folded
+"""
+import functools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+from config import settings
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SQL_ENABLED = settings.METRICS_SQL
+SLOW_QUERY_S = settings.SLOW_QUERY_MS / 1000
+SLOW_LOG = 50  # consultas lentas que se guardan
+MAX_STATEMENTS = 500  # sentencias distintas; el resto cuenta como OTHER
+MAX_SQL_CHARS = 300
+OTHER = "(otras)"
+PROFILE_INTERVAL = 0.001  # segundos entre muestras
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# ----------------- REGISTRO -----------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._series: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def lines(self) -> List[str]:
+        raise NotImplementedError
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in self._series.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def lines(self) -> List[str]:
+        out = []
+        with self._lock:
+            for key, (counts, total, n) in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    out.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                out.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {n}")
+                out.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+                out.append(f"{self.name}_count{_labels(self.label_names, key)} {n}")
+        return out
+
+_registry: List[Metric] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+def collector(fn: Callable[[], List[str]]) -> Callable[[], List[str]]:
+    """Registra una función que devuelve líneas ya en formato Prometheus (valores calculados al pedirlos)."""
+    _collectors.append(fn)
+    return fn
+
+def render() -> str:
+    out = []
+    for metric in _registry:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    for fn in _collectors:
+        out.extend(fn())
+    return "\n".join(out) + "\n"
+
+REQUESTS = Histogram("http_request_duration_seconds", "Duración de las peticiones HTTP", ("method", "route", "status"))
+SQL_DURATION = Histogram("sqlite_query_duration_seconds", "Duración de cada sentencia SQL (ejecución y lectura de filas)")
+SLOW_QUERIES = CounterMetric("sqlite_slow_queries_total", "Sentencias por encima de SLOW_QUERY_MS")
+TIMERS = Histogram("operation_duration_seconds", "Operaciones lentas medidas con timer(): scraping, modelo...",
+                   ("operation", "status"))
+
+@contextmanager
+def timer(operation: str):
+    """Mide el bloque en operation_duration_seconds{operation, status="ok"|"error"}."""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        TIMERS.observe(time.perf_counter() - start, operation=operation, status=status)
+
+def timed(operation: str):
+    """timer() como decorador."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# ----------------- SQL -----------------
+# Estadísticas por sentencia: [ejecuciones, segundos, filas, máximo]
+_statements: Dict[str, list] = {}
+_statements_lock = threading.Lock()
+_slow = deque(maxlen=SLOW_LOG)
+_request = threading.local()  # petición en curso en este hilo: ruta, tiempo y nº de consultas de SQL
+
+_SPACES_RE = re.compile(r"\s+")
+_MARKS_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+
+@functools.lru_cache(maxsize=2048)
+def statement(sql: str) -> str:
+    """SQL normalizado: espacios colapsados y las listas "?, ?, ?" de longitud variable en una."""
+    return _MARKS_RE.sub("?, ...", _SPACES_RE.sub(" ", sql).strip())[:MAX_SQL_CHARS]
+
+def _record(stmt: str, seconds: float, rows: int):
+    with _statements_lock:
+        stats = _statements.get(stmt)
+        if stats is None:
+            if len(_statements) >= MAX_STATEMENTS:
+                stmt = OTHER
+            stats = _statements.setdefault(stmt, [0, 0.0, 0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += rows
+        stats[3] = max(stats[3], seconds)
+    if getattr(_request, "active", False):
+        _request.db_seconds += seconds
+        _request.queries += 1
+
+def _plan(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+    """EXPLAIN QUERY PLAN indentado, con un cursor sin instrumentar."""
+    try:
+        rows = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(sin plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        node, parent, detail = row[0], row[1], row[3]
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+def _slow_query(conn, sql: str, params, seconds: float, rows: int):
+    SLOW_QUERIES.inc()
+    plan = _plan(conn, sql, params) if sql.lstrip().upper().startswith(EXPLAINABLE) else []
+    entry = {"sql": statement(sql), "ms": round(seconds * 1000, 2), "rows": rows, "plan": plan,
+             "route": getattr(_request, "route", None), "at": time.time()}
+    _slow.append(entry)
+    print(f"🐢 Consulta lenta ({entry['ms']} ms, {rows} filas): {entry['sql']}\n    " + "\n    ".join(plan))
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor que mide cada sentencia: lo que tarda execute() y lo que tarda leer
+    sus filas (SQLite las calcula al pedirlas). La sentencia se da por terminada
+    al leer la última fila, al ejecutar otra o al cerrar/soltar el cursor.
+    """
+    _sql = None
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, params, seconds, rows = self._sql, self._params, self._seconds, self._rows
+        self._sql = None
+        if rows < 0:
+            rows = max(self.rowcount, 0)  # INSERT/UPDATE/DELETE: filas afectadas
+        _record(statement(sql), seconds, rows)
+        SQL_DURATION.observe(seconds)
+        if seconds >= SLOW_QUERY_S:
+            _slow_query(self.connection, sql, params, seconds, rows)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql, self._params, self._rows = sql, parameters, -1
+            self._seconds = time.perf_counter() - start
+            if self.description is None:  # no devuelve filas: ya ha terminado
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            seconds = time.perf_counter() - start
+            _record(statement(sql), seconds, max(self.rowcount, 0))
+            SQL_DURATION.observe(seconds)
+
+    def _fetched(self, start: float, rows: int, done: bool):
+        if self._sql is None:
+            return
+        self._seconds += time.perf_counter() - start
+        self._rows = max(self._rows, 0) + rows
+        if done:
+            self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexión cuyos cursores (también los de conn.execute()) son InstrumentedCursor."""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() de sqlite3 crea su cursor sin pasar por cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def sql_stats() -> List[dict]:
+    """Sentencias de más a menos tiempo total."""
+    with _statements_lock:
+        items = list(_statements.items())
+    return sorted(({"sql": sql, "count": n, "seconds": round(s, 6), "rows": rows, "max_ms": round(mx * 1000, 3)}
+                   for sql, (n, s, rows, mx) in items), key=lambda r: -r["seconds"])
+
+def slow_queries() -> List[dict]:
+    return list(reversed(_slow))
+
+@collector
+def _sql_lines() -> List[str]:
+    with _statements_lock:
+        items = [(sql, list(stats)) for sql, stats in _statements.items()]
+    out = []
+    for name, i, help in (("sqlite_statement_executions_total", 0, "Ejecuciones por sentencia"),
+                          ("sqlite_statement_seconds_total", 1, "Tiempo total por sentencia"),
+                          ("sqlite_statement_rows_total", 2, "Filas leídas o modificadas por sentencia")):
+        out += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+        out += [f'{name}{{statement="{_escape(sql)}"}} {stats[i]}' for sql, stats in items]
+    return out
+
+# ----------------- FLASK -----------------
+def init_app(app):
+    """Mide las peticiones de `app`, añade Server-Timing y atiende ?profile=1 (si PROFILING)."""
+    from flask import g, request
+
+    @app.before_request
+    def _start():
+        _request.active = True
+        _request.route = request.url_rule.rule if request.url_rule else None
+        _request.db_seconds, _request.queries = 0.0, 0
+        g.metrics_start = time.perf_counter()
+        if settings.PROFILING and request.args.get("profile"):
+            g.profiler = Sampler(threading.get_ident()).start()
+
+    @app.after_request
+    def _finish(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        _request.active = False
+        REQUESTS.observe(elapsed, method=request.method, route=_request.route or "(sin ruta)",
+                         status=response.status_code)
+        response.headers["Server-Timing"] = (
+            f'app;dur={elapsed * 1000:.2f}, db;dur={_request.db_seconds * 1000:.2f};desc="{_request.queries} consultas"')
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            folded = profiler.stop()
+            response = app.response_class(folded, mimetype="text/plain")
+            response.headers["Content-Disposition"] = "attachment; filename=profile.folded"
+            response.headers["X-Profile-Samples"] = str(profiler.samples)
+        return response
+
+# ----------------- PERFILADO -----------------
+class Sampler:
+    """
+    Perfilador por muestreo de un hilo: cada `interval` segundos apunta su pila
+    (sys._current_frames) desde otro hilo. stop() devuelve las pilas en formato
+    "folded": "raíz;...;función nº_de_muestras" por línea.
+    """
+    # sys.setswitchinterval vale para todo el proceso: con varias peticiones perfiladas
+    # a la vez lo baja el primer muestreador y solo el último lo deja como estaba
+    _switch_lock = threading.Lock()
+    _active = 0
+    _switch = None
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "Sampler":
+        # Con el intervalo por defecto (5 ms) el hilo perfilado no soltaría el GIL a tiempo
+        with Sampler._switch_lock:
+            if Sampler._active == 0:
+                Sampler._switch = sys.getswitchinterval()
+            Sampler._active += 1
+            sys.setswitchinterval(min(sys.getswitchinterval(), self.interval / 2))
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> str:
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            with Sampler._switch_lock:
+                Sampler._active -= 1
+                if Sampler._active == 0:
+                    sys.setswitchinterval(Sampler._switch)
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
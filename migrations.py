@@ -0,0 +1,632 @@
+"""
+Migraciones de esquema versionadas.
+
+La versión aplicada se guarda en PRAGMA user_version. Cada migración se ejecuta
+en su propia transacción junto con el cambio de versión, así que un fallo deja
+la base de datos en la última versión completa. Para añadir una migración nueva
+basta con registrar una función con @migration(<siguiente número>, "...").
+
+Uso: python migrations.py
+"""
+from collections import namedtuple
+from typing import Optional
+
+from db_sqlite import get_conn, transaction, UPLOAD_FOLDER
+
+Migration = namedtuple("Migration", "version description apply")
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append(Migration(version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return register
+
+def schema_version(conn=None) -> int:
+    conn = conn or get_conn()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+def migrate(target: Optional[int] = None, verbose: bool = False) -> int:
+    """Aplica las migraciones pendientes hasta `target` (por defecto, la última)."""
+    conn = get_conn()
+    target = latest_version() if target is None else target
+    if schema_version(conn) >= target:
+        return schema_version(conn)
+
+    # Las reconstrucciones de tablas necesitan las claves foráneas desactivadas,
+    # y este PRAGMA no tiene efecto dentro de una transacción.
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for m in MIGRATIONS:
+            if m.version > target:
+                break
+            with transaction() as cur:
+                # Se vuelve a comprobar dentro del bloqueo por si otro proceso
+                # ya la ha aplicado
+                if schema_version(conn) >= m.version:
+                    continue
+                m.apply(cur)
+                problems = cur.execute("PRAGMA foreign_key_check").fetchall()
+                if problems:
+                    raise RuntimeError(f"Migración {m.version}: {len(problems)} filas con claves foráneas rotas")
+                cur.execute(f"PRAGMA user_version = {int(m.version)}")
+            if verbose:
+                print(f"🟢 Migración {m.version} aplicada: {m.description}")
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+    return schema_version(conn)
+
+# ----------------- SQL COMPARTIDO -----------------
+# Triggers que mantienen recipes_fts sincronizado con recipes (tabla de contenido externo)
+FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipes_fts(rowid, title, author, caption)
+        VALUES (new.id, new.title, new.author, new.caption);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_ad AFTER DELETE ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, title, author, caption)
+        VALUES ('delete', old.id, old.title, old.author, old.caption);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_fts_au AFTER UPDATE OF title, author, caption ON recipes BEGIN
+        INSERT INTO recipes_fts(recipes_fts, rowid, title, author, caption)
+        VALUES ('delete', old.id, old.title, old.author, old.caption);
+        INSERT INTO recipes_fts(rowid, title, author, caption)
+        VALUES (new.id, new.title, new.author, new.caption);
+    END
+    """,
+)
+
+# Triggers que llevan en media.refs cuántas recetas usan cada fichero (media_store.py)
+MEDIA_COLUMNS = ("image_path", "video_path", "poster_path", "preview_path")
+_MEDIA_REF = """
+    INSERT INTO media (path, refs) SELECT new.{col}, 1 WHERE new.{col} IS NOT NULL{extra}
+    ON CONFLICT(path) DO UPDATE SET refs = refs + 1, updated_at = datetime('now');
+"""
+_MEDIA_UNREF = """
+    UPDATE media SET refs = refs - 1, updated_at = datetime('now') WHERE path = old.{col}{extra};
+"""
+
+def media_triggers(columns=MEDIA_COLUMNS) -> tuple:
+    changed = " AND old.{col} IS NOT new.{col}"
+    return (
+        "CREATE TRIGGER IF NOT EXISTS media_refs_ai AFTER INSERT ON recipes BEGIN"
+        + "".join(_MEDIA_REF.format(col=c, extra="") for c in columns) + "END",
+        "CREATE TRIGGER IF NOT EXISTS media_refs_ad AFTER DELETE ON recipes BEGIN"
+        + "".join(_MEDIA_UNREF.format(col=c, extra="") for c in columns) + "END",
+        f"CREATE TRIGGER IF NOT EXISTS media_refs_au AFTER UPDATE OF {', '.join(columns)} ON recipes BEGIN"
+        + "".join(_MEDIA_UNREF.format(col=c, extra=changed.format(col=c)) for c in columns)
+        + "".join(_MEDIA_REF.format(col=c, extra=changed.format(col=c)) for c in columns) + "END",
+    )
+
+# Cualquier cambio en recetas o carpetas sube data_version (claves de cache.py)
+DATA_VERSION_TRIGGERS = tuple(
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {event} ON {table} BEGIN
+        UPDATE data_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for table in ("recipes", "folders")
+    for suffix, event in (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE"))
+)
+
+def _table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,))
+    return cur.fetchone() is not None
+
+def _columns(cur, table: str) -> set:
+    return {r["name"] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+
+# ----------------- MIGRACIONES -----------------
+@migration(1, "Esquema base y paso de BLOBs antiguos a ficheros")
+def _base_schema(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT UNIQUE,
+        shortcode TEXT,
+        author TEXT,
+        caption TEXT,
+        image_path TEXT,
+        video_path TEXT,
+        posted_at TEXT,
+        likes INTEGER,
+        title TEXT,
+        folder TEXT
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS folders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE
+    )
+    """)
+    columns = _columns(cur, "recipes")
+    if "image" in columns or "video" in columns:
+        _blobs_to_files(cur, columns)
+
+def _blobs_to_files(cur, columns: set):
+    """
+    Bases de datos antiguas guardaban la imagen y el vídeo como BLOB en recipes.
+    Se vuelcan a UPLOAD_FOLDER por lotes (sin cargar toda la tabla en memoria)
+    y se reconstruye la tabla sin esas columnas.
+    """
+    if "image_path" not in columns:
+        cur.execute("ALTER TABLE recipes ADD COLUMN image_path TEXT")
+    if "video_path" not in columns:
+        cur.execute("ALTER TABLE recipes ADD COLUMN video_path TEXT")
+    image_col = "image" if "image" in columns else "NULL"
+    video_col = "video" if "video" in columns else "NULL"
+
+    last_id = 0
+    while True:
+        rows = cur.execute(
+            f"SELECT id, shortcode, {image_col} AS image, {video_col} AS video FROM recipes "
+            "WHERE id > ? ORDER BY id LIMIT 100", (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        for r in rows:
+            image_path = f"{r['shortcode']}.jpg" if r["image"] else None
+            video_path = f"{r['shortcode']}.mp4" if r["video"] else None
+            if image_path:
+                (UPLOAD_FOLDER / image_path).write_bytes(r["image"])
+            if video_path:
+                (UPLOAD_FOLDER / video_path).write_bytes(r["video"])
+            if image_path or video_path:
+                cur.execute(
+                    "UPDATE recipes SET image_path=COALESCE(?, image_path), video_path=COALESCE(?, video_path) WHERE id=?",
+                    (image_path, video_path, r["id"]),
+                )
+        last_id = rows[-1]["id"]
+
+    cur.execute("ALTER TABLE recipes RENAME TO recipes_old")
+    cur.execute("""
+    CREATE TABLE recipes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT UNIQUE,
+        shortcode TEXT,
+        author TEXT,
+        caption TEXT,
+        image_path TEXT,
+        video_path TEXT,
+        posted_at TEXT,
+        likes INTEGER,
+        title TEXT,
+        folder TEXT
+    )
+    """)
+    cur.execute("""
+    INSERT INTO recipes (id, url, shortcode, author, caption, image_path, video_path, posted_at, likes, title, folder)
+    SELECT id, url, shortcode, author, caption, image_path, video_path, posted_at, likes, title, folder
+    FROM recipes_old
+    """)
+    cur.execute("DROP TABLE recipes_old")
+
+@migration(2, "Índice de texto completo FTS5")
+def _fts(cur):
+    # unicode61 + remove_diacritics: "bizcocho" encuentra "Bizcóchos"
+    fts_exists = _table_exists(cur, "recipes_fts")
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+        title, author, caption,
+        content='recipes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    for sql in FTS_TRIGGERS:
+        cur.execute(sql)
+    if not fts_exists:
+        # Indexar las recetas que ya existían
+        cur.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+
+@migration(3, "Contadores de recetas por carpeta")
+def _counts(cur):
+    # Tabla de contadores ('' = sin carpeta) mantenida por triggers; la migración 4
+    # la rehace sobre folder_id.
+    counts_exist = _table_exists(cur, "recipe_counts")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_counts (
+        folder TEXT PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_counts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipe_counts(folder, total) VALUES (COALESCE(new.folder, ''), 1)
+        ON CONFLICT(folder) DO UPDATE SET total = total + 1;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_counts_ad AFTER DELETE ON recipes BEGIN
+        UPDATE recipe_counts SET total = total - 1 WHERE folder = COALESCE(old.folder, '');
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_counts_au AFTER UPDATE OF folder ON recipes
+    WHEN old.folder IS NOT new.folder BEGIN
+        UPDATE recipe_counts SET total = total - 1 WHERE folder = COALESCE(old.folder, '');
+        INSERT INTO recipe_counts(folder, total) VALUES (COALESCE(new.folder, ''), 1)
+        ON CONFLICT(folder) DO UPDATE SET total = total + 1;
+    END
+    """)
+    if not counts_exist:
+        cur.execute("""
+        INSERT INTO recipe_counts(folder, total)
+        SELECT COALESCE(folder, ''), COUNT(*) FROM recipes GROUP BY COALESCE(folder, '')
+        """)
+
+@migration(4, "recipes.folder (texto) pasa a folder_id con clave foránea a folders")
+def _folder_fk(cur):
+    # Toda carpeta usada por alguna receta tiene que existir en folders
+    cur.execute("""
+    INSERT OR IGNORE INTO folders (name)
+    SELECT DISTINCT TRIM(folder) FROM recipes WHERE folder IS NOT NULL AND TRIM(folder) != ''
+    """)
+    row = cur.execute("SELECT seq FROM sqlite_sequence WHERE name='recipes'").fetchone()
+    seq = row["seq"] if row else 0
+
+    cur.execute("""
+    CREATE TABLE recipes_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT UNIQUE,
+        shortcode TEXT,
+        author TEXT,
+        caption TEXT,
+        image_path TEXT,
+        video_path TEXT,
+        posted_at TEXT,
+        likes INTEGER,
+        title TEXT,
+        folder_id INTEGER REFERENCES folders(id) ON DELETE SET NULL
+    )
+    """)
+    cur.execute("""
+    INSERT INTO recipes_new (id, url, shortcode, author, caption, image_path, video_path, posted_at, likes, title, folder_id)
+    SELECT r.id, r.url, r.shortcode, r.author, r.caption, r.image_path, r.video_path, r.posted_at, r.likes, r.title, f.id
+    FROM recipes r LEFT JOIN folders f ON f.name = TRIM(r.folder)
+    """)
+    # Al borrar recipes desaparecen también sus triggers; recipes_fts se conserva
+    # (mismos rowid) y solo hay que volver a crear los triggers.
+    cur.execute("DROP TABLE recipes")
+    cur.execute("ALTER TABLE recipes_new RENAME TO recipes")
+    cur.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name='recipes'", (seq,))
+    for sql in FTS_TRIGGERS:
+        cur.execute(sql)
+
+    # Contadores por folder_id (0 = sin carpeta)
+    cur.execute("DROP TABLE IF EXISTS recipe_counts")
+    cur.execute("""
+    CREATE TABLE recipe_counts (
+        folder_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("""
+    CREATE TRIGGER recipe_counts_ai AFTER INSERT ON recipes BEGIN
+        INSERT INTO recipe_counts(folder_id, total) VALUES (COALESCE(new.folder_id, 0), 1)
+        ON CONFLICT(folder_id) DO UPDATE SET total = total + 1;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER recipe_counts_ad AFTER DELETE ON recipes BEGIN
+        UPDATE recipe_counts SET total = total - 1 WHERE folder_id = COALESCE(old.folder_id, 0);
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER recipe_counts_au AFTER UPDATE OF folder_id ON recipes
+    WHEN old.folder_id IS NOT new.folder_id BEGIN
+        UPDATE recipe_counts SET total = total - 1 WHERE folder_id = COALESCE(old.folder_id, 0);
+        INSERT INTO recipe_counts(folder_id, total) VALUES (COALESCE(new.folder_id, 0), 1)
+        ON CONFLICT(folder_id) DO UPDATE SET total = total + 1;
+    END
+    """)
+    cur.execute("""
+    INSERT INTO recipe_counts(folder_id, total)
+    SELECT COALESCE(folder_id, 0), COUNT(*) FROM recipes GROUP BY COALESCE(folder_id, 0)
+    """)
+
+@migration(5, "Índices secundarios (carpeta, shortcode, fecha) y ANALYZE")
+def _indexes(cur):
+    # (folder_id, id DESC) sirve la vista de carpeta ya ordenada y los JOIN por carpeta
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_folder_id ON recipes(folder_id, id DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_shortcode ON recipes(shortcode)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_posted_at ON recipes(posted_at)")
+    cur.execute("ANALYZE")
+
+@migration(6, "Manifiesto de importación (import_reels.py reanudable)")
+def _import_manifest(cur):
+    # Un registro por fichero .json.xz ya importado; se escribe en la misma
+    # transacción que la receta, así que un corte a medias no deja nada a medias.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_manifest (
+        source TEXT PRIMARY KEY,
+        shortcode TEXT,
+        imported_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """)
+
+@migration(7, "Caché de clasificaciones del LLM")
+def _classification_cache(cur):
+    # key = sha256(descripción, autor, modelo, categorías, versión del prompt)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS classification_cache (
+        key TEXT PRIMARY KEY,
+        title TEXT,
+        folder TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """)
+
+@migration(8, "Registro de con qué se clasificó cada receta (classified_with)")
+def _classified_with(cur):
+    # Formato en taxonomy.stamp(); NULL = pendiente de clasificar
+    cur.execute("ALTER TABLE recipes ADD COLUMN classified_with TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_classified_with ON recipes(classified_with)")
+    # Si cambia la descripción, la clasificación anterior deja de valer (salvo que
+    # la misma sentencia traiga ya una nueva)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipes_caption_au AFTER UPDATE OF caption ON recipes
+    WHEN old.caption IS NOT new.caption AND new.classified_with IS old.classified_with
+         AND new.classified_with IS NOT '~manual' BEGIN
+        UPDATE recipes SET classified_with = NULL WHERE id = new.id;
+    END
+    """)
+
+@migration(9, "Cola persistente de trabajos de scraping (/add asíncrono)")
+def _scrape_jobs(cur):
+    # status: pending -> running -> done | error. run_after retrasa los reintentos.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scrape_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT NOT NULL,
+        host TEXT NOT NULL DEFAULT '',
+        title TEXT,
+        folder TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        recipe_id INTEGER REFERENCES recipes(id) ON DELETE SET NULL,
+        run_after TEXT NOT NULL DEFAULT (datetime('now')),
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """)
+    # Siguiente trabajo pendiente y trabajos en curso por host
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs(status, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status_host ON scrape_jobs(status, host)")
+
+@migration(10, "Shortcode en scrape_jobs para deduplicar la importación masiva")
+def _scrape_jobs_shortcode(cur):
+    cur.execute("ALTER TABLE scrape_jobs ADD COLUMN shortcode TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_shortcode ON scrape_jobs(shortcode, status)")
+
+@migration(11, "Miniaturas: recipes.thumb_key (hash del contenido de la imagen)")
+def _thumb_key(cur):
+    # Las miniaturas se generan aparte (python thumbs.py), no dentro de la migración
+    cur.execute("ALTER TABLE recipes ADD COLUMN thumb_key TEXT")
+
+@migration(12, "Almacén de multimedia por contenido: referencias por fichero")
+def _media_refs(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS media (
+        path TEXT PRIMARY KEY,
+        refs INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """)
+    # Para el recolector: ficheros sin referencias
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_media_refs ON media(refs, updated_at)")
+    cur.execute("""
+    INSERT INTO media (path, refs)
+    SELECT path, COUNT(*) FROM (
+        SELECT image_path AS path FROM recipes WHERE image_path IS NOT NULL
+        UNION ALL
+        SELECT video_path FROM recipes WHERE video_path IS NOT NULL
+    ) GROUP BY path
+    """)
+    for sql in media_triggers(("image_path", "video_path")):
+        cur.execute(sql)
+
+@migration(13, "Póster y vista previa de los vídeos")
+def _video_previews(cur):
+    cur.execute("ALTER TABLE recipes ADD COLUMN poster_path TEXT")
+    cur.execute("ALTER TABLE recipes ADD COLUMN preview_path TEXT")
+    # Las columnas nuevas también cuentan como referencias en media
+    for name in ("media_refs_ai", "media_refs_ad", "media_refs_au"):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for sql in media_triggers():
+        cur.execute(sql)
+
+@migration(14, "Versión de los datos para la caché de páginas y consultas")
+def _data_version(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 1)")
+    for sql in DATA_VERSION_TRIGGERS:
+        cur.execute(sql)
+
+@migration(15, "updated_at y registro de borrados para las copias incrementales")
+def _change_tracking(cur):
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    cur.execute("ALTER TABLE recipes ADD COLUMN updated_at TEXT")
+    cur.execute(f"UPDATE recipes SET updated_at = {now}")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipes_updated_at ON recipes(updated_at)")
+    # Cualquier cambio marca la receta, salvo que la propia sentencia ya ponga updated_at
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_touch_ai AFTER INSERT ON recipes WHEN new.updated_at IS NULL BEGIN
+        UPDATE recipes SET updated_at = {now} WHERE id = new.id;
+    END
+    """)
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_touch_au AFTER UPDATE ON recipes WHEN new.updated_at IS old.updated_at BEGIN
+        UPDATE recipes SET updated_at = {now} WHERE id = new.id;
+    END
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS deleted_recipes (
+        url TEXT PRIMARY KEY,
+        deleted_at TEXT NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_deleted_recipes_at ON deleted_recipes(deleted_at)")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_tombstone_ad AFTER DELETE ON recipes WHEN old.url IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO deleted_recipes (url, deleted_at) VALUES (old.url, {now});
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipes_tombstone_ai AFTER INSERT ON recipes BEGIN
+        DELETE FROM deleted_recipes WHERE url = new.url;
+    END
+    """)
+
+@migration(16, "Vectores pendientes de la búsqueda semántica")
+def _semantic_vectors(cur):
+    # Recetas nuevas o con título/descripción cambiados desde el último índice
+    # (semantic.py): vec se calcula al buscar; version permite a `build` descartar
+    # las que ya recogió.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_vectors (
+        recipe_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        vec BLOB
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO recipe_vectors (recipe_id, version) SELECT id, 0 FROM recipes")
+    # DELETE + INSERT y no INSERT OR REPLACE: dentro de un trigger manda el ON CONFLICT
+    # de la sentencia de fuera (el upsert de db_sqlite), que no es REPLACE
+    pending = """
+        DELETE FROM recipe_vectors WHERE recipe_id = new.id;
+        INSERT INTO recipe_vectors (recipe_id, version, vec)
+        VALUES (new.id, (SELECT version FROM data_version WHERE id = 1), NULL);
+    """
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS recipe_vectors_ai AFTER INSERT ON recipes BEGIN {pending} END")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS recipe_vectors_au AFTER UPDATE OF title, caption ON recipes
+    WHEN old.title IS NOT new.title OR old.caption IS NOT new.caption BEGIN {pending} END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_vectors_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipe_vectors WHERE recipe_id = old.id;
+    END
+    """)
+
+@migration(17, "Ingredientes extraídos e índice invertido por ingrediente")
+def _ingredients(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingredients (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE,
+        recipes INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    # La clave (ingrediente, receta) es el índice invertido: las recetas de cada
+    # ingrediente quedan juntas y ordenadas por id en el propio árbol
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        ingredient_id INTEGER NOT NULL REFERENCES ingredients(id),
+        recipe_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        quantity REAL,
+        unit TEXT,
+        raw TEXT,
+        PRIMARY KEY (ingredient_id, recipe_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe ON recipe_ingredients(recipe_id)")
+    # ingredients.recipes: longitud de la lista de cada ingrediente, como recipe_counts
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_ingredients_ai AFTER INSERT ON recipe_ingredients BEGIN
+        UPDATE ingredients SET recipes = recipes + 1 WHERE id = new.ingredient_id;
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS recipe_ingredients_ad AFTER DELETE ON recipe_ingredients BEGIN
+        UPDATE ingredients SET recipes = recipes - 1 WHERE id = old.ingredient_id;
+    END
+    """)
+    # total NULL = pendiente de extraer (ingredients.py); version como en recipe_vectors.
+    # rarest: el ingrediente menos usado de la receta al extraerla (using_only)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ingredient_extractions (
+        recipe_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL,
+        total INTEGER,
+        rarest INTEGER
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ingredient_extractions_rarest ON ingredient_extractions(rarest, recipe_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ingredient_extractions_pending ON ingredient_extractions(recipe_id) "
+                "WHERE total IS NULL")
+    cur.execute("INSERT OR IGNORE INTO ingredient_extractions (recipe_id, version) SELECT id, 0 FROM recipes")
+    pending = """
+        DELETE FROM recipe_ingredients WHERE recipe_id = new.id;
+        DELETE FROM ingredient_extractions WHERE recipe_id = new.id;
+        INSERT INTO ingredient_extractions (recipe_id, version)
+        VALUES (new.id, (SELECT version FROM data_version WHERE id = 1));
+    """
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS ingredient_extractions_ai AFTER INSERT ON recipes BEGIN {pending} END")
+    cur.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS ingredient_extractions_au AFTER UPDATE OF caption ON recipes
+    WHEN old.caption IS NOT new.caption BEGIN {pending} END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS ingredient_extractions_ad AFTER DELETE ON recipes BEGIN
+        DELETE FROM recipe_ingredients WHERE recipe_id = old.id;
+        DELETE FROM ingredient_extractions WHERE recipe_id = old.id;
+    END
+    """)
+
+@migration(18, "Volver a extraer los ingredientes (descriptores en plural)")
+def _ingredients_reextract(cur):
+    # canonical() convertía "huevos grandes" en "huevo grand": se vacía el índice
+    # y todas las recetas quedan pendientes para `python ingredients.py backfill`
+    cur.execute("DELETE FROM recipe_ingredients")
+    cur.execute("DELETE FROM ingredients")
+    cur.execute("UPDATE ingredient_extractions SET total = NULL, rarest = NULL")
+    cur.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+
+@migration(19, "URLs canónicas de Instagram en recetas y trabajos")
+def _canonical_urls(cur):
+    # /reel/, ?igsh=... y compañía pasan a https://www.instagram.com/p/<shortcode>/
+    # (ingest.py), con su shortcode, para que /add e ingest reconozcan lo ya guardado.
+    # Si dos recetas son el mismo post, la primera se queda la URL y las otras no cambian
+    from ingest import canonical_shortcode, canonical_url
+    odd = """
+        SELECT id, url, shortcode FROM {table}
+        WHERE shortcode IS NULL OR url NOT LIKE 'https://www.instagram.com/p/%/' OR url LIKE '%?%'
+        ORDER BY id
+    """
+    for r in cur.execute(odd.format(table="recipes")).fetchall():
+        shortcode = canonical_shortcode(r["url"]) or r["shortcode"]
+        if not shortcode:
+            continue
+        cur.execute("UPDATE recipes SET shortcode=? WHERE id=? AND shortcode IS NOT ?", (shortcode, r["id"], shortcode))
+        cur.execute("UPDATE OR IGNORE recipes SET url=? WHERE id=? AND url IS NOT ?",
+                    (canonical_url(shortcode), r["id"], canonical_url(shortcode)))
+    for r in cur.execute(odd.format(table="scrape_jobs")).fetchall():
+        shortcode = canonical_shortcode(r["url"]) or r["shortcode"]
+        if shortcode:
+            cur.execute("UPDATE scrape_jobs SET url=?, shortcode=? WHERE id=?", (canonical_url(shortcode), shortcode, r["id"]))
+
+if __name__ == "__main__":
+    before = schema_version()
+    after = migrate(verbose=True)
+    if before == after:
+        print(f"✅ Esquema al día (versión {after})")
+    else:
+        print(f"✅ Esquema migrado de la versión {before} a la {after}")
@@ -0,0 +1,79 @@
+"""
+Servidor falso de Ollama para probar classifier.py sin modelo.
+
+Implementa POST /api/generate (sin streaming) respondiendo con JSON en el
+formato que piden los prompts del clasificador: elige la primera categoría cuya
+palabra principal aparezca en la descripción y usa el principio de la
+descripción como título.
+
+Uso: python ollama_stub.py [--port 11435] [--delay 0.2]
+     OLLAMA_URL=http://localhost:11435 python renovar_folders.py
+"""
+import argparse
+import json
+import re
+import time
+import unicodedata
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def _categories(prompt: str) -> list:
+    match = re.search(r"sin inventar nuevas\):\s*\n\s*\n(.+)\n", prompt)
+    return [c.strip() for c in match.group(1).split(", ")] if match else ["Otros"]
+
+def _classify(caption: str, categories: list) -> dict:
+    text = _normalize(caption)
+    folder = "Otros"
+    for category in categories:
+        word = _normalize(category.split()[0]).rstrip("s")
+        if word and word in text:
+            folder = category
+            break
+    title = " ".join(caption.split()[:7]) or "Receta sin título"
+    return {"title": title, "folder": folder}
+
+def answer(prompt: str) -> str:
+    categories = _categories(prompt)
+    posts = re.findall(r"^\[(\d+)\]\nAutor: [^\n]*\nDescripción: (.*?)(?=\n\n\[\d+\]\n|\n\nResponde)", prompt, re.M | re.S)
+    if posts:
+        return json.dumps({"recetas": [dict(n=int(n), **_classify(caption, categories)) for n, caption in posts]},
+                          ensure_ascii=False)
+    match = re.search(r"Descripción: (.*?)\n\nResponde", prompt, re.S)
+    return json.dumps(_classify(match.group(1) if match else "", categories), ensure_ascii=False)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    delay = 0.0
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.delay)
+        payload = json.dumps({"model": body.get("model"), "response": answer(body.get("prompt", "")),
+                              "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port: int = 11435, delay: float = 0.0) -> ThreadingHTTPServer:
+    StubHandler.delay = delay
+    return ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de Ollama para pruebas.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.0, help="segundos de espera por petición")
+    args = parser.parse_args()
+    server = serve(args.port, args.delay)
+    print(f"🟢 Ollama falso escuchando en http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,130 @@
+"""
+Póster y vista previa ligera de los vídeos de las recetas.
+
+Con ffmpeg (settings.FFMPEG_BIN) se saca un fotograma como póster (JPEG de
+POSTER_WIDTH px) y un clip corto sin audio de bajo bitrate (PREVIEW_SECONDS s a
+PREVIEW_WIDTH px). Los dos van al almacén por contenido y sus rutas a
+recipes.poster_path / preview_path. Como mucho FFMPEG_WORKERS ffmpeg a la vez
+en cada proceso, los lance quien los lance.
+
+Sin ffmpeg instalado no se genera nada y las páginas siguen funcionando.
+
+Uso: python previews.py [--all] [--workers N]   (rellena los vídeos sin póster)
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from config import settings
+from db_sqlite import get_conn, init_db, set_previews, transaction, UPLOAD_FOLDER
+from media_store import TMP_FOLDER, store_file
+
+POSTER_WIDTH = 640
+POSTER_AT = 1.0  # segundo del que se saca el póster
+PREVIEW_WIDTH = 480
+PREVIEW_SECONDS = 6
+PREVIEW_MAXRATE = "400k"
+TIMEOUT = 120
+CHUNK = 100
+
+# Límite de ffmpeg simultáneos en este proceso (cola de scraping, importador y relleno)
+_slots = threading.BoundedSemaphore(max(1, settings.FFMPEG_WORKERS))
+
+def ffmpeg_available() -> bool:
+    return shutil.which(settings.FFMPEG_BIN) is not None
+
+def _ffmpeg(*args, slots: Optional[threading.BoundedSemaphore] = None) -> bool:
+    with slots or _slots:
+        try:
+            subprocess.run([settings.FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", *args],
+                           check=True, timeout=TIMEOUT, stdin=subprocess.DEVNULL, capture_output=True)
+            return True
+        except (OSError, subprocess.SubprocessError) as e:
+            stderr = getattr(e, "stderr", None)
+            print(f"❌ ffmpeg: {stderr.decode(errors='replace').strip() if stderr else e}")
+            return False
+
+def _run_to_store(args_before_output: list, ext: str, slots=None) -> Optional[str]:
+    """Ejecuta ffmpeg hacia un temporal y, si sale bien, lo pasa al almacén."""
+    TMP_FOLDER.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_FOLDER, suffix=f".{ext}")
+    os.close(fd)
+    try:
+        if _ffmpeg(*args_before_output, tmp_path, slots=slots) and os.path.getsize(tmp_path) > 0:
+            return store_file(tmp_path, ext)
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def make_poster(video, slots=None) -> Optional[str]:
+    scale = ["-vf", f"scale='min({POSTER_WIDTH},iw)':-2", "-frames:v", "1", "-q:v", "4"]
+    # Vídeos de menos de POSTER_AT segundos: el primer fotograma
+    return (_run_to_store(["-ss", str(POSTER_AT), "-i", str(video), *scale], "jpg", slots)
+            or _run_to_store(["-i", str(video), *scale], "jpg", slots))
+
+def make_preview(video, slots=None) -> Optional[str]:
+    return _run_to_store([
+        "-t", str(PREVIEW_SECONDS), "-i", str(video), "-an",
+        "-vf", f"scale='min({PREVIEW_WIDTH},iw)':-2",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "32",
+        "-maxrate", PREVIEW_MAXRATE, "-bufsize", "800k", "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart",
+    ], "mp4", slots)
+
+def make_previews(video_path: Optional[str], slots=None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (poster_path, preview_path) para recipes.video_path (ruta relativa a UPLOAD_FOLDER).
+    `slots` limita los ffmpeg simultáneos (por defecto, FFMPEG_WORKERS en todo el proceso).
+    """
+    if not video_path or not ffmpeg_available():
+        return None, None
+    video = UPLOAD_FOLDER / video_path
+    if not video.is_file():
+        return None, None
+    return make_poster(video, slots), make_preview(video, slots)
+
+def update_recipe_previews(recipe_id: int, video_path: Optional[str]):
+    if video_path:
+        set_previews(recipe_id, *make_previews(video_path))
+
+# ----------------- RELLENO -----------------
+def backfill(everything: bool = False, workers: Optional[int] = None) -> int:
+    """
+    Genera en paralelo pósters y vistas previas de los vídeos que no tienen, con
+    `workers` ffmpeg a la vez (por defecto FFMPEG_WORKERS).
+    """
+    if not ffmpeg_available():
+        print(f"⚠️ No se encuentra ffmpeg ('{settings.FFMPEG_BIN}'): no se generan vistas previas")
+        return 0
+    where = "video_path IS NOT NULL" + ("" if everything else " AND poster_path IS NULL")
+    rows = get_conn().execute(f"SELECT id, video_path FROM recipes WHERE {where} ORDER BY id").fetchall()
+    total, done = len(rows), 0
+    print(f"🟢 {total} vídeos sin vista previa")
+
+    # Hilos: el trabajo lo hacen los procesos de ffmpeg (y slots limita cuántos)
+    slots = threading.BoundedSemaphore(workers) if workers else None
+    with ThreadPoolExecutor(max_workers=workers or settings.FFMPEG_WORKERS) as pool:
+        for i in range(0, total, CHUNK):
+            chunk = rows[i:i + CHUNK]
+            results = list(pool.map(lambda r: make_previews(r["video_path"], slots), chunk))
+            with transaction():  # set_previews se une a esta transacción: una por bloque
+                for r, (poster, preview) in zip(chunk, results):
+                    if poster:
+                        set_previews(r["id"], poster, preview)
+            done += len(chunk)
+            print(f"[{done}/{total}] vídeos procesados")
+    return done
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera pósters y vistas previas de los vídeos.")
+    parser.add_argument("--all", action="store_true", help="regenerar también los que ya tienen")
+    parser.add_argument("--workers", type=int, default=None, help="ffmpeg simultáneos")
+    args = parser.parse_args()
+    init_db()
+    backfill(everything=args.all, workers=args.workers)
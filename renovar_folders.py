@@ -1,92 +1,125 @@
-import json
-import sqlite3
-import subprocess
-from pathlib import Path
-
-# --- CONFIG ---
-DB_FILE = Path(__file__).resolve().parent / "recetas_dev.db"
-OLLAMA_EXEC = "C:/Users/MATEO/AppData/Local/Programs/Ollama/ollama.exe"  # ruta completa si no está en PATH
-MODEL = "llama3.2"
-
-CATEGORIAS = [
-    "Bizcochos", "Tartas", 
-    "Cupcakes", "Donuts", "Galletas", "Brownies", "Helados",
-    "Tortitas, crepes y gofres", "Bollería", "Buttercream, ganaches y otros rellenos",
-    "Panes", "Masas", "Banana Bread", "Macarons", "Recetas saludables", "Roscones y briox", "Navidad",
-    "Costura y crochet", "Otros"
-]
-
-# ----------------- DATABASE -----------------
-def get_conn():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def update_recipe(recipe_id, title, folder):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE recipes SET title=?, folder=? WHERE id=?", (title, folder, recipe_id))
-    conn.commit()
-    conn.close()
+"""
+Reclasifica (título y carpeta) las recetas cuya clasificación está desfasada.
 
-# ----------------- OLLAMA -----------------
-def ollama_generate(prompt: str) -> str:
-    """Llama a Ollama local usando subprocess, devuelve texto generado."""
-    result = subprocess.run(
-        [OLLAMA_EXEC, "run", MODEL],
-        input=prompt,
-        capture_output=True,
-        text=True,
-        timeout=120
-    )
-    if result.returncode != 0:
-        print("❌ Error Ollama:", result.stderr)
-        return '{"title":"Receta sin título","folder":"General"}'
-    return result.stdout.strip()
+Una receta está al día si su classified_with coincide con el stamp actual
+(taxonomía + modelo + prompt, ver taxonomy.py). Solo se procesan las que no:
+nuevas, con la descripción cambiada o clasificadas con otra versión. Las
+asignaciones manuales (taxonomy.MANUAL) no se tocan.
 
-def analyze_post(caption: str, author: str):
-    prompt = f"""
-Eres un asistente que organiza recetas de Instagram en carpetas.
+Al publicar una versión nueva de la taxonomía, las recetas cuya carpeta no se
+ve afectada por el cambio (taxonomy.affected_folders) se dan por buenas con un
+único UPDATE, sin pasar por el modelo. Al añadir una categoría solo se repasa
+"Otros": las recetas de otras carpetas que encajarían mejor en la nueva se
+quedan donde están. Con --full se repasan todas las clasificadas con una
+versión anterior (--all, además, repite las que ya están al día).
 
-Dada la publicación:
+Primero pasa el clasificador local (folder_model.py, entrenado con las carpetas
+que ya hay): solo las recetas que no tiene claras van al modelo. Con --llm-only
+todas van al modelo.
 
-Descripción: {caption}
+Uso: python renovar_folders.py [--all | --full] [--llm-only]
+"""
+import argparse
 
-1. Genera un título breve para la receta. 
-2. Asigna la receta a UNA sola categoría de la siguiente lista (elige solo una, sin inventar nuevas):
+import folder_model
+import taxonomy
+from classifier import Classifier, PROMPT_VERSION
+from db_sqlite import get_conn, init_db, transaction, folder_ids
 
-{", ".join(CATEGORIAS)}
+# --- CONFIG ---
+CHUNK = 100  # recetas por bloque (se clasifican juntas y se guardan en una transacción)
 
-Si no encaja claramente en ninguna, asigna "Otros".
+# Recetas desfasadas: sin clasificar o con un stamp distinto del actual. Escrito
+# como rangos para que SQLite use idx_recipes_classified_with; MANUAL ('~...')
+# queda fuera del segundo rango. Lo clasificado por el clasificador local (:local) también está al día.
+STALE = ("(classified_with IS NULL OR classified_with < :stamp OR (classified_with > :stamp AND classified_with < '~'))"
+         " AND classified_with IS NOT :local")
 
-Responde SOLO en formato JSON:
-{{"title": "...", "folder": "..."}}
-"""
-    raw = ollama_generate(prompt)
-    try:
-        data = json.loads(raw)
-        return data.get("title", "Receta sin título"), data.get("folder", "General")
-    except Exception:
-        return "Receta sin título", "General"
+# ----------------- DATABASE -----------------
+def update_recipes(updates):
+    """Guarda [(id, título, carpeta, classified_with)] en una transacción: carpetas resueltas de una vez y un executemany."""
+    with transaction() as cur:
+        ids = folder_ids(cur, (folder for _, _, folder, _ in updates))
+        cur.executemany("UPDATE recipes SET title=?, folder_id=?, classified_with=? WHERE id=?",
+                        [(title, ids.get((folder or "").strip()), classified_with, recipe_id)
+                         for recipe_id, title, folder, classified_with in updates])
+
+def promote_unaffected(classifier: Classifier) -> int:
+    """
+    Da por buenas, con la taxonomía actual, las recetas clasificadas con una versión
+    anterior (mismo modelo y prompt) cuya carpeta no ha cambiado en la taxonomía.
+    """
+    promoted = 0
+    with transaction() as cur:
+        for version, _ in taxonomy.VERSIONS:
+            if version == classifier.taxonomy_version:
+                continue
+            affected = taxonomy.affected_folders(version, classifier.taxonomy_version)
+            if affected is None:
+                continue
+            old_stamp = taxonomy.stamp(classifier.model, PROMPT_VERSION, version)
+            marks = ",".join("?" * len(affected))
+            cur.execute(f"""
+                UPDATE recipes SET classified_with = ?
+                WHERE classified_with = ?
+                  AND COALESCE(folder_id, 0) NOT IN (SELECT id FROM folders WHERE name IN ({marks}))
+            """, (classifier.stamp, old_stamp, *sorted(affected)))
+            promoted += cur.rowcount
+    return promoted
 
 # ----------------- ACTUALIZADOR -----------------
-def reassign_folders():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, author, caption FROM recipes")
-    recipes = cur.fetchall()
-    conn.close()
-
-    total = len(recipes)
+def reassign_folders(everything: bool = False, llm_only: bool = False, full: bool = False):
+    init_db()
+    classifier = Classifier()
+    local = None if llm_only else folder_model.load()
+    if local is not None:
+        print(f"🧠 Clasificador local entrenado con {local.meta.get('samples')} recetas")
+    if everything:
+        # Forzar todo: se olvidan los stamps (las asignaciones manuales se respetan)
+        with transaction() as cur:
+            cur.execute("UPDATE recipes SET classified_with = NULL WHERE classified_with IS NOT ?",
+                        (taxonomy.MANUAL,))
+    elif not full:
+        promoted = promote_unaffected(classifier)
+        if promoted:
+            print(f"🟢 {promoted} recetas no se ven afectadas por el cambio de taxonomía")
+
+    # Ids desfasados sacados del índice (sin recorrer la tabla); luego se cargan por bloques
+    stale_ids = sorted(r[0] for r in get_conn().execute(
+        f"SELECT id FROM recipes WHERE {STALE}",
+        {"stamp": classifier.stamp, "local": folder_model.local_stamp(classifier)}))
+    total = len(stale_ids)
     print(f"🟢 Encontradas {total} recetas para procesar...")
 
-    for i, r in enumerate(recipes, 1):
-        recipe_id = r["id"]
-        author = r["author"]
-        caption = r["caption"]
-        title, folder = analyze_post(caption, author)
-        update_recipe(recipe_id, title, folder)
-        print(f"[{i}/{total}] ✅ Actualizado ID {recipe_id}: {title} -> {folder}")
+    done = 0
+    for i in range(0, total, CHUNK):
+        chunk = stale_ids[i:i + CHUNK]
+        recipes = get_conn().execute(
+            f"SELECT id, author, caption, title FROM recipes WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id", chunk
+        ).fetchall()
+
+        # Sin fallback: si el modelo falla, la receta sigue pendiente para la próxima pasada
+        results = folder_model.classify_all(classifier, local, ((r["caption"], r["author"]) for r in recipes),
+                                            titles=[r["title"] for r in recipes])
+        update_recipes([(r["id"], *result, stamp) for r, (result, stamp) in zip(recipes, results) if result is not None])
+        for r, (result, stamp) in zip(recipes, results):
+            done += 1
+            if result is None:
+                print(f"[{done}/{total}] ❌ Sin clasificar ID {r['id']}")
+            else:
+                source = "🧠" if stamp != classifier.stamp else "✅"
+                print(f"[{done}/{total}] {source} Actualizado ID {r['id']}: {result[0]} -> {result[1]}")
+
+    print(f"✅ {done} recetas, {classifier.stats['local']} con el clasificador local, "
+          f"{classifier.stats['cached']} desde caché, {classifier.stats['requests']} llamadas al modelo, "
+          f"{classifier.stats['errors']} errores")
 
 if __name__ == "__main__":
-    reassign_folders()
+    parser = argparse.ArgumentParser(description="Reclasifica las recetas desfasadas.")
+    parser.add_argument("--all", action="store_true", help="reclasificar todo (salvo asignaciones manuales)")
+    parser.add_argument("--full", action="store_true",
+                        help="tras un cambio de taxonomía, repasar todas las recetas clasificadas con una versión "
+                             "anterior, no solo las de carpetas afectadas (al añadir una categoría, solo \"Otros\")")
+    parser.add_argument("--llm-only", action="store_true", help="sin el clasificador local: todo al modelo")
+    args = parser.parse_args()
+    reassign_folders(everything=args.all, llm_only=args.llm_only, full=args.full)
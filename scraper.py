@@ -1,18 +1,65 @@
+import threading
+from typing import Tuple
 import instaloader
 import requests
-from pathlib import Path
-from db_sqlite import UPLOAD_FOLDER
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+from config import settings
+from media_store import MediaWriter
 
 class ScrapeError(Exception): pass
 
+CHUNK_SIZE = 256 * 1024
+TIMEOUT = 15
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Sesión HTTP compartida: conexiones persistentes y reintentos ante errores temporales."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=("GET",))
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+@metrics.timed("download_media")
+def download_media(url: str, ext: str, max_bytes: int) -> Tuple[str, int]:
+    """
+    Descarga `url` por trozos, sin cargarla en memoria, directamente al almacén de
+    multimedia (media_store.py): el fichero queda con el nombre de su hash y, si ya
+    existía el mismo contenido, no se duplica. Devuelve (ruta relativa, tamaño).
+    """
+    with get_session().get(url, stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        declared = int(r.headers.get("Content-Length") or 0)
+        if max_bytes and declared > max_bytes:
+            raise ScrapeError(f"{ext}: {declared} bytes supera el límite de {max_bytes}")
+
+        with MediaWriter(ext) as w:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if max_bytes and w.size + len(chunk) > max_bytes:
+                    raise ScrapeError(f"{ext}: supera el límite de {max_bytes} bytes")
+                w.write(chunk)
+    return w.path, w.size
+
+@metrics.timed("scrape")
 def scrape_instagram_post(url: str) -> dict:
     """
     Devuelve un dict con keys:
       - shortcode, author, caption, posted_at (ISO), likes
-      - image_bytes (bytes) si tiene imagen
-      - video_bytes (bytes) si tiene vídeo
+      - image_path, image_size si tiene imagen
+      - video_path, video_size si tiene vídeo
 
-    Ya NO escribe ficheros en disco; la escritura la hace la app principal.
+    La multimedia se descarga en streaming al almacén (rutas relativas a UPLOAD_FOLDER),
+    con los límites de tamaño de settings.MAX_IMAGE_BYTES / MAX_VIDEO_BYTES.
     """
     try:
         L = instaloader.Instaloader()
@@ -21,33 +68,34 @@ def scrape_instagram_post(url: str) -> dict:
         if '?' in shortcode:
             shortcode = shortcode.split('?')[0]
 
-        post = instaloader.Post.from_shortcode(L.context, shortcode)
+        with metrics.timer("instagram_metadata"):
+            post = instaloader.Post.from_shortcode(L.context, shortcode)
 
-        image_bytes = None
-        video_bytes = None
+        image_path = video_path = None
+        image_size = video_size = None
 
-        # post.url y post.video_url pueden ser None; usamos requests para obtener bytes
+        # post.url y post.video_url pueden ser None
         # Nota: puede fallar si Instagram cambia su API o requiere sesión.
         if getattr(post, 'url', None):
-            r = requests.get(post.url, timeout=15)
-            r.raise_for_status()
-            image_bytes = r.content
+            image_path, image_size = download_media(post.url, "jpg", settings.MAX_IMAGE_BYTES)
 
         if getattr(post, 'video_url', None):
-            r = requests.get(post.video_url, timeout=15)
-            r.raise_for_status()
-            video_bytes = r.content
+            video_path, video_size = download_media(post.video_url, "mp4", settings.MAX_VIDEO_BYTES)
 
         return {
             "url": url,
             "shortcode": shortcode,
             "author": post.owner_username,
             "caption": post.caption or "",
-            "image_bytes": image_bytes,
-            "video_bytes": video_bytes,
+            "image_path": image_path,
+            "image_size": image_size,
+            "video_path": video_path,
+            "video_size": video_size,
             "posted_at": post.date_utc.isoformat() if getattr(post, 'date_utc', None) else None,
             "likes": getattr(post, 'likes', None)
         }
 
+    except ScrapeError:
+        raise
     except Exception as e:
         raise ScrapeError(str(e))
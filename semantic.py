@@ -0,0 +1,494 @@
+"""
+Búsqueda semántica y recetas parecidas.
+
+Cada receta (título + descripción) se convierte en un vector de DIM
+dimensiones. Por defecto es TF-IDF con hashing sobre palabras, raíces y
+"conceptos" de repostería (CONCEPTS: "sin horno", "nevera" y "tarta fría"
+comparten sin_horno), así que "postre sin horno" encuentra "tarta fría de
+queso" aunque no compartan palabras. Con SEMANTIC_MODEL (un modelo de
+sentence-transformers disponible en local) se usan sus embeddings.
+
+El índice vive junto a la base de datos (<db>.semantic/): vectores int8 (con
+una escala por receta) en un fichero mapeado en memoria, ordenados por grupos (k-means) para que cada
+búsqueda compare solo con los grupos más cercanos. Se construye con
+`python semantic.py build`. Lo que cambia después queda en recipe_vectors
+(triggers, ver migrations.py): lo vectorizan los hilos de la cola (jobs.py) o
+`python semantic.py refresh`, nunca una búsqueda, y se compara entero.
+
+Necesita numpy (opcional): sin él, /search solo busca por texto.
+
+Uso: python semantic.py build [--workers N]
+     python semantic.py refresh
+     python semantic.py query "postre sin horno"
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sin numpy no hay búsqueda semántica
+    np = None
+
+import db_sqlite
+from config import settings
+from db_sqlite import get_conn, init_db, transaction
+from textnorm import STOPWORDS, normalize
+
+DIM = 256
+HASHED = "hashed-tfidf"
+TITLE_WEIGHT = 2.0
+CONCEPT_WEIGHT = 3.0
+STEM_LEN = 5
+IVF_MIN_ROWS = 20_000  # por debajo se compara con todo
+NPROBE = 24
+PROBE_ROWS = 16384  # pasar de int8 a float32 es lo caro: como mucho tantas filas por consulta
+KMEANS_SAMPLE = 40_000
+KMEANS_ITERS = 8
+CHUNK = 2000
+REFRESH_LIMIT = 500  # recetas pendientes que vectoriza cada refresh()
+MIN_SCORE = 0.15
+MAX_RESULTS = 210  # 10 páginas de resultados
+
+# Conceptos: expresiones (sin tildes, en minúscula) que significan lo mismo a efectos de búsqueda
+CONCEPTS = {
+    "sin_horno": ("sin horno", "no bake", "nevera", "frigorifico", "fria", "frio", "gelatina", "cuajada",
+                  "sin cocinar", "congelador", "semifrio"),
+    "postre": ("postre", "tarta", "pastel", "bizcocho", "flan", "natillas", "mousse", "brownie", "coulant",
+               "cheesecake", "helado", "dulce", "galleta", "magdalena", "cupcake", "donut", "macaron"),
+    "chocolate": ("chocolate", "cacao", "nutella", "brownie", "choco"),
+    "queso": ("queso", "cheesecake", "mascarpone", "requeson"),
+    "saludable": ("saludable", "sano", "sana", "fit", "healthy", "sin azucar", "integral", "avena", "proteica", "ligera", "light"),
+    "sin_gluten": ("sin gluten", "celiaco", "celiaca", "gluten free"),
+    "vegano": ("vegano", "vegana", "sin huevo", "sin lactosa", "vegetal"),
+    "pan": ("pan", "masa madre", "hogaza", "baguette", "levadura", "brioche", "briox", "bolleria", "cruasan"),
+    "galletas": ("galleta", "cookie"),
+    "navidad": ("navidad", "navideno", "navidena", "roscon", "turron", "polvoron", "reyes"),
+    "rapido": ("rapido", "rapida", "facil", "minutos", "microondas", "express", "sencillo", "sencilla"),
+    "fruta": ("fresa", "limon", "platano", "manzana", "frambuesa", "naranja", "arandano", "mango", "fruta"),
+    "desayuno": ("desayuno", "tortita", "crepe", "gofre", "tostada", "porridge", "granola"),
+    "helado": ("helado", "polo", "sorbete", "granizado"),
+}
+_PHRASE_CONCEPTS: Dict[str, List[str]] = {}
+for _name, _phrases in CONCEPTS.items():
+    for _phrase in _phrases:
+        _PHRASE_CONCEPTS.setdefault(_phrase, []).append(_name)
+# Una sola expresión para todos los conceptos (la frase más larga primero), con plural opcional
+_CONCEPT_RE = re.compile(r"\b(" + "|".join(re.escape(p) for p in sorted(_PHRASE_CONCEPTS, key=len, reverse=True))
+                         + r")(?:s|es)?\b")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def available() -> bool:
+    return np is not None
+
+def index_dir() -> Path:
+    return Path(f"{db_sqlite.DB_FILE}.semantic")
+
+# ----------------- VECTORES -----------------
+def terms(title: Optional[str], caption: Optional[str]) -> Counter:
+    """Términos ponderados: palabras, raíces (w:/s:) y conceptos (c:), el título pesa más."""
+    counts = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (caption, 1.0)):
+        text = normalize(text)
+        for word in _WORD_RE.findall(text):
+            if len(word) < 2 or word in STOPWORDS:
+                continue
+            counts["w:" + word] += weight
+            if len(word) > STEM_LEN:
+                counts["s:" + word[:STEM_LEN]] += weight
+        for phrase in _CONCEPT_RE.findall(text):
+            for name in _PHRASE_CONCEPTS[phrase]:
+                counts["c:" + name] += weight * CONCEPT_WEIGHT
+    return counts
+
+_buckets: Dict[str, Tuple[int, float]] = {}
+
+def _bucket(term: str) -> Tuple[int, float]:
+    """Dimensión y signo de un término (crc32: estable entre procesos, a diferencia de hash())."""
+    found = _buckets.get(term)
+    if found is None:
+        h = zlib.crc32(term.encode())
+        found = (h % DIM, 1.0 if h & 0x80000000 else -1.0)
+        if len(_buckets) < 500_000:
+            _buckets[term] = found
+    return found
+
+class HashedEncoder:
+    """TF-IDF (tf sublineal) proyectado en DIM dimensiones con hashing con signo."""
+    name = HASHED
+    dim = DIM
+
+    def __init__(self, idf: Optional[Dict[str, float]] = None, default_idf: float = 1.0):
+        self.idf = idf or {}
+        self.default_idf = default_idf
+
+    def encode(self, docs: Sequence[Tuple[Optional[str], Optional[str]]]) -> "np.ndarray":
+        out = np.zeros((len(docs), DIM), dtype=np.float32)
+        for i, (title, caption) in enumerate(docs):
+            for term, tf in terms(title, caption).items():
+                dim, sign = _bucket(term)
+                out[i, dim] += sign * (1.0 + math.log(tf)) * self.idf.get(term, self.default_idf)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-9)
+
+class ModelEncoder:
+    """Embeddings de un modelo local de sentence-transformers (SEMANTIC_MODEL)."""
+    def __init__(self, name: str):
+        from sentence_transformers import SentenceTransformer  # opcional
+        self.name = name
+        self._model = SentenceTransformer(name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, docs):
+        texts = [f"{title or ''}. {caption or ''}" for title, caption in docs]
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+def make_encoder(meta: Optional[dict] = None, idf: Optional[dict] = None):
+    name = (meta or {}).get("model") or settings.SEMANTIC_MODEL or HASHED
+    if name == HASHED:
+        return HashedEncoder(idf, (meta or {}).get("default_idf", 1.0))
+    return ModelEncoder(name)
+
+# ----------------- CONSTRUCCIÓN -----------------
+_worker_encoder = None
+
+def _init_worker(meta, idf):
+    global _worker_encoder
+    _worker_encoder = make_encoder(meta, idf)
+
+def _chunk_terms(rows) -> Counter:
+    """Frecuencia documental de los términos de un bloque."""
+    df = Counter()
+    for _, title, caption in rows:
+        df.update(terms(title, caption).keys())
+    return df
+
+def quantize(vectors: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """int8 con una escala por vector: vector ≈ codes * scale."""
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-9) / 127
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+def _chunk_vectors(rows):
+    return [r[0] for r in rows], *quantize(_worker_encoder.encode([(r[1], r[2]) for r in rows]))
+
+def _parallel(fn, chunks, workers: int, initargs=()):
+    """map ordenado con como mucho 2*workers bloques en vuelo (memoria acotada); sin procesos si workers=1."""
+    if workers <= 1:
+        if initargs:
+            _init_worker(*initargs)
+        yield from map(fn, chunks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker if initargs else None,
+                             initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _read_chunks(max_id: int):
+    """(id, título, descripción) por bloques de CHUNK (keyset por id)."""
+    last_id = 0
+    while True:
+        rows = get_conn().execute(
+            "SELECT id, title, caption FROM recipes WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+            (last_id, max_id, CHUNK)).fetchall()
+        if not rows:
+            return
+        yield [tuple(r) for r in rows]
+        last_id = rows[-1][0]
+
+def _kmeans(codes, scales, n: int, clusters: int, rng) -> "np.ndarray":
+    """k-means esférico sobre una muestra (los vectores están normalizados: producto escalar = coseno)."""
+    picked = np.sort(rng.choice(n, min(n, KMEANS_SAMPLE), replace=False))
+    sample = codes[picked].astype(np.float32) * scales[picked, None]
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERS):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        filled = np.bincount(labels, minlength=clusters) > 0
+        norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+        centroids[filled] = sums[filled] / np.maximum(norms, 1e-9)  # los grupos vacíos conservan su centro
+    return centroids
+
+def _assign(block, centroids, step: int = 8192) -> "np.ndarray":
+    """Grupo de cada fila (el de mayor producto escalar; la escala de la fila no cambia cuál es)."""
+    return np.concatenate([np.argmax(np.asarray(block[i:i + step], dtype=np.float32) @ centroids.T, axis=1)
+                           for i in range(0, len(block), step)]).astype(np.int32)
+
+def build(workers: Optional[int] = None) -> int:
+    """Construye el índice de toda la biblioteca y lo sustituye de golpe. Devuelve cuántas recetas indexa."""
+    if not available():
+        raise RuntimeError("La búsqueda semántica necesita numpy")
+    conn = get_conn()
+    start_version = db_sqlite.data_version()
+    max_id, total = conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM recipes").fetchone()
+    workers = workers or os.cpu_count() or 1
+    final = index_dir()
+    tmp = final.with_name(f"{final.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    meta = {"model": settings.SEMANTIC_MODEL or HASHED, "built_at": time.time(), "version": start_version}
+    idf = None
+    if meta["model"] == HASHED:
+        df = Counter()
+        for chunk_df in _parallel(_chunk_terms, _read_chunks(max_id), workers):
+            df.update(chunk_df)
+        idf = {t: round(math.log((total + 1) / (d + 1)) + 1, 4) for t, d in df.items()}
+        meta["default_idf"] = round(math.log((total + 1) / 2) + 1, 4)
+        (tmp / "idf.json").write_text(json.dumps(idf, ensure_ascii=False))
+        del df
+    dim = make_encoder(meta, idf).dim if meta["model"] != HASHED else DIM
+
+    unsorted = np.memmap(tmp / "unsorted.i8", dtype=np.int8, mode="w+", shape=(max(total, 1), dim))
+    ids = np.zeros(max(total, 1), dtype=np.int64)
+    scales = np.zeros(max(total, 1), dtype=np.float32)
+    n = 0
+    for chunk_ids, codes, chunk_scales in _parallel(_chunk_vectors, _read_chunks(max_id), workers, initargs=(meta, idf)):
+        m = min(len(chunk_ids), total - n)  # recetas nuevas durante la construcción: van a recipe_vectors
+        unsorted[n:n + m] = codes[:m]
+        scales[n:n + m] = chunk_scales[:m]
+        ids[n:n + m] = chunk_ids[:m]
+        n += m
+        print(f"[{n}/{total}] recetas vectorizadas")
+    unsorted.flush()
+
+    if n >= IVF_MIN_ROWS:
+        rng = np.random.default_rng(0)
+        clusters = min(4096, int(2 * math.sqrt(n)))
+        centroids = _kmeans(unsorted, scales, n, clusters, rng)
+        labels = _assign(unsorted[:n], centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.searchsorted(labels[order], np.arange(clusters + 1)).astype(np.int64)
+        vectors = np.memmap(tmp / "vectors.i8", dtype=np.int8, mode="w+", shape=(n, dim))
+        for i in range(0, n, 65536):
+            vectors[i:i + 65536] = unsorted[order[i:i + 65536]]
+        vectors.flush()
+        del vectors, unsorted
+        os.unlink(tmp / "unsorted.i8")
+        np.save(tmp / "centroids.npy", centroids)
+        np.save(tmp / "offsets.npy", offsets)
+        ids, scales = ids[order], scales[order]
+        meta["clusters"] = clusters
+    else:
+        del unsorted
+        os.replace(tmp / "unsorted.i8", tmp / "vectors.i8")
+        ids, scales = ids[:n], scales[:n]
+        meta["clusters"] = 0
+    np.save(tmp / "ids.npy", ids)
+    np.save(tmp / "scales.npy", scales)
+    meta.update(rows=n, dim=dim)
+    (tmp / "meta.json").write_text(json.dumps(meta))
+
+    # Sustitución: quien esté buscando con el índice anterior lo tiene abierto (mmap) y no le afecta
+    old = final.with_name(f"{final.name}.old-{os.getpid()}")
+    if final.exists():
+        os.replace(final, old)
+    os.replace(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+    with transaction() as cur:
+        # Lo anterior al inicio ya está en el índice; lo posterior se vuelve a vectorizar con el idf nuevo
+        cur.execute("DELETE FROM recipe_vectors WHERE version < ?", (start_version,))
+        cur.execute("UPDATE recipe_vectors SET vec = NULL")
+        # Cambian los resultados de las búsquedas: páginas en caché (cache.py)
+        cur.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    refresh_all()
+    return n
+
+# ----------------- BÚSQUEDA -----------------
+class _Index:
+    def __init__(self, path: Path):
+        meta = json.loads((path / "meta.json").read_text())
+        idf = json.loads((path / "idf.json").read_text()) if (path / "idf.json").exists() else None
+        self.encoder = make_encoder(meta, idf)
+        self.ids = np.load(path / "ids.npy")
+        self.dim = meta["dim"]
+        self.scales = np.load(path / "scales.npy")
+        self.codes = (np.memmap(path / "vectors.i8", dtype=np.int8, mode="r", shape=(len(self.ids), self.dim))
+                      if len(self.ids) else np.zeros((0, self.dim), dtype=np.int8))
+        if meta.get("clusters"):
+            self.centroids = np.load(path / "centroids.npy")
+            self.offsets = np.load(path / "offsets.npy")
+            self._dense = None
+        else:
+            self.centroids = self.offsets = None
+            self._dense = self.vectors(0, len(self.ids))  # pequeño: cabe en memoria
+
+    def vectors(self, start: int, stop: int) -> "np.ndarray":
+        return self.codes[start:stop].astype(np.float32) * self.scales[start:stop, None]
+
+    def candidates(self, queries: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """(ids, puntuaciones[filas, consultas]) de las filas a comparar con todas las consultas del lote."""
+        if self._dense is not None:
+            return self.ids, self._dense @ queries.T
+        # Para cada consulta, los grupos más cercanos hasta NPROBE o PROBE_ROWS filas; la unión de
+        # todos se compara con todo el lote en una sola multiplicación
+        sizes = np.diff(self.offsets)
+        nearest = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :NPROBE]
+        within = np.cumsum(sizes[nearest], axis=1) - sizes[nearest] < PROBE_ROWS
+        groups = np.unique(nearest[within])
+        ranges = [(self.offsets[g], self.offsets[g + 1]) for g in groups if self.offsets[g + 1] > self.offsets[g]]
+        rows = np.concatenate([np.arange(a, b) for a, b in ranges]) if ranges else np.zeros(0, dtype=np.int64)
+        block = np.concatenate([self.codes[a:b] for a, b in ranges]) if ranges else np.zeros((0, self.dim), np.int8)
+        return self.ids[rows], (block.astype(np.float32) @ queries.T) * self.scales[rows, None]
+
+_lock = threading.Lock()
+_state = {"key": None, "index": None, "delta_key": None, "delta": None}
+
+def _index() -> Optional[_Index]:
+    meta_path = index_dir() / "meta.json"
+    try:
+        key = (str(meta_path), meta_path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        key = None
+    with _lock:
+        if _state["key"] != key:
+            _state.update(key=key, index=_Index(meta_path.parent) if key else None, delta_key=None, delta=None)
+        return _state["index"]
+
+def _encoder():
+    index = _index()
+    return index.encoder if index else make_encoder()
+
+def refresh(encoder=None, limit: int = REFRESH_LIMIT) -> int:
+    """
+    Vectoriza hasta `limit` recetas nuevas o cambiadas desde el índice (con el
+    codificador del índice si no se pasa otro). Devuelve cuántas ha guardado y
+    solo entonces cambia data_version: con varios trabajadores de scraping, el
+    que llega tarde a las mismas recetas no invalida las páginas cacheadas.
+    """
+    encoder = encoder or _encoder()
+    rows = get_conn().execute("""
+        SELECT v.recipe_id, r.title, r.caption FROM recipe_vectors v JOIN recipes r ON r.id = v.recipe_id
+        WHERE v.vec IS NULL LIMIT ?
+    """, (limit,)).fetchall()
+    if not rows:
+        return 0
+    vecs = encoder.encode([(r["title"], r["caption"]) for r in rows]).astype(np.float16)
+    with transaction() as cur:
+        cur.executemany("UPDATE recipe_vectors SET vec=? WHERE recipe_id=? AND vec IS NULL",
+                        [(v.tobytes(), r["recipe_id"]) for r, v in zip(rows, vecs)])
+        written = cur.rowcount
+        if written > 0:
+            cur.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+    return written
+
+def refresh_all() -> int:
+    """refresh() hasta que no quede nada pendiente. Devuelve cuántas recetas vectoriza."""
+    encoder, done = _encoder(), 0
+    while True:
+        n = refresh(encoder)
+        done += n
+        if not n:
+            return done
+
+def _delta(index: Optional[_Index], encoder) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Vectores ya calculados de recipe_vectors (ids, matriz), cacheados por versión
+    de los datos. Solo lee: lo pendiente aparece cuando lo vectoriza refresh().
+    """
+    key = (db_sqlite.data_version(), _state["key"])
+    if _state["delta_key"] == key:
+        return _state["delta"]
+    dim = index.dim if index else encoder.dim
+    rows = [(r[0], r[1]) for r in get_conn().execute("SELECT recipe_id, vec FROM recipe_vectors WHERE vec IS NOT NULL")
+            if len(r[1]) == dim * 2]
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    matrix = (np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float16).reshape(-1, dim).astype(np.float32)
+              if rows else np.zeros((0, dim), dtype=np.float32))
+    with _lock:
+        _state.update(delta_key=key, delta=(ids, matrix))
+    return ids, matrix
+
+def _top(ids: "np.ndarray", scores: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k)[:k]
+        ids, scores = ids[keep], scores[keep]
+    return [(int(i), float(s)) for i, s in zip(ids, scores) if s >= MIN_SCORE]
+
+def search_vectors(queries: "np.ndarray", k: int = MAX_RESULTS, exclude=()) -> List[List[Tuple[int, float]]]:
+    """Top-k por coseno para un lote de vectores de consulta (normalizados)."""
+    index = _index()
+    encoder = index.encoder if index else make_encoder()
+    delta_ids, delta_vecs = _delta(index, encoder)
+    results = [dict() for _ in range(len(queries))]
+    if index is not None and len(index.ids):
+        ids, scores = index.candidates(queries)
+        # Lo que está en recipe_vectors es más reciente que el índice
+        fresh = ~np.isin(ids, delta_ids) if len(delta_ids) else slice(None)
+        for q in range(len(queries)):
+            results[q].update(_top(ids[fresh], scores[fresh, q], k + len(exclude)))
+    if len(delta_ids):
+        scores = delta_vecs @ queries.T
+        for q in range(len(queries)):
+            results[q].update(_top(delta_ids, scores[:, q], k + len(exclude)))
+
+    # Fuera las recetas borradas después de construir el índice
+    found = {i for r in results for i in r}
+    alive = {row[0] for row in get_conn().execute(
+        "SELECT id FROM recipes WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(sorted(found)),))}
+    skip = set(exclude)
+    return [sorted(((i, s) for i, s in r.items() if i in alive and i not in skip), key=lambda x: -x[1])[:k]
+            for r in results]
+
+def search_many(queries: Sequence[str], k: int = MAX_RESULTS) -> List[List[Tuple[int, float]]]:
+    if not queries:
+        return []
+    index = _index()
+    encoder = index.encoder if index else make_encoder()
+    return search_vectors(encoder.encode([(q, "") for q in queries]), k)
+
+def search(query: str, k: int = MAX_RESULTS) -> List[Tuple[int, float]]:
+    """[(id, similitud)] de las recetas más parecidas a la consulta, de más a menos."""
+    return search_many([query], k)[0]
+
+def similar(recipe_id: int, k: int = 6) -> List[int]:
+    """Ids de las recetas más parecidas a una receta."""
+    row = get_conn().execute("SELECT title, caption FROM recipes WHERE id=?", (recipe_id,)).fetchone()
+    if row is None:
+        return []
+    index = _index()
+    encoder = index.encoder if index else make_encoder()
+    vec = encoder.encode([(row["title"], row["caption"])])
+    return [i for i, _ in search_vectors(vec, k, exclude=(recipe_id,))[0]]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Búsqueda semántica de recetas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="construir el índice de toda la biblioteca")
+    p_build.add_argument("--workers", type=int, default=None)
+    sub.add_parser("refresh", help="vectorizar las recetas nuevas o cambiadas desde el índice")
+    p_query = sub.add_parser("query", help="probar una búsqueda")
+    p_query.add_argument("text")
+    p_query.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "build":
+        start = time.perf_counter()
+        n = build(workers=args.workers)
+        print(f"✅ Índice semántico de {n} recetas en {time.perf_counter() - start:.1f}s ({index_dir()})")
+    elif args.command == "refresh":
+        print(f"✅ {refresh_all()} recetas vectorizadas")
+    else:
+        start = time.perf_counter()
+        hits = search(args.text, k=args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        titles = {r["id"]: r["title"] for r in db_sqlite.fetch_recipes_by_ids([i for i, _ in hits])}
+        for recipe_id, score in hits:
+            print(f"{score:.3f}  #{recipe_id}  {titles.get(recipe_id)}")
+        print(f"⏱️ {elapsed:.1f} ms")
@@ -0,0 +1,177 @@
+"""
+Acceso a recetas y carpetas independiente del motor de base de datos.
+
+Repository es la interfaz que usan la web, la API y la cola de scraping. Hay dos
+implementaciones: SQLiteRepository (db_sqlite.py, la de siempre) y
+MySQLRepository (db.py, con pool de conexiones), y settings.DB_BACKEND elige
+cuál ("sqlite" por defecto o "mysql").
+
+La tabla de trabajos de la cola (scrape_jobs), el almacén de multimedia, las
+migraciones y los scripts por lotes (importador, miniaturas, vistas previas,
+clasificador, copias) siguen trabajando sobre SQLite.
+
+Uso: python storage.py copy --to mysql [--batch 500]   (pasa la biblioteca de SQLite a otro motor)
+"""
+import argparse
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import db_sqlite
+from config import settings
+
+class Repository:
+    """
+    Interfaz común. Las recetas se devuelven como dicts con las claves de
+    db_sqlite.RECIPE_FIELDS; las escrituras son por url.
+    """
+    name = ""
+
+    def init_db(self):
+        """Crea o actualiza el esquema."""
+        raise NotImplementedError
+
+    def data_version(self) -> int:
+        """Número que cambia con cualquier escritura en recetas o carpetas (claves de cache.py)."""
+        raise NotImplementedError
+
+    def fetch_recipes_paginated(self, limit: int, offset: int = 0, folder: Optional[str] = None,
+                                query: Optional[str] = None, before_id: Optional[int] = None,
+                                after_id: Optional[int] = None,
+                                fields: Sequence[str] = db_sqlite.LIST_FIELDS) -> List[Dict]:
+        """Página de recetas de la más nueva a la más antigua (ver db_sqlite.fetch_recipes_paginated)."""
+        raise NotImplementedError
+
+    def count_recipes(self, folder: Optional[str] = None, query: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def fetch_recipe(self, recipe_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def fetch_recipes_by_ids(self, ids: Sequence[int], fields: Sequence[str] = db_sqlite.LIST_FIELDS) -> List[Dict]:
+        """Recetas con esos ids en el mismo orden (resultados de semantic.py); `fields` debe incluir "id"."""
+        raise NotImplementedError
+
+    def upsert_recipe(self, data: Dict) -> int:
+        """Inserta o actualiza (por url) y devuelve el id."""
+        raise NotImplementedError
+
+    def upsert_recipes(self, items: Iterable[Dict], batch_size: int = db_sqlite.UPSERT_BATCH) -> int:
+        """Inserta o actualiza muchas recetas por lotes y devuelve cuántas."""
+        raise NotImplementedError
+
+    def set_previews(self, recipe_id: int, poster_path: Optional[str], preview_path: Optional[str]):
+        raise NotImplementedError
+
+    def known_shortcodes(self, shortcodes: Sequence[str]) -> Set[str]:
+        """Los shortcodes que ya son receta (deduplicación de ingest.py)."""
+        raise NotImplementedError
+
+    def delete_recipe(self, recipe_id: int):
+        raise NotImplementedError
+
+    def get_folders(self) -> List[str]:
+        raise NotImplementedError
+
+    def get_folder_counts(self) -> List[Dict]:
+        """[{'name', 'count'}] ordenadas por nombre."""
+        raise NotImplementedError
+
+    def create_folder(self, name: str) -> int:
+        raise NotImplementedError
+
+    def update_recipe_folder(self, recipe_id: int, folder: str):
+        """Carpeta elegida a mano (classified_with = MANUAL)."""
+        raise NotImplementedError
+
+    def delete_folder_by_name(self, name: str):
+        """Borra la carpeta y pasa sus recetas a "Otros"."""
+        raise NotImplementedError
+
+class SQLiteRepository(Repository):
+    """Las funciones de db_sqlite.py (conexión por hilo, FTS5 y contadores por triggers)."""
+    name = "sqlite"
+    init_db = staticmethod(db_sqlite.init_db)
+    data_version = staticmethod(db_sqlite.data_version)
+    fetch_recipes_paginated = staticmethod(db_sqlite.fetch_recipes_paginated)
+    count_recipes = staticmethod(db_sqlite.count_recipes)
+    fetch_recipe = staticmethod(db_sqlite.fetch_recipe)
+    fetch_recipes_by_ids = staticmethod(db_sqlite.fetch_recipes_by_ids)
+    upsert_recipe = staticmethod(db_sqlite.upsert_recipe)
+    upsert_recipes = staticmethod(db_sqlite.upsert_recipes)
+    set_previews = staticmethod(db_sqlite.set_previews)
+    known_shortcodes = staticmethod(db_sqlite.known_shortcodes)
+    delete_recipe = staticmethod(db_sqlite.delete_recipe)
+    get_folders = staticmethod(db_sqlite.get_folders)
+    get_folder_counts = staticmethod(db_sqlite.get_folder_counts)
+    create_folder = staticmethod(db_sqlite.create_folder)
+    update_recipe_folder = staticmethod(db_sqlite.update_recipe_folder)
+    delete_folder_by_name = staticmethod(db_sqlite.delete_folder_by_name)
+
+def make_repository(backend: Optional[str] = None, **options) -> Repository:
+    backend = (backend or settings.DB_BACKEND).lower()
+    if backend == "sqlite":
+        return SQLiteRepository()
+    if backend == "mysql":
+        from db import MySQLRepository  # opcional: necesita mysql-connector-python
+        return MySQLRepository(**options)
+    raise ValueError(f"DB_BACKEND desconocido: {backend!r} (sqlite o mysql)")
+
+class CurrentRepository:
+    """
+    El almacenamiento del proceso. Los módulos hacen `from storage import repo` al
+    importarse; configure() (create_app en app.py) cambia el motor detrás sin que
+    tengan que volver a importarlo. Se crea en el primer uso, no al importar.
+    """
+    def __init__(self):
+        self._repo = None
+
+    def configure(self, backend: Optional[str] = None, **options) -> Repository:
+        self._repo = make_repository(backend, **options)
+        return self._repo
+
+    def __getattr__(self, attr):
+        if self._repo is None:
+            self._repo = make_repository()
+        return getattr(self._repo, attr)
+
+repo = CurrentRepository()
+configure = repo.configure
+
+def copy_library(src: Repository, dst: Repository, batch_size: int = db_sqlite.UPSERT_BATCH) -> int:
+    """
+    Copia carpetas y recetas de un almacenamiento a otro, por lotes y de la más
+    antigua a la más nueva (keyset por id), para que los ids nuevos mantengan el orden.
+    """
+    for name in src.get_folders():
+        dst.create_folder(name)
+    fields = tuple(f for f in db_sqlite.RECIPE_FIELDS if f != "excerpt")
+    copied, after_id = 0, 0
+    while True:
+        rows = src.fetch_recipes_paginated(limit=batch_size, after_id=after_id, fields=fields)
+        if not rows:
+            return copied
+        rows.reverse()
+        dst.upsert_recipes(rows)
+        # Póster y vista previa no van en el upsert (un nuevo scraping no debe borrarlos)
+        for r in rows:
+            if r["poster_path"]:
+                dst.set_previews(dst.upsert_recipe(r), r["poster_path"], r["preview_path"])
+        copied += len(rows)
+        after_id = rows[-1]["id"]
+        print(f"📦 {copied} recetas copiadas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacenamiento de recetas.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_copy = sub.add_parser("copy", help="copiar la biblioteca de SQLite a otro motor")
+    p_copy.add_argument("--to", required=True, choices=["mysql"])
+    p_copy.add_argument("--batch", type=int, default=db_sqlite.UPSERT_BATCH)
+    args = parser.parse_args()
+
+    src = SQLiteRepository()
+    src.init_db()
+    dst = make_repository(args.to)
+    dst.init_db()
+    start = time.perf_counter()
+    copied = copy_library(src, dst, batch_size=args.batch)
+    print(f"✅ {copied} recetas copiadas a {dst.name} en {time.perf_counter() - start:.1f}s")
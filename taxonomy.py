@@ -0,0 +1,58 @@
+"""
+Taxonomía de carpetas compartida por el importador y el reclasificador.
+
+Las versiones no se editan: para cambiar la lista de categorías se añade una
+versión nueva al final de VERSIONS. Así el reclasificador puede calcular qué
+recetas se ven afectadas por el cambio (affected_folders) y no tiene que
+repasar toda la biblioteca.
+
+Cada receta guarda en recipes.classified_with con qué se clasificó su título y
+carpeta (stamp()): versión de la taxonomía, modelo y versión del prompt. Las
+asignaciones hechas a mano llevan MANUAL y el reclasificador no las toca.
+"""
+from typing import Optional, Sequence
+
+FALLBACK = "Otros"
+MANUAL = "~manual"  # '~' ordena detrás de cualquier stamp (ver renovar_folders.STALE)
+
+VERSIONS = [
+    (1, (
+        "Bizcochos", "Tartas",
+        "Cupcakes", "Donuts", "Galletas", "Brownies", "Helados",
+        "Tortitas, crepes y gofres", "Bollería", "Buttercream, ganaches y otros rellenos",
+        "Panes", "Masas", "Banana Bread", "Macarons", "Recetas saludables", "Roscones y briox", "Navidad",
+        "Costura y crochet", "Otros",
+    )),
+]
+
+TAXONOMY_VERSION, CATEGORIAS = VERSIONS[-1]
+CATEGORIAS = list(CATEGORIAS)
+
+def categories(version: int) -> Optional[Sequence[str]]:
+    for v, cats in VERSIONS:
+        if v == version:
+            return cats
+    return None
+
+def stamp(model: str, prompt_version: int, version: int = TAXONOMY_VERSION) -> str:
+    """Identifica con qué se clasificó una receta. Empieza por la versión (4 dígitos) para ordenar."""
+    return f"{version:04d}|{model}|p{prompt_version}"
+
+def affected_folders(old_version: int, new_version: int = TAXONOMY_VERSION) -> Optional[set]:
+    """
+    Carpetas cuyas recetas hay que volver a clasificar al pasar de old_version a
+    new_version: las categorías eliminadas y, si se han añadido categorías nuevas,
+    FALLBACK (lo que estaba en "Otros" puede encajar ahora en una de ellas).
+    None si alguna versión es desconocida (hay que reclasificar todo).
+
+    Es un límite deliberado para no pasar la biblioteca entera por el modelo:
+    una receta de otra carpeta que encajaría mejor en una categoría nueva no se
+    reconsidera. Para eso está renovar_folders.py --full.
+    """
+    old, new = categories(old_version), categories(new_version)
+    if old is None or new is None:
+        return None
+    affected = set(old) - set(new)
+    if set(new) - set(old):
+        affected.add(FALLBACK)
+    return affected
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db_sqlite  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base de datos SQLite vacía y migrada en un directorio temporal."""
+    db_sqlite.set_db_file(tmp_path / "recetas.db")
+    db_sqlite.init_db()
+    yield db_sqlite
+    db_sqlite.close_conn()
@@ -0,0 +1,43 @@
+import pytest
+
+import app as app_module
+import cache
+import db_sqlite
+import storage
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = app_module.create_app({"TESTING": True, "DB_FILE": str(tmp_path / "app.db")})
+    app_module.init_storage()
+    yield app.test_client()
+    db_sqlite.close_conn()
+
+
+def test_create_app_configures_storage(tmp_path):
+    path = tmp_path / "otra.db"
+    app = app_module.create_app({"DB_FILE": str(path), "CACHE_URL": "", "CACHE_TTL": 7})
+    assert db_sqlite.DB_FILE == path
+    assert storage.repo.name == "sqlite"
+    assert app.config["DB_BACKEND"] == "sqlite"
+    assert isinstance(cache.pages, cache.MemoryCache) and cache.pages.ttl == 7
+
+
+def test_create_app_rejects_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        app_module.create_app({"DB_BACKEND": "postgres", "DB_FILE": str(tmp_path / "x.db")})
+
+
+def test_create_app_touches_nothing(tmp_path):
+    app_module.create_app({"DB_FILE": str(tmp_path / "nueva.db")})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pages(client):
+    storage.repo.upsert_recipe({"url": "https://www.instagram.com/p/abc/", "shortcode": "abc",
+                                "caption": "Bizcocho de limón", "title": "Bizcocho", "folder": "Bizcochos"})
+    recipe_id = db_sqlite.get_conn().execute("SELECT id FROM recipes").fetchone()[0]
+    for url in ("/", "/folder/Bizcochos", "/add", f"/recipe/{recipe_id}", "/search?q=bizcocho",
+                "/ingredients?con=limon", "/jobs", "/metrics", "/api/recipes"):
+        assert client.get(url).status_code == 200, url
+    assert b"Bizcocho" in client.get("/").data
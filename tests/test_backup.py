@@ -0,0 +1,36 @@
+import tarfile
+
+import backup
+
+
+def test_export_does_not_keep_members(db, tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(backup, "UPLOAD_FOLDER", uploads)
+    records = []
+    for i in range(20):
+        (uploads / f"v{i}.mp4").write_bytes(b"x" * (i + 1))
+        records.append({"url": f"https://www.instagram.com/p/C{i}/", "shortcode": f"C{i}",
+                        "caption": f"receta {i}", "video_path": f"v{i}.mp4"})
+    db.upsert_recipes(records)
+
+    kept = []
+    addfile = tarfile.TarFile.addfile
+
+    def spy(tar, tarinfo, fileobj=None, *args, **kwargs):
+        if tar.mode == "w":
+            kept.append(len(tar.members) + len(tar.inodes))
+        return addfile(tar, tarinfo, fileobj, *args, **kwargs)
+
+    monkeypatch.setattr(tarfile.TarFile, "addfile", spy)
+    stats = backup.export(tmp_path / "copia.tar", since="2000-01-01 00:00:00")
+    assert (stats["recipes"], stats["files"]) == (20, 20)
+    assert max(kept) <= 2  # la cabecera anterior como mucho, no una por fichero
+
+    # La copia sigue restaurándose entera
+    restored = tmp_path / "restaurado"
+    monkeypatch.setattr(backup, "UPLOAD_FOLDER", restored)
+    db.set_db_file(tmp_path / "otra.db")
+    stats = backup.restore(tmp_path / "copia.tar")
+    assert (stats["recipes"], stats["files"]) == (20, 20)
+    assert (restored / "v19.mp4").read_bytes() == b"x" * 20
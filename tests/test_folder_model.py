@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import folder_model  # noqa: E402
+import semantic  # noqa: E402
+import textnorm  # noqa: E402
+
+
+def test_shared_text_helpers():
+    assert folder_model.normalize is semantic.normalize is textnorm.normalize
+    assert textnorm.normalize("Bizcocho de Limón y Piñones") == "bizcocho de limon y pinones"
+
+
+def test_features_skip_stopwords():
+    a = folder_model.features("Tarta de queso sin horno", "cocina_ana")
+    b = folder_model.features("tarta queso horno", "cocina_ana")
+    assert (a == b).all()
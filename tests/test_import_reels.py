@@ -0,0 +1,65 @@
+import json
+import lzma
+import threading
+
+import pytest
+
+import import_reels
+import ollama_stub
+from config import settings
+
+
+@pytest.fixture
+def saved_dir(db, tmp_path, monkeypatch):
+    """Posts de Instaloader (*.json.xz) y un Ollama falso."""
+    folder = tmp_path / "saved"
+    folder.mkdir()
+    for i in range(200):
+        node = {"shortcode": f"C{i:05d}", "owner": {"username": "autor"},
+                "edge_media_to_caption": {"edges": [{"node": {"text": f"Bizcocho de limón {i}"}}]}}
+        with lzma.open(folder / f"post_{i:05d}.json.xz", "wt", encoding="utf-8") as f:
+            json.dump({"node": node}, f)
+    server = ollama_stub.serve(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(settings, "OLLAMA_URL", f"http://127.0.0.1:{server.server_port}")
+    yield folder
+    server.shutdown()
+
+
+def _run(folder, **kwargs):
+    """import_saved en un hilo: si el pipeline se bloquea, el test falla en vez de colgarse."""
+    outcome = {}
+
+    def target():
+        try:
+            import_reels.import_saved(folder, decoders=1, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    assert not thread.is_alive(), "la importación se ha quedado bloqueada"
+    return outcome.get("error")
+
+
+def test_import(saved_dir, db):
+    assert _run(saved_dir, batch_size=20) is None
+    assert db.get_conn().execute("SELECT COUNT(*) FROM import_manifest").fetchone()[0] == 200
+
+
+def test_writer_failure_stops_the_import(saved_dir, db, monkeypatch):
+    calls = []
+    write_batch = import_reels._write_batch
+
+    def failing(batch):
+        calls.append(len(batch))
+        if len(calls) > 1:
+            raise OSError("disco lleno")
+        return write_batch(batch)
+    monkeypatch.setattr(import_reels, "_write_batch", failing)
+
+    error = _run(saved_dir, batch_size=10)
+    assert isinstance(error, OSError) and str(error) == "disco lleno"
+    assert len(calls) == 2  # tras el fallo no se intenta guardar nada más
+    # Lo guardado antes del fallo queda registrado: al relanzar se sigue desde ahí
+    assert db.get_conn().execute("SELECT COUNT(*) FROM import_manifest").fetchone()[0] == 10
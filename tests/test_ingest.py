@@ -0,0 +1,38 @@
+import jobs
+import migrations
+from ingest import canonical_shortcode, canonical_url, ingest
+
+
+def test_canonical_shortcode():
+    for url in ("https://www.instagram.com/p/Cabc123/", "https://instagram.com/reel/Cabc123/?igsh=xyz",
+                "instagram.com/usuario/p/Cabc123", "Cabc123"):
+        assert canonical_shortcode(url) == "Cabc123"
+    assert canonical_shortcode("https://example.com/p/Cabc123/") is None
+
+
+def test_ingest_skips_queued_posts(db):
+    summary = ingest(["https://www.instagram.com/reel/Cnew222/?igsh=abc", "Cnew222", "nope/"])
+    assert (summary["existing"], summary["queued"], summary["duplicates"], summary["invalid"]) == (0, 1, 1, 1)
+    assert ingest(["https://instagram.com/p/Cnew222/"])["queued"] == 0  # ya en cola
+
+
+def test_add_does_not_requeue(db):
+    import app as app_module
+    client = app_module.create_app({"TESTING": True, "DB_FILE": str(db.DB_FILE)}).test_client()
+    json_headers = {"Accept": "application/json"}
+    resp = client.post("/add", data={"url": "https://www.instagram.com/p/Cnew222/"}, headers=json_headers)
+    assert resp.status_code == 202
+    resp = client.post("/add", data={"url": "https://instagram.com/reel/Cnew222/"}, headers=json_headers)
+    assert resp.get_json()["existing"] is True
+    assert len(jobs.recent_jobs()) == 1
+
+
+def test_migration_canonicalises_urls(db):
+    with db.transaction() as cur:
+        cur.execute("INSERT INTO recipes (url, caption) VALUES ('https://www.instagram.com/reel/Cold111/?igsh=1', 'a')")
+        cur.execute("INSERT INTO recipes (url, caption) VALUES ('https://instagram.com/p/Cold111', 'dup')")
+        cur.execute("INSERT INTO recipes (url, caption) VALUES ('https://www.instagram.com/p/Cok333/', 'b')")
+        migrations._canonical_urls(cur)
+    rows = [tuple(r) for r in db.get_conn().execute("SELECT url, shortcode FROM recipes ORDER BY id")]
+    assert rows == [(canonical_url("Cold111"), "Cold111"), ("https://instagram.com/p/Cold111", "Cold111"),
+                    (canonical_url("Cok333"), "Cok333")]
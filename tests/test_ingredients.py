@@ -0,0 +1,37 @@
+import pytest
+
+import ingredients
+
+
+@pytest.mark.parametrize("line, name", [
+    ("huevos grandes", "huevo"),
+    ("2 huevos grandes", "huevo"),
+    ("1 huevo grande", "huevo"),
+    ("2 cebollas grandes picadas", "cebolla"),
+    ("3 zanahorias medianas", "zanahoria"),
+    ("Huevos L (a temperatura ambiente)", "huevo"),
+    ("200 g de harina de trigo", "harina"),
+    ("2 limones maduros", "limon"),
+    ("100 g de nueces", "nuez"),
+])
+def test_parse_line_drops_descriptors(line, name):
+    assert ingredients.parse_line(line)["name"] == name
+
+
+def test_parse_line_quantity_and_unit():
+    item = ingredients.parse_line("250 gr de mantequilla pomada")
+    assert (item["name"], item["quantity"], item["unit"]) == ("mantequilla", 250, "g")
+
+
+def test_extract_and_find(db):
+    db.upsert_recipes([
+        {"url": "https://www.instagram.com/p/a/", "shortcode": "a",
+         "caption": "Bizcocho\nIngredientes:\n- 3 huevos grandes\n- 200 g de harina\nPreparación: batir"},
+        {"url": "https://www.instagram.com/p/b/", "shortcode": "b",
+         "caption": "Tortilla\nIngredientes:\n- 2 cebollas grandes\n- 4 huevos\nPreparación: freír"},
+    ])
+    assert ingredients.backfill(workers=1) == 2
+    names = {r["name"] for r in db.get_conn().execute("SELECT name FROM ingredients")}
+    assert names == {"huevo", "harina", "cebolla"}
+    assert ingredients.count("huevo") == 2
+    assert ingredients.count("huevo, -cebolla") == 1
@@ -0,0 +1,21 @@
+import sys
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.mark.parametrize("order", ["fifo", "lifo"])
+def test_overlapping_samplers_restore_switch_interval(order):
+    original = sys.getswitchinterval()
+    first = metrics.Sampler(threading.get_ident(), interval=0.001).start()
+    second = metrics.Sampler(threading.get_ident(), interval=0.002).start()
+    assert sys.getswitchinterval() < original
+    stops = [first, second] if order == "fifo" else [second, first]
+    stops[0].stop()
+    assert sys.getswitchinterval() < original  # aún queda uno perfilando
+    stops[1].stop()
+    stops[1].stop()  # dos veces no descuadra la cuenta
+    assert sys.getswitchinterval() == original
+
@@ -0,0 +1,23 @@
+import threading
+
+import previews
+
+
+def test_backfill_uses_set_previews_and_its_own_slots(db, monkeypatch):
+    db.upsert_recipes([{"url": f"https://www.instagram.com/p/C{i}/", "shortcode": f"C{i}", "caption": "x",
+                        "video_path": f"v{i}.mp4"} for i in range(3)])
+    seen = []
+
+    def fake_make_previews(video_path, slots=None):
+        seen.append(slots)
+        return f"{video_path}.jpg", f"{video_path}.preview.mp4"
+
+    monkeypatch.setattr(previews, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(previews, "make_previews", fake_make_previews)
+    module_slots = previews._slots
+    assert previews.backfill(workers=2) == 3
+    assert previews._slots is module_slots  # el límite no cambia el del proceso
+    assert all(isinstance(s, type(threading.BoundedSemaphore())) and s is not module_slots for s in seen)
+    rows = db.get_conn().execute("SELECT video_path, poster_path, preview_path FROM recipes").fetchall()
+    assert all(r["poster_path"] == r["video_path"] + ".jpg" for r in rows)
+    assert previews.backfill() == 0  # ya tienen póster
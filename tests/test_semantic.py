@@ -0,0 +1,73 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import semantic  # noqa: E402
+
+
+def _add(db, shortcode, title, caption):
+    db.upsert_recipes([{"url": f"https://www.instagram.com/p/{shortcode}/", "shortcode": shortcode,
+                        "title": title, "caption": caption}])
+    return db.get_conn().execute("SELECT id FROM recipes WHERE shortcode=?", (shortcode,)).fetchone()[0]
+
+
+def _pending(db):
+    return db.get_conn().execute("SELECT COUNT(*) FROM recipe_vectors WHERE vec IS NULL").fetchone()[0]
+
+
+@pytest.fixture
+def library(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(semantic, "index_dir", lambda: tmp_path / "recetas.semantic")
+    semantic._state.update(key=None, index=None, delta_key=None, delta=None)
+    _add(db, "a", "Tarta de queso sin horno", "Tarta fría de queso con galletas")
+    _add(db, "b", "Pan de masa madre", "Hogaza con levadura natural")
+    _add(db, "c", "Brownie", "Brownie de chocolate y nueces")
+    return db
+
+
+def test_search_does_not_write(library):
+    version, pending = library.data_version(), _pending(library)
+    semantic.search("postre sin horno")
+    semantic.similar(1)
+    assert (library.data_version(), _pending(library)) == (version, pending)
+
+
+def test_build_bumps_version_and_indexes(library):
+    version = library.data_version()
+    assert semantic.build(workers=1) == 3
+    assert library.data_version() > version
+    assert _pending(library) == 0
+    assert semantic.search("postre sin horno")[0][0] == 1
+
+
+def test_refresh_makes_new_recipes_searchable(library):
+    semantic.build(workers=1)
+    recipe_id = _add(library, "d", "Coulant", "Coulant de chocolate fundido")
+    assert recipe_id not in [i for i, _ in semantic.search("coulant chocolate")]
+    version = library.data_version()
+    assert semantic.refresh_all() == 1
+    assert library.data_version() > version
+    assert semantic.search("coulant chocolate")[0][0] == recipe_id
+
+
+def test_refresh_bumps_version_only_when_it_writes(library, monkeypatch):
+    semantic.build(workers=1)
+    version = library.data_version()
+    assert semantic.refresh() == 0  # nada pendiente
+    assert library.data_version() == version
+
+    # Otro trabajador vectoriza las mismas recetas entre la lectura y la escritura
+    _add(library, "d", "Coulant", "Coulant de chocolate fundido")
+    encoder = semantic._encoder()
+    encode = encoder.encode
+
+    def racing_encode(texts):
+        vecs = encode(texts)
+        monkeypatch.setattr(encoder, "encode", encode)
+        assert semantic.refresh(encoder) == 1
+        return vecs
+
+    monkeypatch.setattr(encoder, "encode", racing_encode)
+    version = library.data_version()
+    assert semantic.refresh(encoder) == 0
+    assert library.data_version() == version + 1
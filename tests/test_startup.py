@@ -0,0 +1,16 @@
+"""Presupuesto de arranque (benchmarks/bench_startup.py): STARTUP_BUDGET_SCALE=2 en máquinas lentas."""
+import os
+
+import pytest
+
+from benchmarks.bench_startup import ENTRY_POINTS, measure
+
+SCALE = float(os.getenv("STARTUP_BUDGET_SCALE", "1"))
+
+
+@pytest.mark.parametrize("name", list(ENTRY_POINTS))
+def test_startup_budget(name):
+    code, budget, forbidden = ENTRY_POINTS[name]
+    ms, loaded = min(measure(code) for _ in range(3))
+    assert not set(loaded) & set(forbidden), f"{name} carga {sorted(set(loaded) & set(forbidden))}"
+    assert ms <= budget * SCALE, f"{name}: {ms:.0f} ms, presupuesto {budget * SCALE:.0f} ms"
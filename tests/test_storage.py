@@ -0,0 +1,141 @@
+"""
+Comportamiento común de los dos almacenamientos (storage.Repository).
+
+MySQL necesita mysql-connector-python, un servidor (DB_HOST, DB_USER... de
+config.py) y una base de datos desechable en TEST_MYSQL_DATABASE, que se vacía;
+si falta algo, sus tests se omiten.
+"""
+import os
+
+import pytest
+
+import storage
+from benchmarks.synthetic import fake_recipes
+from ingest import ingest
+from storage import SQLiteRepository, make_repository
+from taxonomy import MANUAL
+
+ROWS = 300
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def repo(request):
+    if request.param == "sqlite":
+        request.getfixturevalue("db")
+        yield SQLiteRepository()
+        return
+    pytest.importorskip("mysql.connector")
+    database = os.getenv("TEST_MYSQL_DATABASE")
+    if not database:
+        pytest.skip("sin TEST_MYSQL_DATABASE")
+    repo = make_repository("mysql", database=database)
+    try:
+        repo.drop_all()
+    except Exception as e:  # sin servidor, sin permisos...
+        pytest.skip(f"sin conexión con MySQL ({e})")
+    request.getfixturevalue("db")  # la cola de trabajos sigue en SQLite
+    repo.init_db()
+    yield repo
+    repo.drop_all()
+
+
+@pytest.fixture
+def items(repo):
+    items = list(fake_recipes(ROWS, seed=7))
+    assert repo.upsert_recipes(items, batch_size=64) == ROWS
+    return items
+
+
+def test_upsert_recipes_bumps_version(repo):
+    version = repo.data_version()
+    repo.upsert_recipes(fake_recipes(10, seed=1))
+    assert repo.data_version() > version
+    assert repo.count_recipes() == 10
+
+
+def test_upsert_recipe_by_url(repo, items):
+    first_id = repo.upsert_recipe({**items[0], "caption": "cambiada con merengue"})
+    assert repo.upsert_recipe({**items[0], "caption": "cambiada con merengue"}) == first_id
+    assert repo.count_recipes() == ROWS
+    recipe = repo.fetch_recipe(first_id)
+    assert recipe["caption"] == "cambiada con merengue"
+    assert recipe["folder"] == items[0]["folder"]
+
+
+def test_keyset_pagination(repo, items):
+    page1 = repo.fetch_recipes_paginated(limit=20)
+    page2 = repo.fetch_recipes_paginated(limit=20, before_id=page1[-1]["id"])
+    ids = [r["id"] for r in page1 + page2]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 40
+    back = repo.fetch_recipes_paginated(limit=20, after_id=page2[0]["id"])
+    assert [r["id"] for r in back] == [r["id"] for r in page1]
+    assert [r["id"] for r in repo.fetch_recipes_paginated(limit=20, offset=20)] == [r["id"] for r in page2]
+
+
+def test_requested_fields(repo, items):
+    assert set(repo.fetch_recipes_paginated(limit=1, fields=("id", "title"))[0]) == {"id", "title"}
+    ids = [r["id"] for r in repo.fetch_recipes_paginated(limit=3)]
+    assert [r["id"] for r in repo.fetch_recipes_by_ids(ids[::-1])] == ids[::-1]
+
+
+def test_folder_counts(repo, items):
+    folder = items[0]["folder"]
+    in_folder = sum(1 for i in items if i["folder"] == folder)
+    assert repo.count_recipes(folder=folder) == in_folder
+    assert all(r["folder"] == folder for r in repo.fetch_recipes_paginated(limit=50, folder=folder))
+    counts = {c["name"]: c["count"] for c in repo.get_folder_counts()}
+    assert counts[folder] == in_folder and sum(counts.values()) == ROWS
+
+
+def test_search(repo, items):
+    recipe_id = repo.upsert_recipe({**items[0], "caption": "cambiada con merengue"})
+    assert [r["id"] for r in repo.fetch_recipes_paginated(limit=10, query="merengue")] == [recipe_id]
+    assert repo.count_recipes(query="merengue") == 1
+    assert repo.count_recipes(query="mereng") == 1
+    assert repo.fetch_recipes_paginated(limit=10, query="¿?") == []
+
+
+def test_folders(repo, items):
+    recipe_id = repo.fetch_recipes_paginated(limit=1)[0]["id"]
+    repo.create_folder("Comprobación")
+    assert "Comprobación" in repo.get_folders()
+    repo.update_recipe_folder(recipe_id, "Comprobación")
+    moved = repo.fetch_recipe(recipe_id)
+    assert (moved["folder"], moved["classified_with"]) == ("Comprobación", MANUAL)
+    repo.delete_folder_by_name("Comprobación")
+    assert repo.fetch_recipe(recipe_id)["folder"] == "Otros"
+    assert "Comprobación" not in repo.get_folders()
+
+
+def test_previews_and_delete(repo, items):
+    recipe_id = repo.fetch_recipes_paginated(limit=1)[0]["id"]
+    repo.set_previews(recipe_id, "media/p.jpg", "media/p.mp4")
+    assert repo.fetch_recipe(recipe_id)["poster_path"] == "media/p.jpg"
+    version = repo.data_version()
+    repo.delete_recipe(recipe_id)
+    assert repo.data_version() > version
+    assert repo.fetch_recipe(recipe_id) is None and repo.count_recipes() == ROWS - 1
+
+
+def test_known_shortcodes(repo, items):
+    saved = [items[0]["shortcode"], items[-1]["shortcode"]]
+    assert repo.known_shortcodes([*saved, "Cnuevo1"]) == set(saved)
+    assert repo.known_shortcodes([]) == set()
+
+
+def test_ingest_skips_saved_posts(repo, items, monkeypatch):
+    monkeypatch.setattr(storage.repo, "_repo", repo)  # lo que usa ingest.py
+    saved = items[0]["shortcode"]
+    summary = ingest([f"https://www.instagram.com/reel/{saved}/?igsh=abc", "Cnew222"], folder="Ingesta")
+    assert (summary["existing"], summary["queued"]) == (1, 1)
+    assert "Ingesta" in repo.get_folders()
+
+
+def test_add_does_not_requeue_saved_posts(repo, items, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(storage.repo, "_repo", repo)  # create_app lo cambia; se restaura al acabar
+    client = app_module.create_app({"TESTING": True, "DB_BACKEND": repo.name,
+                                    "DB_NAME": os.getenv("TEST_MYSQL_DATABASE")}).test_client()
+    resp = client.post("/add", data={"url": f"https://instagram.com/reel/{items[0]['shortcode']}/"},
+                       headers={"Accept": "application/json"})
+    assert resp.get_json()["existing"] is True
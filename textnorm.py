@@ -0,0 +1,22 @@
+"""
+Normalización de texto común a la búsqueda semántica (semantic.py) y al
+clasificador local de carpetas (folder_model.py): minúsculas sin tildes y las
+palabras vacías que ninguno de los dos tiene en cuenta.
+"""
+import unicodedata
+
+STOPWORDS = frozenset("""
+    a al algo como con de del el ella en es esta este esto ha la las le lo los mas me mi mis muy
+    no o os para pero por que se si sin su sus te tu tus un una unas unos y ya yo
+""".split())
+
+_ACCENTS = str.maketrans("áéíóúüñàèìòùâêîôûç", "aeiouunaeiouaeiouc")
+
+def normalize(text: str) -> str:
+    """Minúsculas sin tildes (ñ -> n)."""
+    text = (text or "").lower().translate(_ACCENTS)
+    if text.isascii():
+        return text
+    # Lo raro (otras tildes, letras compuestas): descomposición completa
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
@@ -0,0 +1,117 @@
+"""
+Miniaturas de las imágenes de las recetas para las rejillas de tarjetas.
+
+Cada imagen se reduce a varios anchos (THUMB_WIDTHS) en WebP y JPEG dentro de
+static/uploads/thumbs/. Los ficheros se nombran con el hash del contenido de la
+imagen original (recipes.thumb_key), así que generarlas dos veces no repite
+trabajo y dos recetas con la misma imagen comparten miniaturas. Las plantillas
+las sirven con srcset y loading="lazy" (templates/macros.html).
+
+Pillow es opcional: sin él no se generan miniaturas y las tarjetas usan la
+imagen original.
+
+Uso: python thumbs.py [--all] [--workers N]   (rellena las recetas sin miniaturas)
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow no instalado: sin miniaturas
+    Image = ImageOps = None
+
+from db_sqlite import get_conn, init_db, transaction, UPLOAD_FOLDER
+
+THUMB_WIDTHS = (320, 640)
+THUMB_FORMATS = {"webp": ("WEBP", {"quality": 78, "method": 4}),
+                 "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+THUMB_FOLDER = UPLOAD_FOLDER / "thumbs"
+CHUNK = 200
+
+def content_key(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()[:24]
+
+def thumb_name(key: str, width: int, fmt: str) -> str:
+    """Ruta relativa a UPLOAD_FOLDER (repartidas en subcarpetas por las dos primeras letras del hash)."""
+    return f"thumbs/{key[:2]}/{key}-{width}.{fmt}"
+
+def make_thumbnails(path) -> Optional[str]:
+    """
+    Genera las miniaturas que falten para la imagen `path` y devuelve su clave
+    (None si no hay Pillow o la imagen no se puede leer).
+    """
+    if Image is None or not path or not os.path.isfile(path):
+        return None
+    key = content_key(path)
+    missing = [(w, fmt) for w in THUMB_WIDTHS for fmt in THUMB_FORMATS
+               if not (UPLOAD_FOLDER / thumb_name(key, w, fmt)).exists()]
+    if not missing:
+        return key
+
+    try:
+        with Image.open(path) as im:
+            # draft() hace que el decodificador JPEG reduzca al leer: mucho más rápido
+            im.draft("RGB", (max(THUMB_WIDTHS), max(THUMB_WIDTHS) * 4))
+            im = ImageOps.exif_transpose(im).convert("RGB")
+            out_dir = THUMB_FOLDER / key[:2]
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for width, fmt in missing:
+                thumb = im
+                if im.width > width:
+                    thumb = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+                pil_format, options = THUMB_FORMATS[fmt]
+                # Temporal + rename: nunca queda una miniatura a medias
+                fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".part")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        thumb.save(f, pil_format, **options)
+                    os.replace(tmp_path, UPLOAD_FOLDER / thumb_name(key, width, fmt))
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"❌ Sin miniaturas para {path}: {e}")
+        return None
+    return key
+
+def thumb_for_upload(image_path: Optional[str]) -> Optional[str]:
+    """make_thumbnails para una ruta relativa a UPLOAD_FOLDER (recipes.image_path)."""
+    return make_thumbnails(UPLOAD_FOLDER / image_path) if image_path else None
+
+# ----------------- RELLENO -----------------
+def backfill(everything: bool = False, workers: Optional[int] = None) -> int:
+    """Genera en paralelo las miniaturas de las recetas que no tienen (o de todas con everything)."""
+    if Image is None:
+        print("⚠️ Pillow no está instalado (pip install Pillow): no se generan miniaturas")
+        return 0
+    where = "image_path IS NOT NULL" + ("" if everything else " AND thumb_key IS NULL")
+    rows = get_conn().execute(f"SELECT id, image_path FROM recipes WHERE {where} ORDER BY id").fetchall()
+    total, done = len(rows), 0
+    print(f"🟢 {total} recetas sin miniaturas")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i in range(0, total, CHUNK):
+            chunk = rows[i:i + CHUNK]
+            keys = list(pool.map(thumb_for_upload, [r["image_path"] for r in chunk], chunksize=8))
+            with transaction() as cur:
+                cur.executemany("UPDATE recipes SET thumb_key=? WHERE id=?",
+                                [(key, r["id"]) for r, key in zip(chunk, keys) if key])
+            done += len(chunk)
+            print(f"[{done}/{total}] miniaturas generadas")
+    return done
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera las miniaturas que falten.")
+    parser.add_argument("--all", action="store_true", help="comprobar todas las recetas, no solo las que no tienen")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    init_db()
+    backfill(everything=args.all, workers=args.workers)